@@ -0,0 +1,24 @@
+import os
+
+from apps.jobs.registry import register
+
+
+@register('accounts.onboard_users')
+def onboard_users_job(path, format, uploaded=False, **params):
+    """
+    Onboards the users of the file at `path`. An `uploaded` file is deleted
+    once imported; a failed run keeps it, so the chunk can be retried.
+    """
+    from .onboarding import onboard_users, read_users
+
+    with open(path, encoding='utf-8') as f:
+        report = onboard_users(read_users(f, format), **params)
+    if uploaded:
+        os.remove(path)
+    return {
+        'items': report.created + report.skipped + report.invalid,
+        'created': report.created,
+        'skipped': report.skipped,
+        'invalid': report.invalid,
+        'errors': list(report.errors),
+    }
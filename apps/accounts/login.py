@@ -0,0 +1,135 @@
+"""
+Login pipeline.
+
+With `LOGIN_PIPELINE = "fast"`, credentials are checked against a single
+query that fetches the user together with its API token, and password
+hashing runs in a bounded process pool of `LOGIN_HASHING_PROCESSES` workers
+(in the request thread when it is 0). Passwords stored with an outdated
+hasher or work factor are re-hashed with the preferred hasher of
+`PASSWORD_HASHERS` on successful login. `"django"` uses
+`django.contrib.auth.authenticate()` and a separate token query.
+
+The pool and the multiprocessing machinery are imported on the first login
+that needs them, and the pool is shut down at exit.
+"""
+import atexit
+import os
+import threading
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password, verify_password
+from django.contrib.auth.signals import user_login_failed
+from django.db import IntegrityError, transaction
+from rest_framework.authtoken.models import Token
+
+from .models import User
+
+PIPELINE_FAST = "fast"
+PIPELINE_DJANGO = "django"
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_pending = None
+
+
+def _init_worker():
+    if not apps.ready:
+        django.setup()
+
+
+def _check(password, encoded):
+    """
+    Returns whether `password` matches `encoded`, and the password re-hashed
+    with the preferred hasher if the stored hash must be upgraded.
+    """
+    if encoded is None:
+        make_password(password)
+        return False, None
+    is_correct, must_update = verify_password(password, encoded)
+    if is_correct and must_update:
+        return True, make_password(password)
+    return is_correct, None
+
+
+def _get_pool():
+    global _pool, _pool_pid, _pending
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            from concurrent.futures import ProcessPoolExecutor
+
+            if _pool_pid is None:
+                atexit.register(_shutdown_pool)
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.LOGIN_HASHING_PROCESSES,
+                initializer=_init_worker,
+            )
+            _pool_pid = os.getpid()
+            _pending = threading.BoundedSemaphore(settings.LOGIN_MAX_PENDING_HASHES)
+        return _pool, _pending
+
+
+def _shutdown_pool():
+    # A pool left to the garbage collector at interpreter shutdown finds the
+    # lazily imported modules already torn down.
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown()
+
+
+def check_password(password, encoded):
+    if not settings.LOGIN_HASHING_PROCESSES:
+        return _check(password, encoded)
+    import multiprocessing
+
+    # Daemonic processes (e.g. the workers of `manage.py test --parallel`)
+    # cannot start a process pool.
+    if multiprocessing.current_process().daemon:
+        return _check(password, encoded)
+
+    pool, pending = _get_pool()
+    with pending:
+        return pool.submit(_check, password, encoded).result()
+
+
+def authenticate_user(request, username, password):
+    if settings.LOGIN_PIPELINE == PIPELINE_DJANGO:
+        return authenticate(request=request, username=username, password=password)
+
+    user = (
+        User.objects
+        .select_related('auth_token')
+        .filter(username=username)
+        .first()
+    )
+
+    # Unknown users still pay for one hash, so response times do not reveal
+    # which usernames exist.
+    is_correct, upgraded = check_password(password, user.password if user else None)
+    if not is_correct or not user.is_active:
+        user_login_failed.send(sender=__name__, credentials={'username': username}, request=request)
+        return None
+
+    if upgraded is not None:
+        user.password = upgraded
+        User.objects.filter(pk=user.pk).update(password=upgraded)
+    return user
+
+
+def token_for(user):
+    """
+    Returns the user's API token, creating it if needed. Uses the token
+    fetched together with the user by `authenticate_user` when available.
+    """
+    try:
+        return user.auth_token
+    except Token.DoesNotExist:
+        pass
+
+    try:
+        with transaction.atomic():
+            return Token.objects.create(user=user)
+    except IntegrityError:
+        return Token.objects.get(user=user)
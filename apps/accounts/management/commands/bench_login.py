@@ -0,0 +1,72 @@
+import os
+import threading
+import uuid
+from time import perf_counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from apps.accounts import login
+from apps.accounts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures logins/sec of the login pipelines. "
+        "Writes benchmark users into the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--logins', type=int, default=20, help="Logins per thread.")
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--processes', type=int, default=os.cpu_count())
+
+    def handle(self, *args, users, logins, threads, processes, **options):
+        password = uuid.uuid4().hex
+        encoded = make_password(password)
+        prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        User.objects.bulk_create_users([
+            User(username=f"{prefix}-{i}", password=encoded) for i in range(users)
+        ])
+        usernames = [f"{prefix}-{i}" for i in range(users)]
+
+        cores = os.cpu_count()
+        self.stdout.write(f"{'pipeline':<22} {'logins/s':>10} {'per core':>10}")
+        for name, pipeline, pool_size in (
+            ("django", login.PIPELINE_DJANGO, 0),
+            ("fast, inline", login.PIPELINE_FAST, 0),
+            (f"fast, {processes} processes", login.PIPELINE_FAST, processes),
+        ):
+            with override_settings(LOGIN_PIPELINE=pipeline, LOGIN_HASHING_PROCESSES=pool_size):
+                rate = self.run_round(usernames, password, threads, logins)
+            self.stdout.write(f"{name:<22} {rate:>10.1f} {rate / cores:>10.1f}")
+
+    def run_round(self, usernames, password, threads, logins):
+        failures = []
+
+        def work(worker):
+            try:
+                for i in range(logins):
+                    username = usernames[(worker * logins + i) % len(usernames)]
+                    user = login.authenticate_user(None, username, password)
+                    if user is None:
+                        failures.append(username)
+                        continue
+                    login.token_for(user)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=work, args=(n,)) for n in range(threads)]
+        started = perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = perf_counter() - started
+
+        if failures:
+            raise CommandError(f"{len(failures)} logins failed")
+        return threads * logins / elapsed
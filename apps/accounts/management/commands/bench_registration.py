@@ -0,0 +1,72 @@
+import uuid
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework import serializers
+
+from apps.accounts.models import User
+from apps.accounts.serializers import UserCreateSerializer
+
+
+class CheckFirstSerializer(UserCreateSerializer):
+    """The previous registration path: query for each unique field, then insert."""
+
+    def validate_username(self, value):
+        if User.objects.filter(username=value).exists():
+            raise serializers.ValidationError('A user with this username already exists.')
+        return value
+
+    def validate_email(self, value):
+        if User.objects.filter(email=value).exists():
+            raise serializers.ValidationError('A user with this email already exists.')
+        return value
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures registrations/sec with check-first and insert-first "
+        "uniqueness validation. Writes benchmark users into the configured "
+        "database; every round is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--existing', type=int, default=100000,
+                            help="Users to seed before measuring.")
+        parser.add_argument('--registrations', type=int, default=500)
+
+    def handle(self, *args, existing, registrations, **options):
+        prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        for start in range(0, existing, 10000):
+            User.objects.bulk_create_users([
+                User(username=f"{prefix}-seed-{i}", email=f"{prefix}-seed-{i}@example.com",
+                     password='!')
+                for i in range(start, min(start + 10000, existing))
+            ])
+
+        # Hashing would dominate both rounds; measure the uniqueness checks.
+        with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+            self.stdout.write(f"{'path':<14} {'registrations/s':>16}")
+            for name, serializer_class in (
+                ("check-first", CheckFirstSerializer),
+                ("insert-first", UserCreateSerializer),
+            ):
+                rate = self.run_round(serializer_class, f"{prefix}-{name}", registrations)
+                self.stdout.write(f"{name:<14} {rate:>16.1f}")
+
+    def run_round(self, serializer_class, prefix, registrations):
+        started = perf_counter()
+        with transaction.atomic():
+            for i in range(registrations):
+                serializer = serializer_class(data={
+                    'username': f"{prefix}-{i}",
+                    'email': f"{prefix}-{i}@example.com",
+                    'password': 'bench-password',
+                    'password_confirm': 'bench-password',
+                })
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+            elapsed = perf_counter() - started
+            transaction.set_rollback(True)
+        return registrations / elapsed
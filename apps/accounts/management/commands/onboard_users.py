@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.onboarding import FORMAT_CSV, FORMAT_NDJSON, onboard_users, read_users
+
+
+class Command(BaseCommand):
+    help = "Creates users, wallets and API tokens in bulk from a CSV or NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=[FORMAT_CSV, FORMAT_NDJSON])
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--processes', type=int, default=None, help="Password hashing processes.")
+        parser.add_argument('--no-tokens', action='store_true', help="Do not create API tokens.")
+
+    def handle(self, *args, path, format, chunk_size, processes, no_tokens, **options):
+        format = format or (FORMAT_CSV if path.endswith('.csv') else FORMAT_NDJSON)
+
+        def progress(report):
+            self.stdout.write(
+                f"{report.created} created, {report.skipped} skipped, "
+                f"{report.invalid} invalid, {report.rows_per_second:.0f} rows/s"
+            )
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                report = onboard_users(
+                    read_users(f, format),
+                    chunk_size=chunk_size,
+                    processes=processes,
+                    create_tokens=not no_tokens,
+                    progress=progress,
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in report.errors:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Onboarded {report.created} users in {report.seconds:.1f}s "
+            f"({report.rows_per_second:.0f} rows/s)"
+        ))
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-19 14:20
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def normalize_emails(apps, schema_editor):
+    """Blank emails become NULL so they stay outside the unique index."""
+    User = apps.get_model('accounts', 'User')
+    User.objects.filter(email='').update(email=None)
+    duplicates = list(
+        User.objects.values(email_ci=Lower('email'))
+        .exclude(email_ci=None)
+        .annotate(n=Count('pk'))
+        .filter(n__gt=1)
+        .values_list('email_ci', flat=True)[:10]
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Cannot add case-insensitive email uniqueness; resolve duplicate "
+            "emails first: %s" % ", ".join(duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='unique_user_email_ci', violation_error_message='A user with this email already exists.'),
+        ),
+    ]
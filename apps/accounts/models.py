@@ -2,6 +2,7 @@ from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.db.models.deletion import ProtectedError
+from django.db.models.functions import Lower
 
 from apps.wallets.models import Wallet
 
@@ -10,6 +11,7 @@ class UserManager(BaseUserManager):
     def create_user(self, username, password=None, **extra_fields):
         if not username:
             raise ValueError("Username is required")
+        extra_fields["email"] = extra_fields.get("email") or None
         user = self.model(username=username, **extra_fields)
         user.set_password(password)
         user.wallet = Wallet()
@@ -17,6 +19,28 @@ class UserManager(BaseUserManager):
         user.save()
         return user
 
+    def bulk_create_users(self, users):
+        """
+        Creates many users at once, each with its own wallet, using one
+        multi-row INSERT for the wallets and one for the users. `users` are
+        unsaved `User` instances whose password is already hashed. Returns
+        them with their primary keys set.
+        """
+        wallets = [Wallet() for _ in users]
+        Wallet.objects.bulk_create(wallets)
+        for user, wallet in zip(users, wallets):
+            user.wallet = wallet
+
+        self.bulk_create(users)
+        if users and users[0].pk is None:
+            pks = dict(
+                self.filter(username__in=[u.username for u in users])
+                .values_list("username", "pk")
+            )
+            for user in users:
+                user.pk = pks[user.username]
+        return users
+
     def create_superuser(self, username, password=None, **extra_fields):
         extra_fields.setdefault("is_staff", True)
         extra_fields.setdefault("is_superuser", True)
@@ -33,6 +57,15 @@ class User(AbstractUser):
 
     objects = UserManager()
 
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            models.UniqueConstraint(
+                Lower("email"),
+                name="unique_user_email_ci",
+                violation_error_message="A user with this email already exists.",
+            )
+        ]
+
     def delete(self, *args, **kwargs):
         if self.wallet_id:
             raise ProtectedError(
@@ -0,0 +1,219 @@
+"""
+Bulk onboarding of users from CSV or NDJSON.
+
+Rows are read as a stream and processed in chunks. Passwords of the next
+chunk are hashed in a process pool while the current chunk is inserted, and
+every chunk is written in its own database transaction with one INSERT for
+wallets, one for users and one for tokens. Rows that fail the validation of
+the user fields are reported instead of inserted, and usernames that already
+exist are skipped, so an interrupted import can simply be run again.
+"""
+import csv
+import json
+import logging
+import multiprocessing
+from itertools import islice
+from time import perf_counter
+from typing import NamedTuple
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.functions import Lower
+from rest_framework.authtoken.models import Token
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+FORMAT_CSV = "csv"
+FORMAT_NDJSON = "ndjson"
+
+VALIDATED_FIELDS = ("username", "email", "first_name", "last_name")
+
+# Invalid rows listed in a report; the rest are only counted.
+MAX_REPORTED_ERRORS = 100
+
+
+class OnboardingReport(NamedTuple):
+    created: int
+    skipped: int
+    seconds: float
+    invalid: int = 0
+    # {"row": number from 1, "errors": {field: messages}} per invalid row.
+    errors: tuple = ()
+
+    @property
+    def rows_per_second(self):
+        return (self.created + self.skipped + self.invalid) / self.seconds if self.seconds else 0.0
+
+
+def read_users(stream, format):
+    """
+    Yields user dicts from a text stream in CSV (with a header row) or NDJSON
+    format.
+    """
+    if format == FORMAT_CSV:
+        yield from csv.DictReader(stream)
+    elif format == FORMAT_NDJSON:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unknown format: {format}")
+
+
+def _init_worker():
+    if not apps.ready:
+        django.setup()
+
+
+def _hash_passwords(passwords):
+    return [make_password(password or None) for password in passwords]
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def onboard_users(rows, chunk_size=1000, processes=None, create_tokens=True, progress=None):
+    """
+    Creates a user, a wallet and (optionally) an API token for every row.
+    Returns an `OnboardingReport`; `progress(report)` is called after each
+    chunk.
+    """
+    # Imported here so that API processes, which only import this module for
+    # its formats, do not load the process pool machinery.
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    started = perf_counter()
+    created = skipped = 0
+    errors = []
+    invalid = read = 0
+
+    if multiprocessing.current_process().daemon:
+        # Daemonic processes (e.g. the workers of `manage.py test --parallel`)
+        # cannot start a process pool; hash in a thread instead.
+        pool = ThreadPoolExecutor(max_workers=1)
+    else:
+        pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker)
+    with pool:
+        pending = None
+        for chunk in _chunks(rows, chunk_size):
+            # Rows that cannot be created are dropped before paying for a hash,
+            # which also makes resuming an interrupted import cheap.
+            new_rows, chunk_errors = _new_rows(chunk, read + 1)
+            read += len(chunk)
+            invalid += len(chunk_errors)
+            errors.extend(chunk_errors[:MAX_REPORTED_ERRORS - len(errors)])
+            skipped += len(chunk) - len(new_rows) - len(chunk_errors)
+            hashing = pool.submit(_hash_passwords, [row.get("password") for row in new_rows])
+
+            if pending is not None:
+                created, skipped = _insert(*pending, created, skipped, create_tokens)
+                if progress:
+                    progress(OnboardingReport(created, skipped, perf_counter() - started, invalid, tuple(errors)))
+            pending = (new_rows, hashing)
+
+        if pending is not None:
+            created, skipped = _insert(*pending, created, skipped, create_tokens)
+
+    report = OnboardingReport(created, skipped, perf_counter() - started, invalid, tuple(errors))
+    if progress:
+        progress(report)
+    return report
+
+
+def _errors(row):
+    """The validation messages of a row by field; empty if it is valid."""
+    errors = {}
+    for name in VALIDATED_FIELDS:
+        value = row.get(name) or ""
+        if not isinstance(value, str):
+            errors[name] = ["Must be a string."]
+        elif not value:
+            if name == "username":
+                errors[name] = ["This field is required."]
+        else:
+            try:
+                User._meta.get_field(name).run_validators(value)
+            except ValidationError as e:
+                errors[name] = e.messages
+    return errors
+
+
+def _new_rows(chunk, first_row):
+    """
+    The rows of `chunk` that can be created, and the errors of its invalid
+    rows, numbered from `first_row`.
+    """
+    valid, errors = [], []
+    for number, row in enumerate(chunk, first_row):
+        row_errors = _errors(row) if isinstance(row, dict) else {"row": ["Must be an object."]}
+        if row_errors:
+            errors.append({"row": number, "errors": row_errors})
+        else:
+            valid.append(row)
+
+    existing = _existing_usernames(valid)
+    emails = _existing_emails(valid)
+    new_rows = []
+    for row in valid:
+        username = row["username"]
+        email = (row.get("email") or "").lower()
+        if username not in existing and email not in emails:
+            existing.add(username)
+            if email:
+                emails.add(email)
+            new_rows.append(row)
+    return new_rows, errors
+
+
+def _existing_usernames(rows):
+    return set(
+        User.objects.filter(username__in=[row.get("username") for row in rows])
+        .values_list("username", flat=True)
+    )
+
+
+def _existing_emails(rows):
+    """Lower-cased emails already taken; emails are unique case-insensitively."""
+    emails = [row["email"].lower() for row in rows if row.get("email")]
+    return set(
+        User.objects.annotate(email_ci=Lower("email"))
+        .filter(email_ci__in=emails)
+        .values_list("email_ci", flat=True)
+    )
+
+
+def _insert(rows, hashing, created, skipped, create_tokens):
+    hashes = hashing.result()
+    # The previous chunk may have been inserted after `rows` were filtered.
+    existing = _existing_usernames(rows)
+    emails = _existing_emails(rows)
+
+    users = []
+    for row, password in zip(rows, hashes):
+        if row["username"] in existing or (row.get("email") or "").lower() in emails:
+            skipped += 1
+            continue
+        users.append(User(
+            username=row["username"],
+            email=row.get("email") or None,
+            password=password,
+            first_name=row.get("first_name") or "",
+            last_name=row.get("last_name") or "",
+        ))
+
+    with transaction.atomic():
+        User.objects.bulk_create_users(users)
+        if create_tokens:
+            Token.objects.bulk_create([
+                Token(key=Token.generate_key(), user=user) for user in users
+            ])
+
+    return created + len(users), skipped
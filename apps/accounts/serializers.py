@@ -1,7 +1,12 @@
 from rest_framework import serializers
-from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth import get_user_model
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
 
+from apps.accounts import login
 from apps.accounts.models import User
+from apps.accounts.onboarding import FORMAT_CSV, FORMAT_NDJSON
 
 
 class LoginSerializer(serializers.Serializer):
@@ -13,7 +18,7 @@ class LoginSerializer(serializers.Serializer):
         password = data.get('password')
 
         if username and password:
-            user = authenticate(
+            user = login.authenticate_user(
                 request=self.context.get('request'),
                 username=username,
                 password=password
@@ -65,21 +70,14 @@ class UserCreateSerializer(serializers.ModelSerializer):
         model = User
         fields = ['username', 'email', 'password', 'password_confirm', 'first_name', 'last_name']
         extra_kwargs = {
+            # Uniqueness is enforced by the database on insert (see create),
+            # so drop the UniqueValidator that would query before every signup.
+            'username': {'validators': [UnicodeUsernameValidator()]},
             'email': {'required': True},
             'first_name': {'required': False},
             'last_name': {'required': False}
         }
 
-    def validate_username(self, value):
-        if User.objects.filter(username=value).exists():
-            raise serializers.ValidationError('A user with this username already exists.')
-        return value
-
-    def validate_email(self, value):
-        if User.objects.filter(email=value).exists():
-            raise serializers.ValidationError('A user with this email already exists.')
-        return value
-
     def validate(self, data):
         if data['password'] != data['password_confirm']:
             raise serializers.ValidationError({
@@ -90,6 +88,29 @@ class UserCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password_confirm')
 
-        user = User.objects.create_user(**validated_data)
+        try:
+            with transaction.atomic():
+                return User.objects.create_user(**validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError(self._conflicts(validated_data))
+
+    def _conflicts(self, data):
+        """Work out which unique field an insert collided with."""
+        errors = {}
+        if User.objects.filter(username=data['username']).exists():
+            errors['username'] = ['A user with this username already exists.']
+        email = data.get('email')
+        if email and User.objects.alias(email_ci=Lower('email')).filter(email_ci=email.lower()).exists():
+            errors['email'] = ['A user with this email already exists.']
+        return errors or {'non_field_errors': ['Unable to create user.']}
+
 
-        return user
+class BulkOnboardingSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=[FORMAT_CSV, FORMAT_NDJSON], required=False)
+
+    def validate(self, data):
+        if 'format' not in data:
+            name = data['file'].name or ''
+            data['format'] = FORMAT_CSV if name.endswith('.csv') else FORMAT_NDJSON
+        return data
@@ -1,3 +1,206 @@
-from django.test import TestCase
+import io
+import os
+import subprocess
+import sys
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, identify_hasher, make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.accounts import login
+from apps.accounts.models import User
+from apps.accounts.onboarding import onboard_users, read_users
+from apps.accounts.serializers import UserCreateSerializer
+from apps.jobs.models import Job
+from apps.jobs.worker import Worker
+
+NDJSON = b"""{"username": "alice", "email": "alice@example.com", "password": "secret-pass-1"}
+{"username": "bob", "email": "bob@example.com", "password": "secret-pass-2", "first_name": "Bob"}
+
+{"username": "alice", "email": "alice2@example.com", "password": "other"}
+"""
+
+CSV = """username,email,password,first_name,last_name
+carol,carol@example.com,secret-pass-3,Carol,
+dave,dave@example.com,secret-pass-4,,Dave
+"""
+
+
+INVALID = """{"username": "not valid!", "email": "x@example.com", "password": "secret"}
+{"username": "%s", "password": "secret"}
+{"username": "erin", "email": "not-an-email", "password": "secret"}
+{"email": "nobody@example.com", "password": "secret"}
+{"username": "frank", "email": "frank@example.com", "password": "secret"}
+""" % ('f' * 151)
+
+
+class BulkOnboardingTestCase(TestCase):
+    def test_onboard_users_creates_wallets_and_tokens(self):
+        User.objects.create_user(username='dave', password='testpass123')
+
+        report = onboard_users(read_users(io.StringIO(CSV), 'csv'), chunk_size=1, processes=1)
+
+        self.assertEqual((report.created, report.skipped), (1, 1))
+        carol = User.objects.get(username='carol')
+        self.assertTrue(carol.check_password('secret-pass-3'))
+        self.assertEqual(carol.first_name, 'Carol')
+        self.assertEqual(carol.wallet.balance, 0)
+        self.assertTrue(Token.objects.filter(user=carol).exists())
+        self.assertFalse(Token.objects.filter(user__username='dave').exists())
+
+    def test_duplicates_in_input_are_skipped(self):
+        report = onboard_users(read_users(io.StringIO(NDJSON.decode()), 'ndjson'), processes=1)
+
+        self.assertEqual((report.created, report.skipped), (2, 1))
+        self.assertEqual(User.objects.get(username='alice').email, 'alice@example.com')
+
+    def test_invalid_rows_are_reported(self):
+        report = onboard_users(read_users(io.StringIO(INVALID), 'ndjson'), chunk_size=2, processes=1)
+
+        self.assertEqual((report.created, report.skipped, report.invalid), (1, 0, 4))
+        self.assertEqual([error['row'] for error in report.errors], [1, 2, 3, 4])
+        self.assertEqual(list(report.errors[0]['errors']), ['username'])
+        self.assertIn('150 characters', report.errors[1]['errors']['username'][0])
+        self.assertEqual(list(report.errors[2]['errors']), ['email'])
+        self.assertEqual(list(User.objects.filter(username__in=['erin', 'frank']).values_list('username', flat=True)), ['frank'])
+
+    @override_settings(ONBOARDING_UPLOAD_DIR='/tmp/wallet-ledger-test-uploads')
+    def test_bulk_register_api_enqueues_job(self):
+        admin = User.objects.create_superuser(username='admin', password='testpass123')
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        response = client.post('/api/auth/bulk-register/', {
+            'file': SimpleUploadedFile('users.ndjson', NDJSON),
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 202)
+        Worker(name='test').run(burst=True)
+        self.assertTrue(User.objects.filter(username='bob', first_name='Bob').exists())
+        job = Job.objects.get(pk=response.data['job'])
+        self.assertEqual(job.status, Job.Status.done)
+        self.assertFalse(os.path.exists(job.params['path']))
+
+    def test_bulk_register_requires_admin(self):
+        user = User.objects.create_user(username='regular', password='testpass123')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.post('/api/auth/bulk-register/', {
+            'file': SimpleUploadedFile('users.ndjson', NDJSON),
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 403)
+
+
+class LoginPipelineTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='login_user', password='testpass123')
+
+    def test_login_returns_same_token(self):
+        client = APIClient()
+        first = client.post('/api/auth/login/', {'username': 'login_user', 'password': 'testpass123'})
+        second = client.post('/api/auth/login/', {'username': 'login_user', 'password': 'testpass123'})
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data['token'], second.data['token'])
+        self.assertEqual(first.data['token'], Token.objects.get(user=self.user).key)
+
+    def test_user_and_token_are_fetched_together(self):
+        Token.objects.create(user=self.user)
+
+        with self.assertNumQueries(1):
+            user = login.authenticate_user(None, 'login_user', 'testpass123')
+            login.token_for(user)
+
+    def test_wrong_password_and_unknown_user_fail(self):
+        self.assertIsNone(login.authenticate_user(None, 'login_user', 'wrong'))
+        self.assertIsNone(login.authenticate_user(None, 'nobody', 'testpass123'))
+
+    def test_inactive_user_cannot_log_in(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(login.authenticate_user(None, 'login_user', 'testpass123'))
+
+    def test_outdated_hash_is_upgraded_on_login(self):
+        User.objects.filter(pk=self.user.pk).update(
+            password=make_password('testpass123', hasher='pbkdf2_sha1')
+        )
+
+        self.assertIsNotNone(login.authenticate_user(None, 'login_user', 'testpass123'))
+
+        self.user.refresh_from_db()
+        self.assertEqual(identify_hasher(self.user.password).algorithm, get_hasher().algorithm)
+        self.assertTrue(self.user.check_password('testpass123'))
+
+    @override_settings(LOGIN_HASHING_PROCESSES=1)
+    def test_hashing_in_process_pool(self):
+        self.assertEqual(login.authenticate_user(None, 'login_user', 'testpass123'), self.user)
+        self.assertIsNone(login.authenticate_user(None, 'login_user', 'wrong'))
+
+    def test_process_pool_is_imported_on_first_use_and_shut_down_at_exit(self):
+        script = (
+            "import sys, django\n"
+            "django.setup()\n"
+            "from django.conf import settings\n"
+            "from django.contrib.auth.hashers import make_password\n"
+            "from apps.accounts import login\n"
+            "print('concurrent.futures.process' in sys.modules)\n"
+            "settings.LOGIN_HASHING_PROCESSES = 1\n"
+            "print(login.check_password('secret', make_password('secret'))[0])\n"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script],
+            capture_output=True, text=True, cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'wallet_ledger.settings'},
+        )
+
+        self.assertEqual(result.stdout.split(), ['False', 'True'])
+        self.assertEqual(result.stderr, '')
+
+
+class RegistrationUniquenessTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username='taken', email='Taken@Example.com', password='testpass123')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def register(self, username, email):
+        return self.client.post('/api/auth/register/', {
+            'username': username,
+            'email': email,
+            'password': 'testpass123',
+            'password_confirm': 'testpass123',
+        }, format='json')
+
+    def test_registration_does_not_query_before_insert(self):
+        serializer = UserCreateSerializer(data={
+            'username': 'fresh', 'email': 'fresh@example.com',
+            'password': 'testpass123', 'password_confirm': 'testpass123',
+        })
+        with self.assertNumQueries(0):
+            self.assertTrue(serializer.is_valid())
+
+    def test_duplicate_username_is_a_field_error(self):
+        response = self.register('taken', 'other@example.com')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'username': ['A user with this username already exists.']})
+
+    def test_email_is_unique_case_insensitively(self):
+        response = self.register('someone', 'taken@example.COM')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'email': ['A user with this email already exists.']})
+        self.assertFalse(User.objects.filter(username='someone').exists())
+
+    def test_users_without_email_do_not_conflict(self):
+        User.objects.create_user(username='no_email_1', email='', password='testpass123')
+        User.objects.create_user(username='no_email_2', password='testpass123')
+
+        self.assertEqual(User.objects.filter(email__isnull=True).count(), 2)
@@ -6,4 +6,5 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('profile/', views.user_profile_view, name='user-profile'),
     path('register/', views.create_user, name='create-user'),
+    path('bulk-register/', views.bulk_onboarding, name='bulk-onboarding'),
 ]
@@ -1,11 +1,18 @@
+import uuid
+from pathlib import Path
+
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.authtoken.models import Token
+from django.conf import settings
 from django.contrib.auth import get_user_model
 
-from .serializers import LoginSerializer, UserSerializer, UserCreateSerializer
+from apps.jobs import registry
+from . import login
+from .serializers import LoginSerializer, UserSerializer, UserCreateSerializer, BulkOnboardingSerializer
 
 User = get_user_model()
 
@@ -19,7 +26,7 @@ def login_view(request):
     user = serializer.validated_data['user']
 
     # Get or create token
-    token, created = Token.objects.get_or_create(user=user)
+    token = login.token_for(user)
 
     return Response({
         'token': token.key,
@@ -66,3 +73,30 @@ def create_user(request):
         }, status=status.HTTP_201_CREATED)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+@parser_classes([MultiPartParser])
+def bulk_onboarding(request):
+    serializer = BulkOnboardingSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    directory = Path(settings.ONBOARDING_UPLOAD_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{uuid.uuid4()}.{serializer.validated_data['format']}"
+    with open(path, 'wb') as f:
+        for chunk in serializer.validated_data['file'].chunks():
+            f.write(chunk)
+
+    job = registry.enqueue(
+        'accounts.onboard_users',
+        path=str(path),
+        format=serializer.validated_data['format'],
+        uploaded=True,
+    )
+
+    return Response({
+        'message': 'Onboarding started.',
+        'job': job.pk,
+    }, status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,22 @@
+from django.contrib import admin
+
+from . import models
+
+
+class JobChunkInline(admin.TabularInline):
+    model = models.JobChunk
+    extra = 0
+    can_delete = False
+    fields = ("status", "attempts", "worker", "started_at", "finished_at", "items_processed", "error")
+    readonly_fields = fields
+
+
+@admin.register(models.Job)
+class JobModelAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "created_at", "items_processed", "duration", "throughput")
+    list_filter = ("name", "status")
+    readonly_fields = ("duration", "throughput")
+    inlines = [JobChunkInline]
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Job
+from .registry import register
+
+
+@register('jobs.prune_history')
+def prune_history(**params):
+    """
+    Deletes the jobs that finished more than `JOBS_HISTORY_DAYS` ago, with
+    their chunks. Frequent jobs, such as the scheduled transfers every
+    minute, would otherwise grow the job tables without bound.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.JOBS_HISTORY_DAYS)
+    _, deleted = Job.objects.filter(finished_at__lt=cutoff).delete()
+    return {'items': deleted.get(Job._meta.label, 0)}
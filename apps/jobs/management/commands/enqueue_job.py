@@ -0,0 +1,27 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.jobs import registry
+
+
+class Command(BaseCommand):
+    help = "Enqueues a registered background job"
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?')
+        parser.add_argument('--params', default='{}', help="Job parameters as a JSON object.")
+        parser.add_argument('--list', action='store_true', dest='list_jobs', help="List registered jobs.")
+
+    def handle(self, *args, name, params, list_jobs, **options):
+        if list_jobs or not name:
+            for job_name in registry.names():
+                self.stdout.write(job_name)
+            return
+
+        try:
+            job = registry.enqueue(name, **json.loads(params))
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"Enqueued {job} with {job.chunks_total} chunks")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.jobs.models import Job
+
+
+class Command(BaseCommand):
+    help = "Shows duration and throughput of recent job runs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?')
+        parser.add_argument('--limit', type=int, default=20)
+
+    def handle(self, *args, name, limit, **options):
+        jobs = Job.objects.order_by('-created_at')
+        if name:
+            jobs = jobs.filter(name=name)
+
+        for job in jobs[:limit]:
+            duration = f"{job.duration:.2f}s" if job.duration is not None else "-"
+            throughput = f"{job.throughput:.1f}/s" if job.throughput is not None else "-"
+            self.stdout.write(
+                f"{job.pk:>6} {job.name:<35} {job.status:<8} "
+                f"{job.items_processed:>10} items {duration:>10} {throughput:>12}"
+            )
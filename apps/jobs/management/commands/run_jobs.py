@@ -0,0 +1,39 @@
+import multiprocessing
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.jobs.worker import Worker
+
+
+def run_worker_process(burst):
+    django.setup()
+    Worker().run(burst=burst)
+
+
+class Command(BaseCommand):
+    help = "Runs background job workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help="Exit once the queue is empty instead of polling for new jobs.",
+        )
+
+    def handle(self, *args, processes, burst, **options):
+        if processes == 1:
+            Worker().run(burst=burst)
+            return
+
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=run_worker_process, args=(burst,))
+            for _ in range(processes)
+        ]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
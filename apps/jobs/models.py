@@ -0,0 +1,66 @@
+from django.db import models
+
+
+class Job(models.Model):
+    class Status(models.TextChoices):
+        pending = "PENDING", "Pending"
+        running = "RUNNING", "Running"
+        done = "DONE", "Done"
+        failed = "FAILED", "Failed"
+
+    name = models.CharField(max_length=100)
+    params = models.JSONField(default=dict)
+    status = models.CharField(choices=Status.choices, max_length=10, default=Status.pending)
+    scheduled_for = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    chunks_total = models.PositiveIntegerField(default=0)
+    items_processed = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "scheduled_for"],
+                name="unique_job_schedule"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["name", "-created_at"], name="job_name_created_idx"),
+        ]
+
+    @property
+    def duration(self):
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+    @property
+    def throughput(self):
+        duration = self.duration
+        if not duration:
+            return None
+        return self.items_processed / duration
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}"
+
+
+class JobChunk(models.Model):
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='chunks')
+    params = models.JSONField(default=dict)
+    status = models.CharField(choices=Job.Status.choices, max_length=10, default=Job.Status.pending)
+    run_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    items_processed = models.PositiveBigIntegerField(default=0)
+    result = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_at"], name="jobchunk_status_run_at_idx"),
+        ]
@@ -0,0 +1,70 @@
+from typing import Callable, NamedTuple, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+
+class JobSpec(NamedTuple):
+    name: str
+    handler: Callable
+    chunks: Optional[Callable]
+
+
+_registry = {}
+
+
+def register(name, chunks=None):
+    """
+    Registers `handler(**params)` as the job called `name`.
+
+    `chunks(**params)`, if given, splits a run into independent units of work
+    by yielding one params dict per chunk. Handlers must be safe to re-run on
+    the same chunk, because an expired lease hands the chunk to another worker.
+    Handlers return a dict that is stored as the chunk result; its `items`
+    key is used for throughput accounting.
+    """
+    def decorator(handler):
+        _registry[name] = JobSpec(name, handler, chunks)
+        return handler
+
+    return decorator
+
+
+def get(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f"Unknown job: {name}")
+
+
+def names():
+    return sorted(_registry)
+
+
+def enqueue(name, scheduled_for=None, **params):
+    from .models import Job, JobChunk
+    from .worker import finalize_job
+
+    spec = get(name)
+    if spec.chunks is None:
+        chunk_params = [params]
+    else:
+        chunk_params = list(spec.chunks(**params))
+
+    with transaction.atomic():
+        job = Job.objects.create(
+            name=name,
+            params=params,
+            scheduled_for=scheduled_for,
+            chunks_total=len(chunk_params),
+        )
+        JobChunk.objects.bulk_create(
+            [JobChunk(job=job, params=p) for p in chunk_params]
+        )
+
+    if not chunk_params:
+        job.started_at = timezone.now()
+        job.save(update_fields=['started_at'])
+        finalize_job(job.pk)
+        job.refresh_from_db()
+    return job
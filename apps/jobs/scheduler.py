@@ -0,0 +1,53 @@
+import logging
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+
+from . import registry
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def last_due_time(at, now):
+    """
+    The latest run of a schedule entry at or before `now`. `at` is either a
+    daily "HH:MM" or "*/N" for every N minutes, aligned to the hour.
+    """
+    if at.startswith('*/'):
+        every = int(at[2:])
+        now = now.replace(second=0, microsecond=0)
+        return now - timedelta(minutes=now.minute % every)
+
+    hour, minute = (int(part) for part in at.split(':'))
+    local_now = timezone.localtime(now)
+    due = timezone.make_aware(
+        datetime.combine(local_now.date(), time(hour, minute)),
+        local_now.tzinfo,
+    )
+    if due > local_now:
+        due -= timedelta(days=1)
+    return due
+
+
+def enqueue_due(now=None):
+    """
+    Enqueues every `JOBS_SCHEDULE` entry whose latest run has not been
+    created yet. The (name, scheduled_for) unique constraint makes this safe
+    to call from any number of workers at once.
+    """
+    now = now or timezone.now()
+    enqueued = []
+    for entry in getattr(settings, 'JOBS_SCHEDULE', []):
+        at, name, params = (tuple(entry) + ({},))[:3]
+        due = last_due_time(at, now)
+        if Job.objects.filter(name=name, scheduled_for=due).exists():
+            continue
+        try:
+            enqueued.append(registry.enqueue(name, scheduled_for=due, **params))
+        except IntegrityError:
+            continue
+        logger.info("Scheduled %s for %s", name, due.isoformat())
+    return enqueued
@@ -0,0 +1,153 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from apps.jobs import registry, scheduler
+from apps.jobs.models import Job, JobChunk
+from apps.jobs.worker import Worker
+from apps.wallets.models import Transaction
+
+User = get_user_model()
+
+
+class JobRunnerTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.wallets = []
+        for i in range(3):
+            user = User.objects.create_user(username=f'job_user{i}', password='testpass123')
+            Transaction.objects.deposit(
+                wallet=user.wallet,
+                amount=100 * (i + 1),
+                reference=f'JOBDEP{i}',
+            )
+            cls.wallets.append(user.wallet)
+
+    def test_checkpoint_runs_in_chunks_and_records_history(self):
+        job = registry.enqueue('wallets.checkpoint_balances', chunk_size=2)
+        self.assertEqual(job.chunks_total, 2)
+
+        Worker(name='test').run(burst=True)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.done)
+        self.assertEqual(job.items_processed, 3)
+        self.assertIsNotNone(job.duration)
+
+        for i, wallet in enumerate(self.wallets):
+            wallet.refresh_from_db()
+            self.assertEqual(wallet.last_balance, 100 * (i + 1))
+            self.assertEqual(wallet.balance, 100 * (i + 1))
+
+    def test_verify_integrity_reports_mismatches(self):
+        registry.enqueue('wallets.checkpoint_balances')
+        Worker(name='test').run(burst=True)
+
+        broken = self.wallets[0]
+        broken.refresh_from_db()
+        broken.last_balance += 1
+        broken.save(update_fields=['last_balance'])
+
+        job = registry.enqueue('wallets.verify_integrity')
+        Worker(name='test').run(burst=True)
+
+        mismatches = [m for chunk in job.chunks.all() for m in chunk.result['mismatches']]
+        self.assertEqual(mismatches, [{
+            'wallet': str(broken.pk),
+            'currency': 'USD',
+            'last_balance': 101,
+            'expected': 100,
+        }])
+
+    def test_expired_lease_is_reclaimed(self):
+        job = registry.enqueue('wallets.checkpoint_balances')
+        JobChunk.objects.filter(job=job).update(
+            status=Job.Status.running,
+            attempts=1,
+            heartbeat_at=timezone.now() - timedelta(hours=1),
+        )
+
+        Worker(name='test', lease_seconds=60).run(burst=True)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.done)
+        self.assertEqual(job.chunks.get().attempts, 2)
+
+    def test_chunk_whose_lease_expired_on_every_attempt_fails(self):
+        job = registry.enqueue('wallets.checkpoint_balances')
+        job.chunks.update(
+            status=Job.Status.running,
+            attempts=2,
+            heartbeat_at=timezone.now() - timedelta(hours=1),
+        )
+
+        with self.assertLogs('apps.jobs.worker', level='ERROR'):
+            Worker(name='test', lease_seconds=60, max_attempts=2).run(burst=True)
+
+        job.refresh_from_db()
+        chunk = job.chunks.get()
+        self.assertEqual(job.status, Job.Status.failed)
+        self.assertEqual((chunk.status, chunk.attempts), (Job.Status.failed, 2))
+        self.assertIn('Lease expired', chunk.error)
+
+    def test_failed_chunk_is_retried_until_exhausted(self):
+        job = registry.enqueue('wallets.checkpoint_balances')
+        job.chunks.update(params={'first': 'not-a-uuid', 'last': 'not-a-uuid'})
+
+        worker = Worker(name='test', max_attempts=2)
+        for _ in range(2):
+            chunk = worker.claim()
+            with self.assertLogs('apps.jobs.worker', level='ERROR'):
+                worker.execute(chunk)
+            job.chunks.update(run_at=timezone.now())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.failed)
+        self.assertIn('not-a-uuid', job.chunks.get().error)
+
+    def test_prune_history_deletes_old_finished_jobs(self):
+        old = registry.enqueue('wallets.checkpoint_balances')
+        recent = registry.enqueue('wallets.checkpoint_balances')
+        Worker(name='test').run(burst=True)
+        Job.objects.filter(pk=old.pk).update(finished_at=timezone.now() - timedelta(days=8))
+
+        job = registry.enqueue('jobs.prune_history')
+        Worker(name='test').run(burst=True)
+
+        self.assertEqual(job.chunks.get().result, {'items': 1})
+        self.assertFalse(Job.objects.filter(pk=old.pk).exists())
+        self.assertFalse(JobChunk.objects.filter(job_id=old.pk).exists())
+        self.assertTrue(Job.objects.filter(pk=recent.pk).exists())
+
+    @override_settings(JOBS_SCHEDULE=[('00:00', 'wallets.checkpoint_balances')])
+    def test_schedule_enqueues_once_per_day(self):
+        self.assertEqual(len(scheduler.enqueue_due()), 1)
+        self.assertEqual(len(scheduler.enqueue_due()), 0)
+        self.assertEqual(Job.objects.filter(name='wallets.checkpoint_balances').count(), 1)
+
+    def test_interval_schedule_runs_every_n_minutes(self):
+        now = timezone.now().replace(hour=10, minute=7, second=30)
+
+        self.assertEqual(scheduler.last_due_time('*/5', now), now.replace(minute=5, second=0, microsecond=0))
+        self.assertEqual(scheduler.last_due_time('*/1', now), now.replace(second=0, microsecond=0))
+
+
+class HeartbeatTestCase(TransactionTestCase):
+    def setUp(self):
+        registry.register('tests.slow')(lambda seconds: time.sleep(seconds) or {'items': 1})
+        self.addCleanup(registry._registry.pop, 'tests.slow')
+
+    def test_running_chunk_renews_its_lease(self):
+        job = registry.enqueue('tests.slow', seconds=0.5)
+        worker = Worker(name='test', lease_seconds=0.3)
+
+        chunk = worker.claim()
+        worker.execute(chunk)
+
+        chunk.refresh_from_db()
+        self.assertEqual(chunk.status, Job.Status.done)
+        self.assertGreaterEqual(chunk.heartbeat_at - chunk.started_at, timedelta(seconds=0.2))
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.Status.done)
@@ -0,0 +1,198 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from . import registry, scheduler
+from .models import Job, JobChunk
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_INTERVAL = 30
+
+
+def finalize_job(job_id):
+    """
+    Closes a job once none of its chunks is pending or running. Every worker
+    calls this after committing its own chunk, so the last one to finish
+    always sees the complete picture; the conditional update keeps it
+    idempotent.
+    """
+    chunks = JobChunk.objects.filter(job_id=job_id)
+    if chunks.filter(status__in=[Job.Status.pending, Job.Status.running]).exists():
+        return False
+
+    totals = chunks.aggregate(
+        items=Sum('items_processed'),
+        failed=Count('pk', filter=Q(status=Job.Status.failed)),
+    )
+    return bool(
+        Job.objects
+        .filter(pk=job_id, finished_at__isnull=True)
+        .update(
+            status=Job.Status.failed if totals['failed'] else Job.Status.done,
+            finished_at=timezone.now(),
+            items_processed=totals['items'] or 0,
+        )
+    )
+
+
+class Heartbeat(threading.Thread):
+    """
+    Renews the lease of a running chunk every third of the lease while its
+    handler runs, so a chunk that runs longer than the lease is not handed
+    to another worker. Stops by itself once the lease was taken over.
+    """
+
+    def __init__(self, owned, lease_seconds):
+        super().__init__(name="job-heartbeat", daemon=True)
+        self.owned = owned.filter(status=Job.Status.running)
+        self.interval = lease_seconds / 3
+        self._done = threading.Event()
+
+    def run(self):
+        try:
+            while not self._done.wait(self.interval):
+                try:
+                    if not self.owned.update(heartbeat_at=timezone.now()):
+                        return
+                except DatabaseError:
+                    logger.exception("Could not renew the lease of a job chunk")
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._done.set()
+        self.join()
+
+
+class Worker:
+    def __init__(self, name=None, lease_seconds=None, max_attempts=None, poll_interval=None):
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds or settings.JOBS_LEASE_SECONDS
+        self.max_attempts = max_attempts or settings.JOBS_MAX_ATTEMPTS
+        self.poll_interval = poll_interval or settings.JOBS_POLL_INTERVAL
+        self._stopped = False
+        self._last_schedule_check = 0
+
+    def stop(self, *args):
+        self._stopped = True
+
+    def claim(self):
+        now = timezone.now()
+        expired = now - timedelta(seconds=self.lease_seconds)
+        candidates = (
+            JobChunk.objects
+            .filter(
+                Q(status=Job.Status.pending, run_at__lte=now)
+                | Q(status=Job.Status.running, heartbeat_at__lt=expired)
+            )
+            .order_by('run_at', 'pk')
+            .values_list('pk', 'status', 'attempts')[:10]
+        )
+        for pk, status, attempts in candidates:
+            # `attempts` doubles as a fencing token: only one worker can move
+            # the chunk from this exact state, and a worker whose lease was
+            # taken over can no longer write its outcome.
+            if status == Job.Status.running and attempts >= self.max_attempts:
+                self.abandon(pk, attempts)
+                continue
+            claimed = (
+                JobChunk.objects
+                .filter(pk=pk, status=status, attempts=attempts)
+                .update(
+                    status=Job.Status.running,
+                    worker=self.name,
+                    heartbeat_at=now,
+                    started_at=now,
+                    attempts=F('attempts') + 1,
+                )
+            )
+            if claimed:
+                return JobChunk.objects.select_related('job').get(pk=pk)
+        return None
+
+    def abandon(self, pk, attempts):
+        """Fails a chunk whose every attempt lost its worker."""
+        chunk = JobChunk.objects.filter(pk=pk, status=Job.Status.running, attempts=attempts)
+        job_id = chunk.values_list('job_id', flat=True).first()
+        abandoned = chunk.update(
+            status=Job.Status.failed,
+            finished_at=timezone.now(),
+            error=f"Lease expired on each of {attempts} attempts",
+        )
+        if abandoned:
+            logger.error("Job chunk %s failed: lease expired on each of %s attempts", pk, attempts)
+            finalize_job(job_id)
+
+    def execute(self, chunk):
+        Job.objects.filter(pk=chunk.job_id, started_at__isnull=True).update(
+            status=Job.Status.running,
+            started_at=chunk.started_at,
+        )
+        owned = JobChunk.objects.filter(pk=chunk.pk, attempts=chunk.attempts)
+
+        try:
+            spec = registry.get(chunk.job.name)
+            with Heartbeat(owned, self.lease_seconds):
+                result = spec.handler(**chunk.params) or {}
+        except Exception:
+            logger.exception("Job %s chunk %s failed", chunk.job, chunk.pk)
+            exhausted = chunk.attempts >= self.max_attempts
+            owned.update(
+                status=Job.Status.failed if exhausted else Job.Status.pending,
+                run_at=timezone.now() + timedelta(seconds=2 ** chunk.attempts),
+                finished_at=timezone.now() if exhausted else None,
+                error=traceback.format_exc(),
+            )
+        else:
+            owned.update(
+                status=Job.Status.done,
+                finished_at=timezone.now(),
+                items_processed=result.get('items', 0),
+                result=result,
+                error='',
+            )
+
+        finalize_job(chunk.job_id)
+
+    def run(self, burst=False):
+        """
+        Processes chunks until stopped. In `burst` mode the worker exits as
+        soon as the queue is drained and does not enqueue scheduled jobs.
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+        logger.info("Worker %s started", self.name)
+
+        while not self._stopped:
+            if not connection.in_atomic_block:
+                close_old_connections()
+
+            if not burst and time.monotonic() - self._last_schedule_check > SCHEDULER_INTERVAL:
+                scheduler.enqueue_due()
+                self._last_schedule_check = time.monotonic()
+
+            chunk = self.claim()
+            if chunk is None:
+                if burst:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+
+            self.execute(chunk)
+
+        logger.info("Worker %s stopped", self.name)
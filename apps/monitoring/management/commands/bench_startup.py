@@ -0,0 +1,99 @@
+import json
+import resource
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: loads the WSGI application, then serves one
+# request through it, and prints the timings as JSON.
+PROBE = """
+import json, os, sys
+from time import perf_counter
+
+os.environ['DJANGO_SETTINGS_MODULE'] = sys.argv[1]
+started = perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+loaded = perf_counter()
+
+from wsgiref.util import setup_testing_defaults
+environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[2]}
+if sys.argv[3]:
+    environ['HTTP_AUTHORIZATION'] = 'Token ' + sys.argv[3]
+setup_testing_defaults(environ)
+statuses = []
+b''.join(application(environ, lambda status, headers, *args: statuses.append(status)))
+responded = perf_counter()
+
+print(json.dumps({
+    'import': loaded - started,
+    'first_response': responded - loaded,
+    'status': statuses[0],
+    'modules': len(sys.modules),
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the cold start of a worker for each settings module: the wall "
+        "and CPU time of the whole process, the time to import and set up the "
+        "WSGI application and the time to serve the first request, each the "
+        "median over fresh interpreters."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settings-modules', default='wallet_ledger.settings,wallet_ledger.settings_api',
+                            help="Comma separated settings modules to compare.")
+        parser.add_argument('--path', default='/api/wallets/me/', help="Path of the first request.")
+        parser.add_argument('--token', default='',
+                            help="API token for the first request; without it the request is refused "
+                                 "with 401 before any database query.")
+        parser.add_argument('--runs', type=int, default=5)
+
+    def handle(self, *args, settings_modules, path, token, runs, **options):
+        self.stdout.write(
+            f"{'settings':<28} {'process ms':>11} {'cpu ms':>8} {'import ms':>10} {'first response ms':>18} "
+            f"{'modules':>8} {'status':>8}"
+        )
+        modules = settings_modules.split(',')
+        # Runs alternate between the settings modules, so that a change of
+        # load on the machine affects them alike.
+        results = {module: [] for module in modules}
+        for _ in range(runs):
+            for module in modules:
+                results[module].append(self.probe(module, path, token))
+        for module, samples in results.items():
+            self.stdout.write(
+                f"{module:<28} {self.median(samples, 'process'):>11.1f} {self.median(samples, 'cpu'):>8.1f} "
+                f"{self.median(samples, 'import'):>10.1f} {self.median(samples, 'first_response'):>18.1f} "
+                f"{samples[0]['modules']:>8} {samples[0]['status'].split()[0]:>8}"
+            )
+
+    def probe(self, module, path, token):
+        cpu = self.children_cpu()
+        started = perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE, module, path, token],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"{module} failed to start:\n{result.stderr}")
+        return {
+            **json.loads(result.stdout.splitlines()[-1]),
+            'process': perf_counter() - started,
+            'cpu': self.children_cpu() - cpu,
+        }
+
+    @staticmethod
+    def children_cpu():
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+
+    @staticmethod
+    def median(samples, key):
+        return statistics.median(sample[key] for sample in samples) * 1000
@@ -0,0 +1,101 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from wallet_ledger import settings_api
+
+from apps.monitoring.metrics import Counter, Histogram, _registry
+from apps.wallets.instrumentation import WRITE_PHASE_SECONDS
+from apps.wallets.models import Transaction
+
+User = get_user_model()
+
+
+class MetricsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.wallet = User.objects.create_user(username='metrics_user', password='testpass123').wallet
+
+    def tearDown(self):
+        for metric in list(_registry):
+            if metric.name.startswith('test_'):
+                _registry.remove(metric)
+
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = Histogram('test_seconds', 'Test.', labelnames=('kind',), buckets=(0.1, 1))
+        histogram.observe(0.05, kind='a')
+        histogram.observe(0.5, kind='a')
+        histogram.observe(5, kind='a')
+
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{kind="a",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{kind="a",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{kind="a",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_count{kind="a"} 3', lines)
+
+    def test_counter_rejects_unknown_labels(self):
+        counter = Counter('test_events', 'Test.', labelnames=('kind',))
+        with self.assertRaises(ValueError):
+            counter.inc(other='x')
+
+    def test_ledger_writes_are_timed_per_phase(self):
+        before = {
+            phase: WRITE_PHASE_SECONDS.count(type=Transaction.Type.withdrawal, phase=phase)
+            for phase in ('idempotency', 'lock', 'balance', 'insert', 'commit')
+        }
+        Transaction.objects.deposit(wallet=self.wallet, amount=100, reference='MET1')
+        Transaction.objects.withdraw(wallet=self.wallet, amount=40, reference='MET2')
+
+        for phase, count in before.items():
+            self.assertEqual(
+                WRITE_PHASE_SECONDS.count(type=Transaction.Type.withdrawal, phase=phase),
+                count + 1,
+                phase,
+            )
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'ledger_write_phase_seconds_count{type="WITHDRAWAL",phase="lock"}',
+            response.content.decode(),
+        )
+
+    @override_settings(LEDGER_LOCK_WAIT_LOG_MS=0)
+    def test_slow_lock_logs_wallet(self):
+        with self.assertLogs('apps.wallets.instrumentation', level='WARNING') as logs:
+            Transaction.objects.deposit(wallet=self.wallet, amount=100, reference='MET3')
+        self.assertIn(str(self.wallet.pk), logs.output[0])
+
+
+@override_settings(
+    MIDDLEWARE=settings_api.MIDDLEWARE,
+    ROOT_URLCONF=settings_api.ROOT_URLCONF,
+    REST_FRAMEWORK=settings_api.REST_FRAMEWORK,
+)
+class ApiSettingsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username='api_user', password='testpass123')
+
+    def test_token_api_works_without_sessions_and_csrf(self):
+        client = APIClient(enforce_csrf_checks=True)
+        response = client.post('/api/auth/login/', {'username': 'api_user', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, 200)
+
+        client.credentials(HTTP_AUTHORIZATION='Token ' + response.data['token'])
+        response = client.post('/api/wallets/me/deposit', {'amount': 100, 'reference': 'API1'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(client.get('/api/wallets/me/').data['balance'], 100)
+        self.assertEqual(client.get('/admin/').status_code, 404)
+        self.assertEqual(client.get('/metrics').status_code, 200)
+
+    def test_startup_benchmark(self):
+        out = io.StringIO()
+        call_command('bench_startup', '--settings-modules', 'wallet_ledger.settings_api', '--runs', '1', stdout=out)
+
+        self.assertIn('wallet_ledger.settings_api', out.getvalue())
+        self.assertIn('401', out.getvalue())
@@ -0,0 +1,52 @@
+"""
+Single-writer queues for hot wallets.
+
+Wallets listed in `LEDGER_ACTOR_WALLETS` are hashed onto
+`LEDGER_ACTOR_SHARDS` writer threads. Each writer applies the operations
+queued for its shard in micro-batches, taking the wallet locks once and
+inserting all resulting transactions with one multi-row INSERT, while every
+caller waits for its own result. Writes are keyed by the debited (or, for
+deposits, credited) wallet, so all writes of a wallet are serialised by the
+same writer.
+"""
+import threading
+import uuid
+
+from django.conf import settings
+from django.db import connection
+
+from .batching import Batcher, apply_ledger_batch
+
+_actors = {}
+_actors_lock = threading.Lock()
+
+
+def _is_hot(wallet_pk):
+    hot = settings.LEDGER_ACTOR_WALLETS
+    if hot == "__all__":
+        return True
+    return str(wallet_pk) in {str(pk) for pk in hot}
+
+
+def actor_for(wallet_pk):
+    """
+    Returns the writer for `wallet_pk`, or None when the write should be
+    applied directly: the wallet is not hot, or the caller is inside a
+    database transaction whose uncommitted rows the writer could not see.
+    """
+    if not settings.LEDGER_ACTOR_WALLETS or not _is_hot(wallet_pk):
+        return None
+    if connection.in_atomic_block:
+        return None
+
+    shard = uuid.UUID(str(wallet_pk)).int % settings.LEDGER_ACTOR_SHARDS
+    with _actors_lock:
+        if shard not in _actors:
+            name = f"actor-{shard}"
+            _actors[shard] = Batcher(
+                name,
+                apply_ledger_batch(name),
+                window=settings.LEDGER_ACTOR_BATCH_WINDOW_MS / 1000,
+                max_batch=settings.LEDGER_ACTOR_MAX_BATCH,
+            )
+        return _actors[shard]
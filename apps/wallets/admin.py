@@ -19,7 +19,7 @@ class ImmutableModelAdmin(admin.ModelAdmin):
 @admin.register(models.Wallet)
 class WalletModelAdmin(ImmutableModelAdmin):
     list_display = ("id", "user_link")
-    readonly_fields = ("user_link", "last_balance", "last_balance_update")
+    readonly_fields = ("user_link", "last_balance", "currency_balances", "reserved", "spending_limits", "last_balance_update")
 
     def user_link(self, obj):
         url = reverse(
@@ -33,3 +33,26 @@ class WalletModelAdmin(ImmutableModelAdmin):
 
 
 admin.site.register(models.Transaction, ImmutableModelAdmin)
+
+
+@admin.register(models.JournalEntry)
+class JournalEntryModelAdmin(ImmutableModelAdmin):
+    list_display = ("reference", "created_at")
+    search_fields = ("reference",)
+
+
+@admin.register(models.Hold)
+class HoldModelAdmin(ImmutableModelAdmin):
+    list_display = ("reference", "wallet", "amount", "currency", "status", "expires_at")
+    list_filter = ("status",)
+
+
+@admin.register(models.ScheduledTransfer)
+class ScheduledTransferModelAdmin(ImmutableModelAdmin):
+    list_display = ("reference", "from_wallet", "amount", "currency", "next_run_at", "status", "runs")
+    list_filter = ("status",)
+
+
+@admin.register(models.ExchangeRate)
+class ExchangeRateModelAdmin(admin.ModelAdmin):
+    list_display = ("base", "quote", "rate", "updated_at")
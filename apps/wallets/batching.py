@@ -0,0 +1,123 @@
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from time import monotonic
+
+from django.db import DatabaseError, close_old_connections
+
+from apps.monitoring.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = Histogram(
+    "ledger_batch_size",
+    "Number of ledger operations applied per micro-batch.",
+    labelnames=("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+
+BATCH_FALLBACKS = Counter(
+    "ledger_batch_fallbacks",
+    "Micro-batches that failed as a whole and were retried one operation at a time.",
+    labelnames=("batcher",),
+)
+
+
+def apply_ledger_batch(name):
+    """
+    Returns an `apply_batch` callable for a `Batcher` of ledger operations.
+    The batch is applied in one database transaction; if that transaction
+    fails (e.g. a reference was inserted concurrently by a write outside the
+    batch), every operation is retried in its own transaction so that only
+    the offending ones fail.
+    """
+    def apply(operations):
+        from .models import Transaction
+
+        try:
+            return Transaction.objects.apply_batch(operations)
+        except DatabaseError:
+            logger.warning("Batch of %s operations failed in %s, applying one by one", len(operations), name)
+            BATCH_FALLBACKS.inc(batcher=name)
+
+        results = []
+        for operation in operations:
+            try:
+                results.append(Transaction.objects.apply_batch([operation])[0])
+            except Exception as e:
+                results.append(e)
+        return results
+
+    return apply
+
+
+class Batcher:
+    """
+    Collects items submitted from any thread and hands them to
+    `apply_batch(items)` from a single background thread, in batches of up to
+    `max_batch` items gathered over at most `window` seconds after the first
+    one arrives. `apply_batch` returns one result per item, where an exception
+    instance is raised to that item's caller only.
+    """
+
+    def __init__(self, name, apply_batch, window, max_batch):
+        self.name = name
+        self.apply_batch = apply_batch
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, item):
+        future = Future()
+        self._ensure_started()
+        self._queue.put((item, future))
+        return future
+
+    def _ensure_started(self):
+        with self._lock:
+            # A forked worker inherits the object but not the thread.
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"ledger-batcher-{self.name}",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = monotonic() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        BATCH_SIZE.observe(len(batch), batcher=self.name)
+        close_old_connections()
+        try:
+            results = self.apply_batch([item for item, _ in batch])
+        except Exception as e:
+            logger.exception("Batch of %s items failed in %s", len(batch), self.name)
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
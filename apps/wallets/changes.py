@@ -0,0 +1,88 @@
+"""
+Change feed of wallets.
+
+Every transaction gets the next `sequence` number of its wallet, so a
+client that remembers the last sequence it has seen can ask for the
+transactions after it (`GET /api/wallets/me/changes?since=<sequence>`, or
+the Server-Sent Events stream `/me/changes/stream`) and wait for new ones.
+
+Waiting is driven by an in-process hub: `TransactionManager` publishes the
+wallets it wrote to once the database transaction has committed, which
+wakes the subscriptions of those wallets in the same process at once.
+Writes committed by other processes are not published here, so waiting
+clients also look at the database every `LEDGER_CHANGES_POLL_SECONDS`.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_subscriptions = defaultdict(set)
+
+
+class Subscription:
+    """
+    Subscription to the changes of one wallet, usable from threads and from
+    coroutines. Subscribe before reading the wallet's transactions, so a
+    change committed in between is not missed.
+    """
+
+    def __init__(self, wallet_pk):
+        self.wallet_pk = wallet_pk
+        self._event = threading.Event()
+        try:
+            self._loop = asyncio.get_running_loop()
+            self._async_event = asyncio.Event()
+        except RuntimeError:
+            self._loop = self._async_event = None
+
+    def __enter__(self):
+        with _lock:
+            _subscriptions[self.wallet_pk].add(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        with _lock:
+            subscriptions = _subscriptions[self.wallet_pk]
+            subscriptions.discard(self)
+            if not subscriptions:
+                del _subscriptions[self.wallet_pk]
+
+    def notify(self):
+        self._event.set()
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._async_event.set)
+            except RuntimeError:
+                # The loop of the subscriber is already closed.
+                pass
+
+    def clear(self):
+        """Forgets the changes notified so far; call before reading them."""
+        self._event.clear()
+        if self._async_event is not None:
+            self._async_event.clear()
+
+    def wait(self, timeout):
+        """Blocks until a change is notified or `timeout` seconds passed."""
+        return self._event.wait(timeout)
+
+    async def wait_async(self, timeout):
+        """Waits until a change is notified or `timeout` seconds passed."""
+        try:
+            await asyncio.wait_for(self._async_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+def subscribe(wallet_pk):
+    return Subscription(wallet_pk)
+
+
+def publish(wallet_pks):
+    """Wakes the subscriptions of the given wallets in this process."""
+    with _lock:
+        subscriptions = [s for pk in wallet_pks for s in _subscriptions.get(pk, ())]
+    for subscription in subscriptions:
+        subscription.notify()
@@ -0,0 +1,46 @@
+"""
+Conditional GETs of wallet reads.
+
+Every ledger write advances `Wallet.version` and stamps `Wallet.updated_at`
+in the same UPDATE, so they change whenever anything a wallet read returns
+can change. They are the validators of the wallet's responses: a client
+that sends back the ETag (or the Last-Modified time) it was given gets
+`304 Not Modified` right after the wallet row is read, without computing a
+balance or serializing a transaction.
+"""
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+def wallet_etag(wallet):
+    # Weak, since the bytes also depend on the negotiated encoding.
+    return f'W/"{wallet.pk.hex}-{wallet.version}"'
+
+
+def wallet_last_modified(wallet):
+    return int(wallet.updated_at.timestamp()) if wallet.updated_at else None
+
+
+def not_modified(request, wallet):
+    """
+    The `304 Not Modified` (or `412 Precondition Failed`) response to a
+    conditional request for the wallet, or None if the view must respond.
+    """
+    response = get_conditional_response(
+        request, etag=wallet_etag(wallet), last_modified=wallet_last_modified(wallet),
+    )
+    if response is not None:
+        add_validators(response, wallet)
+    return response
+
+
+def add_validators(response, wallet):
+    """Sets the ETag and Last-Modified of the wallet on `response`."""
+    response.headers['ETag'] = wallet_etag(wallet)
+    last_modified = wallet_last_modified(wallet)
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    # Only for this user, and to be revalidated before every reuse.
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+    return response
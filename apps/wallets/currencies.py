@@ -0,0 +1,74 @@
+"""
+Currencies and exchange rates.
+
+Amounts are integers in the minor unit of their currency, so same-currency
+writes never leave integer arithmetic. Only cross-currency transfers convert,
+using rates from the `ExchangeRate` table which every process caches for
+`LEDGER_FX_CACHE_SECONDS` instead of reading them on each transfer.
+"""
+import threading
+import time
+from decimal import Decimal, ROUND_DOWN
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+_lock = threading.Lock()
+_rates = {}
+_loaded_at = None
+
+
+def default_currency():
+    return settings.LEDGER_DEFAULT_CURRENCY
+
+
+def check_currency(currency):
+    """Returns `currency`, or the default currency when it is empty."""
+    currency = currency or default_currency()
+    if currency not in settings.LEDGER_CURRENCIES:
+        raise ValidationError(f"Unsupported currency: {currency}")
+    return currency
+
+
+def rate(base, quote):
+    """Units of `quote` per unit of `base`, as a `Decimal`."""
+    if base == quote:
+        return Decimal(1)
+    try:
+        return _cached_rates()[(base, quote)]
+    except KeyError:
+        raise ValidationError(f"No exchange rate from {base} to {quote}") from None
+
+
+def convert(amount, base, quote):
+    """
+    Converts an integer amount of `base` into `quote`, rounding down so a
+    conversion never creates money.
+    """
+    if base == quote:
+        return amount
+    converted = int((amount * rate(base, quote)).to_integral_value(rounding=ROUND_DOWN))
+    if converted <= 0:
+        raise ValidationError("Amount is too small to convert")
+    return converted
+
+
+def clear_cache():
+    global _loaded_at
+    with _lock:
+        _loaded_at = None
+
+
+def _cached_rates():
+    global _rates, _loaded_at
+    with _lock:
+        now = time.monotonic()
+        if _loaded_at is None or now - _loaded_at >= settings.LEDGER_FX_CACHE_SECONDS:
+            from apps.wallets.models import ExchangeRate
+
+            _rates = {
+                (base, quote): value
+                for base, quote, value in ExchangeRate.objects.values_list('base', 'quote', 'rate')
+            }
+            _loaded_at = now
+        return _rates
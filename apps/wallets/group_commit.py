@@ -0,0 +1,36 @@
+"""
+Group commit for deposits.
+
+When `LEDGER_GROUP_COMMIT_WINDOW_MS` is set, concurrent deposits are
+collected for up to that many milliseconds (or until
+`LEDGER_GROUP_COMMIT_MAX_BATCH` deposits are waiting) and written in one
+database transaction, so that many requests share a single commit and its
+fsync. Deposits issued inside an open database transaction are written
+directly.
+"""
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+from .batching import Batcher, apply_ledger_batch
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def batcher_for_deposits():
+    window = settings.LEDGER_GROUP_COMMIT_WINDOW_MS
+    if window is None or connection.in_atomic_block:
+        return None
+
+    key = (window, settings.LEDGER_GROUP_COMMIT_MAX_BATCH)
+    with _batchers_lock:
+        if key not in _batchers:
+            _batchers[key] = Batcher(
+                "group-commit",
+                apply_ledger_batch("group-commit"),
+                window=window / 1000,
+                max_batch=settings.LEDGER_GROUP_COMMIT_MAX_BATCH,
+            )
+        return _batchers[key]
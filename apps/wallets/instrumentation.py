@@ -0,0 +1,77 @@
+import logging
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.monitoring.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+WRITE_PHASE_SECONDS = Histogram(
+    "ledger_write_phase_seconds",
+    "Time spent in each phase of a ledger write.",
+    labelnames=("type", "phase"),
+)
+
+OPTIMISTIC_CONFLICTS = Counter(
+    "ledger_optimistic_conflicts",
+    "Optimistic ledger writes rolled back because a wallet changed underneath them.",
+    labelnames=("type",),
+)
+
+WRITE_RETRIES = Counter(
+    "ledger_write_retries",
+    "Ledger writes retried after a concurrency failure, by reason.",
+    labelnames=("type", "reason"),
+)
+
+WRITE_GIVE_UPS = Counter(
+    "ledger_write_give_ups",
+    "Ledger writes that still failed after the last retry, by reason.",
+    labelnames=("type", "reason"),
+)
+
+
+class WriteTimer:
+    """
+    Times the phases of one ledger write (idempotency probe, lock, balance,
+    insert, commit) into `ledger_write_phase_seconds`, labelled by the
+    transaction type being written.
+    """
+
+    def __init__(self, type):
+        self.type = type
+
+    def observe(self, phase, seconds):
+        WRITE_PHASE_SECONDS.observe(seconds, type=self.type, phase=phase)
+
+    @contextmanager
+    def phase(self, name):
+        started = perf_counter()
+        yield
+        self.observe(name, perf_counter() - started)
+
+    @contextmanager
+    def lock(self, wallet_pks):
+        started = perf_counter()
+        yield
+        elapsed = perf_counter() - started
+        self.observe("lock", elapsed)
+
+        threshold = settings.LEDGER_LOCK_WAIT_LOG_MS
+        if threshold is not None and elapsed * 1000 >= threshold:
+            logger.warning(
+                "Waited %.1fms for the lock on wallet %s (%s)",
+                elapsed * 1000,
+                ", ".join(str(pk) for pk in wallet_pks),
+                self.type,
+            )
+
+    @contextmanager
+    def atomic(self):
+        with transaction.atomic():
+            yield
+            started = perf_counter()
+        self.observe("commit", perf_counter() - started)
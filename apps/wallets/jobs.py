@@ -0,0 +1,193 @@
+import gzip
+import json
+import logging
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.jobs.registry import register
+from apps.wallets import limits
+from apps.wallets.currencies import default_currency
+from apps.wallets.models import Hold, Wallet, Transaction
+from apps.wallets.models.transaction import signed_amount
+from apps.wallets.scheduled_transfers import run_due
+
+logger = logging.getLogger(__name__)
+
+
+def wallet_ranges(chunk_size=None, **params):
+    """
+    Splits the wallets table into contiguous primary key ranges of
+    `chunk_size` wallets each, reading only the primary key index.
+    """
+    chunk_size = chunk_size or settings.JOBS_CHUNK_SIZE
+    pks = (
+        Wallet.objects
+        .order_by('pk')
+        .values_list('pk', flat=True)
+        .iterator(chunk_size=chunk_size)
+    )
+    first = last = None
+    count = 0
+    for pk in pks:
+        if first is None:
+            first = pk
+        last = pk
+        count += 1
+        if count == chunk_size:
+            yield {**params, 'first': str(first), 'last': str(last)}
+            first, count = None, 0
+    if first is not None:
+        yield {**params, 'first': str(first), 'last': str(last)}
+
+
+def archive_ranges(before=None, **params):
+    before = before or timezone.now().isoformat()
+    for chunk in wallet_ranges(**params):
+        yield {**chunk, 'before': before}
+
+
+def expired_hold_wallets(chunk_size=None, now=None, **params):
+    """
+    Splits the wallets with expired active holds into chunks of `chunk_size`
+    wallets, using the partial index on active holds.
+    """
+    chunk_size = chunk_size or settings.JOBS_CHUNK_SIZE
+    now = now or timezone.now().isoformat()
+    pks = (
+        Hold.objects
+        .filter(status=Hold.Status.active, expires_at__lte=now)
+        .order_by('wallet_id')
+        .values_list('wallet_id', flat=True)
+        .distinct()
+    )
+    wallets = [str(pk) for pk in pks]
+    for start in range(0, len(wallets), chunk_size):
+        yield {**params, 'wallets': wallets[start:start + chunk_size], 'now': now}
+
+
+@register('wallets.checkpoint_balances', chunks=wallet_ranges)
+def checkpoint_balances(first, last, **params):
+    # NumPy is only imported by the workers that run this job.
+    from apps.wallets.recompute import recompute_balances
+
+    report = recompute_balances(first, last)
+    return {'items': report.wallets, 'transactions': report.transactions}
+
+
+@register('wallets.verify_integrity', chunks=wallet_ranges)
+def verify_integrity(first, last, **params):
+    """
+    Checks that every checkpointed balance equals the sum of the transactions
+    it covers, in every currency, using one grouped aggregate for the whole
+    chunk.
+    """
+    settled = {}
+    totals = (
+        Transaction.objects
+        .filter(
+            wallet__pk__gte=first,
+            wallet__pk__lte=last,
+            created_at__lte=F('wallet__last_balance_update'),
+        )
+        .order_by()
+        .values('wallet_id', 'currency')
+        .annotate(total=Sum(signed_amount()))
+        .values_list('wallet_id', 'currency', 'total')
+    )
+    for pk, currency, total in totals:
+        settled.setdefault(pk, {})[currency] = total
+
+    count = 0
+    mismatches = []
+    wallets = (
+        Wallet.objects
+        .filter(pk__gte=first, pk__lte=last)
+        .values_list('pk', 'last_balance', 'currency_balances')
+    )
+    for pk, last_balance, currency_balances in wallets:
+        count += 1
+        checkpoint = {default_currency(): last_balance, **currency_balances}
+        expected = settled.get(pk, {})
+        for currency in checkpoint.keys() | expected.keys():
+            if expected.get(currency, 0) != checkpoint.get(currency, 0):
+                logger.error(
+                    "Wallet %s %s checkpoint is %s but its transactions sum to %s",
+                    pk, currency, checkpoint.get(currency, 0), expected.get(currency, 0),
+                )
+                mismatches.append({
+                    'wallet': str(pk),
+                    'currency': currency,
+                    'last_balance': checkpoint.get(currency, 0),
+                    'expected': expected.get(currency, 0),
+                })
+
+    return {'items': count, 'mismatches': mismatches}
+
+
+@register('wallets.archive_transactions', chunks=archive_ranges)
+def archive_transactions(first, last, before, **params):
+    """
+    Exports settled transactions (covered by the wallet checkpoint and older
+    than `before`) to gzipped NDJSON. The ledger itself is immutable, so the
+    archive is a copy; files are named after the chunk and written atomically
+    so a retried chunk simply replaces its own output.
+    """
+    directory = Path(settings.LEDGER_ARCHIVE_DIR) / parse_datetime(before).strftime('%Y%m%dT%H%M%S')
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{first}.ndjson.gz"
+    tmp_path = path.with_suffix('.tmp')
+
+    rows = (
+        Transaction.objects
+        .filter(
+            wallet__pk__gte=first,
+            wallet__pk__lte=last,
+            created_at__lt=before,
+            created_at__lte=F('wallet__last_balance_update'),
+        )
+        .order_by('wallet_id', 'created_at')
+        .values('id', 'wallet_id', 'type', 'amount', 'currency', 'reference', 'created_at', 'metadata')
+        .iterator(chunk_size=2000)
+    )
+
+    count = 0
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, cls=DjangoJSONEncoder))
+            f.write('\n')
+            count += 1
+    os.replace(tmp_path, path)
+
+    return {'items': count, 'path': str(path)}
+
+
+@register('wallets.expire_holds', chunks=expired_hold_wallets)
+def expire_holds(wallets, now, **params):
+    """Releases the reserved funds of holds that expired by `now`."""
+    now = parse_datetime(now)
+    count = 0
+    for pk in wallets:
+        count += Transaction.objects.expire_holds(pk, now=now)
+    return {'items': count}
+
+
+@register('wallets.run_scheduled_transfers')
+def run_scheduled_transfers(**params):
+    """
+    Executes the scheduled transfers falling due during the next minute, as
+    they fall due. Scheduled every minute.
+    """
+    return {'items': run_due(until=timezone.now() + timedelta(seconds=55))}
+
+
+@register('wallets.prune_spending_buckets')
+def prune_spending_buckets(**params):
+    """Deletes the spending buckets that no limit window reaches anymore."""
+    return {'items': limits.prune_buckets()}
@@ -0,0 +1,214 @@
+"""
+Spending limits of wallets.
+
+A wallet can limit what it spends in a currency over a rolling day and a
+rolling month of 30 days; withdrawals, outgoing transfers and captured
+holds count as spending, and a hold cannot be authorized beyond a limit. Checking a limit never reads the ledger. Each spending write of
+a limited wallet adds its amount to an hourly and a daily `SpendingBucket`
+inside the same locked write, and a limit is checked against the sum of
+the buckets of its window: at most 25 hourly or 31 daily rows. Windows
+move one bucket at a time, so a spent amount stops counting up to one
+bucket after it has left the window.
+
+Limits are stored on the wallet (`Wallet.spending_limits`), which every
+write reads anyway, so writes to wallets without limits do no extra work.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.core.exceptions import ValidationError
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from apps.wallets import currencies
+from apps.wallets.models.spending_bucket import SpendingBucket
+
+DAILY = "daily"
+MONTHLY = "monthly"
+
+# The bucket span and the window length of every period.
+PERIODS = {
+    DAILY: (SpendingBucket.Span.hour, timedelta(days=1)),
+    MONTHLY: (SpendingBucket.Span.day, timedelta(days=30)),
+}
+
+TRUNCATE = {
+    SpendingBucket.Span.hour: TruncHour,
+    SpendingBucket.Span.day: TruncDay,
+}
+
+
+def spending_types():
+    from apps.wallets.models import Transaction
+
+    return (Transaction.Type.withdrawal, Transaction.Type.transfer_out, Transaction.Type.capture)
+
+
+def bucket_start(moment, span):
+    """Start of the bucket of the given span containing `moment`, in UTC."""
+    moment = moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if span == SpendingBucket.Span.day:
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def window_start(period, now):
+    """Start of the oldest bucket in the window of `period` ending at `now`."""
+    span, length = PERIODS[period]
+    return bucket_start(now - length, span)
+
+
+def oldest_bucket_start(now):
+    return min(window_start(period, now) for period in PERIODS)
+
+
+class Spending:
+    """
+    Spending of the wallets of one write attempt in the windows of their
+    limits. The buckets are read on the first spend of a limited wallet and
+    written back by `save()`, under the same wallet locks.
+    """
+
+    def __init__(self, wallets, now=None):
+        self.now = now or timezone.now()
+        self.limits = {pk: w.spending_limits for pk, w in wallets.items() if w.spending_limits}
+        self._buckets = None
+        self._changed = set()
+
+    def _load(self):
+        self._buckets = {
+            (wallet_pk, currency, span, start): amount
+            for wallet_pk, currency, span, start, amount in SpendingBucket.objects.filter(
+                wallet_id__in=list(self.limits),
+                start__gte=oldest_bucket_start(self.now),
+            ).values_list("wallet_id", "currency", "span", "start", "amount")
+        }
+
+    def spent(self, wallet_pk, currency, period):
+        if self._buckets is None:
+            self._load()
+        span, _ = PERIODS[period]
+        since = window_start(period, self.now)
+        return sum(
+            amount for (pk, c, s, start), amount in self._buckets.items()
+            if pk == wallet_pk and c == currency and s == span and start >= since
+        )
+
+    def check(self, wallet_pk, currency, amount):
+        """
+        Raises `ValidationError` if spending `amount` would exceed one of the
+        wallet's limits in `currency`; returns whether it has any.
+        """
+        limits = self.limits.get(wallet_pk, {}).get(currency)
+        if not limits:
+            return False
+        for period, limit in limits.items():
+            if self.spent(wallet_pk, currency, period) + amount > limit:
+                raise ValidationError(f"{period.capitalize()} spending limit exceeded")
+        return True
+
+    def spend(self, wallet_pk, currency, amount):
+        """
+        Counts `amount` against the wallet's limits in `currency`, or raises
+        `ValidationError` if that would exceed one of them.
+        """
+        if not self.check(wallet_pk, currency, amount):
+            return
+        for span, _ in PERIODS.values():
+            key = (wallet_pk, currency, span, bucket_start(self.now, span))
+            self._buckets[key] = self._buckets.get(key, 0) + amount
+            self._changed.add(key)
+
+    def report(self, wallet_pk):
+        """What the wallet spent per limited currency and period."""
+        return {
+            currency: {period: self.spent(wallet_pk, currency, period) for period in PERIODS}
+            for currency in self.limits.get(wallet_pk, {})
+        }
+
+    def save(self):
+        if not self._changed:
+            return
+        SpendingBucket.objects.bulk_create(
+            [
+                SpendingBucket(
+                    wallet_id=wallet_pk, currency=currency, span=span, start=start,
+                    amount=self._buckets[wallet_pk, currency, span, start],
+                )
+                for wallet_pk, currency, span, start in self._changed
+            ],
+            update_conflicts=True,
+            unique_fields=["wallet", "currency", "span", "start"],
+            update_fields=["amount"],
+        )
+        self._changed.clear()
+
+
+def _fill_buckets(wallet_pk, currency, now):
+    """
+    Rebuilds the buckets of a wallet in `currency` from the last month of its
+    ledger. Only run when a currency becomes limited.
+    """
+    from apps.wallets.models import Transaction
+
+    SpendingBucket.objects.filter(wallet_id=wallet_pk, currency=currency).delete()
+    buckets = []
+    for period, (span, _) in PERIODS.items():
+        rows = (
+            Transaction.objects
+            .filter(
+                wallet_id=wallet_pk,
+                type__in=spending_types(),
+                currency=currency,
+                created_at__gte=window_start(period, now),
+            )
+            .annotate(start=TRUNCATE[span]("created_at", tzinfo=dt_timezone.utc))
+            .order_by()
+            .values("start")
+            .annotate(amount=Sum("amount"))
+            .values_list("start", "amount")
+        )
+        buckets.extend(
+            SpendingBucket(wallet_id=wallet_pk, currency=currency, span=span, start=start, amount=amount)
+            for start, amount in rows
+        )
+    SpendingBucket.objects.bulk_create(buckets)
+
+
+def set_limits(wallet, currency=None, daily=None, monthly=None):
+    """
+    Sets the spending limits of the wallet in `currency` (the default
+    currency if omitted); None leaves that period unlimited. Spending made
+    before a currency became limited counts too: its buckets are filled from
+    the ledger first.
+    """
+    from apps.wallets.instrumentation import WriteTimer
+    from apps.wallets.models import Transaction, Wallet
+
+    currency = currencies.check_currency(currency)
+    limits = {period: limit for period, limit in ((DAILY, daily), (MONTHLY, monthly)) if limit is not None}
+    if any(limit < 0 for limit in limits.values()):
+        raise ValidationError("Limits must not be negative")
+
+    def apply(wallets):
+        locked_wallet = wallets[wallet.pk]
+        spending_limits = dict(locked_wallet.spending_limits)
+        if limits and currency not in spending_limits:
+            _fill_buckets(wallet.pk, currency, timezone.now())
+        elif not limits:
+            SpendingBucket.objects.filter(wallet_id=wallet.pk, currency=currency).delete()
+        if limits:
+            spending_limits[currency] = limits
+        else:
+            spending_limits.pop(currency, None)
+        Wallet.objects.filter(pk=wallet.pk).update(spending_limits=spending_limits)
+        locked_wallet.spending_limits = wallet.spending_limits = spending_limits
+        return spending_limits
+
+    return Transaction.objects._write(WriteTimer("LIMITS"), [wallet.pk], apply)
+
+
+def prune_buckets(now=None):
+    """Deletes the buckets no window reaches anymore; returns how many."""
+    deleted, _ = SpendingBucket.objects.filter(start__lt=oldest_bucket_start(now or timezone.now())).delete()
+    return deleted
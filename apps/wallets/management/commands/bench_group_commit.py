@@ -0,0 +1,78 @@
+import random
+import threading
+import uuid
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from apps.wallets.batching import BATCH_SIZE
+from apps.wallets.models import Wallet, Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures deposits/sec and commits/sec against the group commit window. "
+        "Writes benchmark wallets and deposits into the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wallets', type=int, default=50)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--deposits', type=int, default=100, help="Deposits per thread.")
+        parser.add_argument(
+            '--windows',
+            default='0,1,2,5,10',
+            help="Comma separated windows in milliseconds; 0 disables group commit.",
+        )
+        parser.add_argument('--max-batch', type=int, default=100)
+
+    def handle(self, *args, wallets, threads, deposits, windows, max_batch, **options):
+        wallet_objs = [Wallet() for _ in range(wallets)]
+        Wallet.objects.bulk_create(wallet_objs)
+
+        self.stdout.write(
+            f"{'window ms':>10} {'deposits/s':>12} {'commits/s':>12} {'avg batch':>10} {'errors':>8}"
+        )
+        for window in (float(w) for w in windows.split(',')):
+            with override_settings(
+                LEDGER_GROUP_COMMIT_WINDOW_MS=window or None,
+                LEDGER_GROUP_COMMIT_MAX_BATCH=max_batch,
+            ):
+                batches_before = BATCH_SIZE.count(batcher="group-commit")
+                elapsed, errors = self.run_round(wallet_objs, threads, deposits)
+                batches = BATCH_SIZE.count(batcher="group-commit") - batches_before
+
+            total = threads * deposits - errors
+            commits = batches if window else total
+            self.stdout.write(
+                f"{window:>10g} {total / elapsed:>12.1f} {commits / elapsed:>12.1f} "
+                f"{total / max(commits, 1):>10.1f} {errors:>8}"
+            )
+
+    def run_round(self, wallets, threads, deposits):
+        run_id = uuid.uuid4().hex[:8]
+        errors = []
+
+        def work(worker):
+            try:
+                for i in range(deposits):
+                    try:
+                        Transaction.objects.deposit(
+                            wallet=random.choice(wallets),
+                            amount=1,
+                            reference=f"BENCH-{run_id}-{worker}-{i}",
+                        )
+                    except Exception as e:
+                        errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=work, args=(n,)) for n in range(threads)]
+        started = perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return perf_counter() - started, len(errors)
@@ -0,0 +1,54 @@
+import uuid
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from apps.wallets.models import Wallet, Transaction
+from apps.wallets.serializers import TransactionSerializer
+from wallet_ledger.renderers import ORJSONRenderer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares rows/sec of the model serializer with the values() fast path "
+        "on transaction pages. Writes a benchmark wallet into the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help="Rows per page.")
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, rows, iterations, **options):
+        wallet = Wallet.objects.create()
+        Transaction.objects._bulk_insert([
+            Transaction(
+                wallet=wallet,
+                type=Transaction.Type.deposit,
+                amount=i + 1,
+                reference=f"BENCH-{uuid.uuid4().hex}",
+                metadata={"description": f"Benchmark deposit {i}", "index": i},
+            )
+            for i in range(rows)
+        ])
+        page = wallet.transactions.order_by('-created_at')[:rows]
+
+        def model_serializer():
+            return JSONRenderer().render(TransactionSerializer(page.all(), many=True).data)
+
+        def fast_path():
+            return ORJSONRenderer().render(TransactionSerializer.serialize_many(page.all()))
+
+        if model_serializer() != fast_path():
+            raise CommandError("Fast path output differs from the model serializer")
+
+        results = {}
+        for name, render in (("model serializer", model_serializer), ("values() + orjson", fast_path)):
+            started = perf_counter()
+            for _ in range(iterations):
+                render()
+            results[name] = rows * iterations / (perf_counter() - started)
+            self.stdout.write(f"{name:<20} {results[name]:>12.0f} rows/s")
+
+        speedup = results["values() + orjson"] / results["model serializer"]
+        self.stdout.write(f"{'speedup':<20} {speedup:>12.1f}x")
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.wallets.jobs import wallet_ranges
+from apps.wallets.recompute import recompute_balances
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes every wallet checkpoint from the whole ledger, ignoring the "
+        "stored checkpoints. For disaster recovery; use --dry-run to only count "
+        "the checkpoints that are wrong."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wallets-per-chunk', type=int, default=10000,
+                            help="Wallets locked and rebuilt together.")
+        parser.add_argument('--until', help="Checkpoint time, ISO 8601. Defaults to now.")
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, wallets_per_chunk, until, dry_run, **options):
+        if until is not None:
+            until = parse_datetime(until)
+            if until is None:
+                raise CommandError("--until must be an ISO 8601 datetime")
+        until = until or timezone.now()
+
+        wallets = transactions = changed = 0
+        seconds = 0.0
+        for chunk in wallet_ranges(chunk_size=wallets_per_chunk):
+            report = recompute_balances(
+                chunk['first'], chunk['last'], until=until, rebuild=True, dry_run=dry_run,
+            )
+            wallets += report.wallets
+            transactions += report.transactions
+            changed += report.changed
+            seconds += report.seconds
+            self.stdout.write(f"{wallets} wallets, {transactions} transactions", ending='\r')
+
+        rate = transactions / seconds if seconds else 0.0
+        self.stdout.write(
+            f"Rebuilt {wallets} wallets from {transactions} transactions in {seconds:.1f}s "
+            f"({rate:,.0f} transactions/s); {changed} checkpoints "
+            f"{'would change' if dry_run else 'changed'}"
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from apps.wallets.jobs import wallet_ranges
+from apps.wallets.recompute import recount_transactions
+
+
+class Command(BaseCommand):
+    help = (
+        "Recounts the transactions of every wallet and repairs the per-wallet "
+        "transaction counters. Use --dry-run to only count the wallets whose "
+        "counters are wrong."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wallets-per-chunk', type=int, default=10000,
+                            help="Wallets locked and recounted together.")
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, wallets_per_chunk, dry_run, **options):
+        wallets = transactions = changed = 0
+        seconds = 0.0
+        for chunk in wallet_ranges(chunk_size=wallets_per_chunk):
+            report = recount_transactions(chunk['first'], chunk['last'], dry_run=dry_run)
+            wallets += report.wallets
+            transactions += report.transactions
+            changed += report.changed
+            seconds += report.seconds
+            self.stdout.write(f"{wallets} wallets, {transactions} transactions", ending='\r')
+
+        self.stdout.write(
+            f"Recounted {transactions} transactions of {wallets} wallets in {seconds:.1f}s; "
+            f"{changed} wallets' counters {'would change' if dry_run else 'changed'}"
+        )
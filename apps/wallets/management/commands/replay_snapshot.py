@@ -0,0 +1,65 @@
+import csv
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from apps.wallets.snapshot import Snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes every wallet balance from a ledger snapshot. With --verify, "
+        "checks the checkpointed balances stored in the snapshot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Snapshot directory written by ledger_snapshot.")
+        parser.add_argument('--as-of', help="Only replay transactions created up to this ISO 8601 time.")
+        parser.add_argument('--verify', action='store_true',
+                            help="Compare each wallet's checkpoint with the transactions it covers.")
+        parser.add_argument('--csv', dest='csv_path', help="Write wallet,currency,balance rows to this file.")
+
+    def handle(self, *args, path, as_of, verify, csv_path, **options):
+        if as_of is not None:
+            as_of = parse_datetime(as_of)
+            if as_of is None:
+                raise CommandError("--as-of must be an ISO 8601 datetime")
+        try:
+            snapshot = Snapshot(path)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        started = perf_counter()
+        balances = snapshot.balances(as_of=as_of)
+        elapsed = perf_counter() - started
+        self.stdout.write(
+            f"Replayed {snapshot.manifest['transactions']} transactions of "
+            f"{snapshot.manifest['wallets']} wallets in {elapsed:.2f}s"
+        )
+
+        wallet_ids = None
+        if csv_path is not None:
+            wallet_ids = snapshot.wallet_ids()
+            self.write_csv(csv_path, wallet_ids, snapshot.currencies, balances)
+
+        if verify:
+            wallet_ids = wallet_ids or snapshot.wallet_ids()
+            settled = snapshot.balances(settled=True)
+            checkpoints = snapshot.column('wallets', 'last_balance')
+            mismatches = (settled != checkpoints).nonzero()
+            for row, column in zip(*mismatches):
+                self.stdout.write(
+                    f"Wallet {wallet_ids[row]} {snapshot.currencies[column]} checkpoint is "
+                    f"{checkpoints[row, column]} but its transactions sum to {settled[row, column]}"
+                )
+            if len(mismatches[0]):
+                raise CommandError(f"{len(mismatches[0])} checkpoint mismatches")
+            self.stdout.write("All checkpoints match")
+
+    def write_csv(self, path, wallet_ids, currencies, balances):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['wallet', 'currency', 'balance'])
+            for row, column in zip(*balances.nonzero()):
+                writer.writerow([wallet_ids[row], currencies[column], balances[row, column]])
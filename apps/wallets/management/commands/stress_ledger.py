@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.wallets.stress import OUTCOMES, run_stress
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs random concurrent transfers between fresh wallets from many worker "
+        "processes, then checks that no money was created, lost or overdrawn. "
+        "Writes the stress wallets and transfers into the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wallets', type=int, default=100)
+        parser.add_argument('--workers', default='8',
+                            help="Comma separated worker counts; one run per count.")
+        parser.add_argument('--transfers', type=int, default=500, help="Transfers per worker.")
+        parser.add_argument('--balance', type=int, default=1000, help="Initial balance of every wallet.")
+        parser.add_argument('--max-amount', type=int,
+                            help="Largest transfer; defaults to half the initial balance.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--threads', action='store_true', help="Use threads instead of processes.")
+        parser.add_argument('--journal-mode', default='wal',
+                            help="SQLite journal mode to switch the database to first.")
+
+    def handle(self, *args, wallets, workers, transfers, balance, max_amount, seed, threads,
+               journal_mode, **options):
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+                self.stdout.write(f"SQLite journal mode: {cursor.fetchone()[0]}")
+
+        self.stdout.write(
+            f"{'workers':>8} {'transfers/s':>12} {'p50 ms':>8} {'p99 ms':>8} {'retries':>8} {'deadlocks':>10} "
+            + " ".join(f"{outcome:>12}" for outcome in OUTCOMES)
+        )
+        failed = False
+        for count in (int(w) for w in workers.split(',')):
+            report = run_stress(
+                wallets=wallets, workers=count, transfers=transfers, balance=balance,
+                max_amount=max_amount, seed=seed, threads=threads,
+            )
+            self.stdout.write(
+                f"{count:>8} {report.transfers_per_second:>12.1f} "
+                f"{report.latency(0.5) * 1000:>8.1f} {report.latency(0.99) * 1000:>8.1f} "
+                f"{sum(report.retries.values()):>8} {report.deadlocks:>10} "
+                + " ".join(f"{report.outcomes.get(outcome, 0):>12}" for outcome in OUTCOMES)
+            )
+            for violation in report.violations:
+                failed = True
+                self.stderr.write(f"  {violation}")
+
+        if failed:
+            raise CommandError("Ledger invariants were violated")
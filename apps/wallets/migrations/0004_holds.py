@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-19 15:40
+
+import apps.wallets.currencies
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0003_currencies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='reserved',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='type',
+            field=models.CharField(choices=[('DEPOSIT', 'Deposit'), ('WITHDRAWAL', 'Withdrawal'), ('TRANSFER_IN', 'Transfer in'), ('TRANSFER_OUT', 'Transfer out'), ('CAPTURE', 'Capture')], max_length=15),
+        ),
+        migrations.CreateModel(
+            name='Hold',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('amount', models.PositiveBigIntegerField()),
+                ('currency', models.CharField(default=apps.wallets.currencies.default_currency, max_length=3)),
+                ('reference', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('CAPTURED', 'Captured'), ('VOIDED', 'Voided'), ('EXPIRED', 'Expired')], default='ACTIVE', max_length=10)),
+                ('expires_at', models.DateTimeField()),
+                ('metadata', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('transaction', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='hold', to='wallets.transaction')),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='holds', to='wallets.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'ACTIVE')), fields=['expires_at'], name='active_hold_expiry')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('amount__gt', 0)), name='hold_amount_greater_than_zero'), models.UniqueConstraint(fields=('wallet', 'reference'), name='unique_hold_wallet_reference')],
+            },
+        ),
+    ]
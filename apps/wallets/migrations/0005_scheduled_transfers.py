@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-19 16:20
+
+import apps.wallets.currencies
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0004_holds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledTransfer',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('amount', models.PositiveBigIntegerField()),
+                ('currency', models.CharField(default=apps.wallets.currencies.default_currency, max_length=3)),
+                ('to_currency', models.CharField(blank=True, default='', max_length=3)),
+                ('reference', models.CharField(max_length=200)),
+                ('metadata', models.JSONField(default=dict)),
+                ('next_run_at', models.DateTimeField()),
+                ('interval_seconds', models.PositiveIntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed'), ('CANCELLED', 'Cancelled')], default='ACTIVE', max_length=10)),
+                ('runs', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('from_wallet', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='scheduled_transfers', to='wallets.wallet')),
+                ('to_wallet', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='wallets.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'ACTIVE')), fields=['next_run_at'], name='active_scheduled_next_run')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('amount__gt', 0)), name='scheduled_amount_greater_than_zero'), models.UniqueConstraint(fields=('from_wallet', 'reference'), name='unique_scheduled_wallet_reference')],
+            },
+        ),
+    ]
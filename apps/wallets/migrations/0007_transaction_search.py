@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-19 16:10
+
+from django.db import migrations, models
+
+# Metadata keys indexed on databases without GIN indexes; keep in line with
+# LEDGER_FILTERABLE_METADATA_KEYS.
+METADATA_KEYS = ['order_id', 'merchant_id', 'category']
+
+
+def create_metadata_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX transaction_metadata_gin ON wallets_transaction '
+            'USING GIN (metadata jsonb_path_ops)'
+        )
+        return
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # The SQLite counterpart of a generated column per key: an index on the
+    # extracted value, matched by `MetadataValue(key)` in queries.
+    for key in METADATA_KEYS:
+        schema_editor.execute(
+            f'CREATE INDEX transaction_metadata_{key} ON wallets_transaction '
+            f"(wallet_id, JSON_EXTRACT(metadata, '$.{key}'))"
+        )
+
+
+def drop_metadata_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS transaction_metadata_gin')
+        return
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for key in METADATA_KEYS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS transaction_metadata_{key}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0006_transaction_counterparty'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'created_at'], name='transaction_wallet_created'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'type', 'created_at'], name='transaction_wallet_type'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'amount'], name='transaction_wallet_amount'),
+        ),
+        migrations.RunPython(create_metadata_indexes, drop_metadata_indexes),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 6.0 on 2026-10-19 17:05
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_transactions(apps, schema_editor):
+    Transaction = apps.get_model('wallets', 'Transaction')
+    Wallet = apps.get_model('wallets', 'Wallet')
+
+    counts = {}
+    rows = Transaction.objects.order_by().values_list('wallet_id', 'type').annotate(count=Count('pk'))
+    for wallet_id, type, count in rows:
+        wallet = counts.setdefault(wallet_id, Wallet(pk=wallet_id, transaction_count=0))
+        setattr(wallet, f'{type.lower()}_count', count)
+        wallet.transaction_count += count
+
+    fields = ['transaction_count', 'deposit_count', 'withdrawal_count',
+              'transfer_in_count', 'transfer_out_count', 'capture_count']
+    Wallet.objects.bulk_update(counts.values(), fields, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0007_transaction_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='capture_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='deposit_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='transaction_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='transfer_in_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='transfer_out_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='withdrawal_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(count_transactions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-19 18:20
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def set_updated_at(apps, schema_editor):
+    Transaction = apps.get_model('wallets', 'Transaction')
+    Wallet = apps.get_model('wallets', 'Wallet')
+
+    # The time of the latest transaction, from the (wallet, created_at) index.
+    latest = (
+        Transaction.objects.filter(wallet=OuterRef('pk'))
+        .order_by().values('wallet').annotate(latest=Max('created_at')).values('latest')
+    )
+    Wallet.objects.update(updated_at=Subquery(latest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0008_transaction_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(set_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-19 19:40
+
+from django.db import migrations, models
+
+
+def number_transactions(apps, schema_editor):
+    # Existing transactions are numbered in the order they were created.
+    # UPDATE ... FROM needs PostgreSQL or SQLite 3.33+.
+    schema_editor.execute(
+        'UPDATE wallets_transaction SET sequence = numbered.sequence FROM ('
+        '  SELECT id, ROW_NUMBER() OVER (PARTITION BY wallet_id ORDER BY created_at, id) AS sequence'
+        '  FROM wallets_transaction'
+        ') AS numbered WHERE wallets_transaction.id = numbered.id'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0009_wallet_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='sequence',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(number_transactions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('sequence__isnull', False)), fields=('wallet', 'sequence'), name='transaction_wallet_sequence'),
+        ),
+    ]
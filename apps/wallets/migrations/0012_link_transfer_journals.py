@@ -0,0 +1,68 @@
+# Generated by Django 6.0 on 2026-10-19 21:45
+
+from django.db import migrations, transaction
+from django.db.models import F, OuterRef, Subquery
+
+CHUNK_SIZE = 1000
+
+
+def link_transfers(apps, schema_editor):
+    """
+    Gives every existing transfer a journal entry, one chunk of transfers per
+    database transaction, so the ledger is never locked for long and an
+    interrupted run resumes where it stopped. Each entry takes the id of the
+    outgoing leg, which finds the incoming one through its counterparty.
+    Transfers written before `counterparty` existed are linked by 0015, once
+    0014 has paired their legs.
+    """
+    Transaction = apps.get_model('wallets', 'Transaction')
+    JournalEntry = apps.get_model('wallets', 'JournalEntry')
+    db = schema_editor.connection.alias
+
+    outgoing = Transaction.objects.using(db).filter(
+        type='TRANSFER_OUT', counterparty__isnull=False, journal__isnull=True,
+    ).order_by('pk')
+    last = None
+    while True:
+        with transaction.atomic(using=db):
+            chunk = outgoing if last is None else outgoing.filter(pk__gt=last)
+            chunk = list(chunk.values_list('pk', 'wallet_id', 'reference', 'metadata')[:CHUNK_SIZE])
+            if not chunk:
+                break
+            last = chunk[-1][0]
+            pks = [pk for pk, _, _, _ in chunk]
+
+            JournalEntry.objects.using(db).bulk_create([
+                JournalEntry(pk=pk, reference=reference, metadata=metadata)
+                for pk, _, reference, metadata in chunk
+            ])
+            JournalEntry.objects.using(db).filter(pk__in=pks).update(created_at=Subquery(
+                Transaction.objects.filter(pk=OuterRef('pk')).values('created_at')
+            ))
+            Transaction.objects.using(db).filter(pk__in=pks).update(journal_id=F('pk'))
+            Transaction.objects.using(db).filter(
+                type='TRANSFER_IN',
+                counterparty__isnull=False,
+                counterparty_id__in={wallet_pk for _, wallet_pk, _, _ in chunk},
+                reference__in={reference for _, _, reference, _ in chunk},
+                journal__isnull=True,
+            ).update(journal_id=Subquery(
+                Transaction.objects.filter(
+                    pk__in=pks,
+                    wallet_id=OuterRef('counterparty_id'),
+                    counterparty_id=OuterRef('wallet_id'),
+                    reference=OuterRef('reference'),
+                ).values('pk')[:1]
+            ))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('wallets', '0011_journal_entries'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_transfers, migrations.RunPython.noop),
+    ]
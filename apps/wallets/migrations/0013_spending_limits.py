@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-19 22:30
+
+import apps.wallets.currencies
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0012_link_transfer_journals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='spending_limits',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.CreateModel(
+            name='SpendingBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(default=apps.wallets.currencies.default_currency, max_length=3)),
+                ('span', models.CharField(choices=[('HOUR', 'Hour'), ('DAY', 'Day')], max_length=4)),
+                ('start', models.DateTimeField()),
+                ('amount', models.PositiveBigIntegerField(default=0)),
+                ('wallet', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='spending_buckets', to='wallets.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['start'], name='spending_bucket_start')],
+                'constraints': [models.UniqueConstraint(fields=('wallet', 'currency', 'span', 'start'), name='unique_spending_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 6.0 on 2026-10-20 09:10
+
+from datetime import timedelta
+
+from django.db import migrations, models, transaction
+from django.db.models import Q
+
+CHUNK_SIZE = 1000
+
+# The two legs of a transfer are written by the same database transaction,
+# so they are created within this much of each other.
+PAIR_WINDOW = timedelta(seconds=1)
+
+
+def link_counterparties(apps, schema_editor):
+    """
+    Sets `counterparty` on the legs of the transfers written before the
+    column existed, so `by_reference` finds both legs of those too. An
+    outgoing leg is paired with the incoming leg of another wallet that has
+    the same reference and was created closest to it, one chunk of outgoing
+    legs per database transaction; an interrupted run resumes where it
+    stopped. A temporary index on the references of unlinked legs serves the
+    lookups.
+    """
+    Transaction = apps.get_model('wallets', 'Transaction')
+    db = schema_editor.connection.alias
+    index = models.Index(
+        fields=['reference'], condition=Q(counterparty__isnull=True), name='unlinked_transfer_reference',
+    )
+    schema_editor.add_index(Transaction, index)
+    try:
+        outgoing = Transaction.objects.using(db).filter(
+            type='TRANSFER_OUT', counterparty__isnull=True,
+        ).order_by('pk')
+        last = None
+        while True:
+            with transaction.atomic(using=db):
+                chunk = outgoing if last is None else outgoing.filter(pk__gt=last)
+                chunk = list(chunk.only('pk', 'wallet_id', 'reference', 'created_at')[:CHUNK_SIZE])
+                if not chunk:
+                    break
+                last = chunk[-1].pk
+
+                candidates = {}
+                for leg in Transaction.objects.using(db).filter(
+                    type='TRANSFER_IN',
+                    counterparty__isnull=True,
+                    reference__in={leg.reference for leg in chunk},
+                ).only('pk', 'wallet_id', 'reference', 'created_at'):
+                    candidates.setdefault(leg.reference, []).append(leg)
+
+                linked = []
+                for out in sorted(chunk, key=lambda leg: leg.created_at):
+                    pairs = [
+                        leg for leg in candidates.get(out.reference, ())
+                        if leg.counterparty_id is None and leg.wallet_id != out.wallet_id
+                        and abs(leg.created_at - out.created_at) <= PAIR_WINDOW
+                    ]
+                    if not pairs:
+                        continue
+                    incoming = min(pairs, key=lambda leg: abs(leg.created_at - out.created_at))
+                    out.counterparty_id, incoming.counterparty_id = incoming.wallet_id, out.wallet_id
+                    linked += [out, incoming]
+                Transaction.objects.using(db).bulk_update(linked, ['counterparty'], batch_size=CHUNK_SIZE)
+    finally:
+        schema_editor.remove_index(Transaction, index)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('wallets', '0013_spending_limits'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_counterparties, migrations.RunPython.noop),
+    ]
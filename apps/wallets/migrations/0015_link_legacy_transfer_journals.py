@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-20 09:30
+
+from importlib import import_module
+
+from django.db import migrations
+
+# Pairs the transfers whose counterparty 0014 has just filled in; the
+# transfers linked by 0012 already have an entry and are skipped.
+link_transfers = import_module('apps.wallets.migrations.0012_link_transfer_journals').link_transfers
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('wallets', '0014_link_transfer_counterparties'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_transfers, migrations.RunPython.noop),
+    ]
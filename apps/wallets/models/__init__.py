@@ -1,2 +1,7 @@
 from .wallet import Wallet
+from .journal_entry import JournalEntry
+from .spending_bucket import SpendingBucket
 from .transaction import Transaction
+from .hold import Hold
+from .scheduled_transfer import ScheduledTransfer
+from .exchange_rate import ExchangeRate
@@ -0,0 +1,24 @@
+from django.db import models
+from django.db.models.query_utils import Q
+
+
+class ExchangeRate(models.Model):
+    base = models.CharField(max_length=3)
+    quote = models.CharField(max_length=3)
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["base", "quote"], name="unique_exchange_rate_pair"),
+            models.CheckConstraint(condition=Q(rate__gt=0), name="exchange_rate_positive"),
+        ]
+
+    def save(self, *args, **kwargs):
+        from apps.wallets import currencies
+
+        super().save(*args, **kwargs)
+        currencies.clear_cache()
+
+    def __str__(self):
+        return f"{self.base}/{self.quote} {self.rate}"
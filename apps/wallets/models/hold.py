@@ -0,0 +1,58 @@
+import uuid
+
+from django.db import models
+from django.db.models.query_utils import Q
+
+from apps.wallets.currencies import default_currency
+
+from .wallet import Wallet
+
+
+class Hold(models.Model):
+    """
+    Funds reserved on a wallet until they are captured into a transaction,
+    voided or expire. Holds are created and settled only through the
+    `TransactionManager` methods, which keep `Wallet.reserved` in step.
+    """
+
+    class Status(models.TextChoices):
+        active = "ACTIVE", "Active"
+        captured = "CAPTURED", "Captured"
+        voided = "VOIDED", "Voided"
+        expired = "EXPIRED", "Expired"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    wallet = models.ForeignKey(Wallet, on_delete=models.PROTECT, related_name='holds')
+    amount = models.PositiveBigIntegerField()
+    currency = models.CharField(max_length=3, default=default_currency)
+    reference = models.CharField(max_length=255)
+    status = models.CharField(choices=Status.choices, max_length=10, default=Status.active)
+    expires_at = models.DateTimeField()
+    transaction = models.OneToOneField(
+        "Transaction", on_delete=models.PROTECT, null=True, blank=True, related_name="hold",
+    )
+    metadata = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(amount__gt=0),
+                name="hold_amount_greater_than_zero",
+            ),
+            models.UniqueConstraint(
+                fields=["wallet", "reference"],
+                name="unique_hold_wallet_reference",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["expires_at"],
+                condition=Q(status="ACTIVE"),
+                name="active_hold_expiry",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.reference} ({self.status})"
@@ -0,0 +1,24 @@
+import uuid
+
+from django.db import models
+
+
+class JournalEntry(models.Model):
+    """
+    One movement of money between wallets. Its postings are the
+    `Transaction` rows that point to it, so all the legs of a transfer are
+    found with one lookup on `Transaction.journal`. The postings of an entry
+    sum to zero in every currency, except for a cross-currency transfer,
+    which converts between its two postings. Entries are written only
+    through the `TransactionManager` methods, together with their postings.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    reference = models.CharField(max_length=255)
+    metadata = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "journal entries"
+
+    def __str__(self):
+        return self.reference
@@ -0,0 +1,87 @@
+import uuid
+from datetime import timedelta
+
+from django.db import models
+from django.db.models.query_utils import Q
+
+from apps.wallets.currencies import default_currency
+
+from .wallet import Wallet
+
+
+class ScheduledTransfer(models.Model):
+    """
+    A transfer that runs once at `next_run_at` or, with `interval_seconds`,
+    repeatedly. Due transfers are executed in batches by
+    `apps.wallets.scheduled_transfers.run_due`.
+    """
+
+    class Status(models.TextChoices):
+        active = "ACTIVE", "Active"
+        completed = "COMPLETED", "Completed"
+        failed = "FAILED", "Failed"
+        cancelled = "CANCELLED", "Cancelled"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    from_wallet = models.ForeignKey(Wallet, on_delete=models.PROTECT, related_name='scheduled_transfers')
+    to_wallet = models.ForeignKey(Wallet, on_delete=models.PROTECT, related_name='+')
+    amount = models.PositiveBigIntegerField()
+    currency = models.CharField(max_length=3, default=default_currency)
+    to_currency = models.CharField(max_length=3, blank=True, default="")
+    reference = models.CharField(max_length=200)
+    metadata = models.JSONField(default=dict)
+    next_run_at = models.DateTimeField()
+    interval_seconds = models.PositiveIntegerField(null=True, blank=True)
+    status = models.CharField(choices=Status.choices, max_length=10, default=Status.active)
+    runs = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(amount__gt=0),
+                name="scheduled_amount_greater_than_zero",
+            ),
+            models.UniqueConstraint(
+                fields=["from_wallet", "reference"],
+                name="unique_scheduled_wallet_reference",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["next_run_at"],
+                condition=Q(status="ACTIVE"),
+                name="active_scheduled_next_run",
+            ),
+        ]
+
+    def spread(self, run_at):
+        """
+        Moves a run time that falls exactly on a minute to a fixed second of
+        that minute derived from the id, so transfers scheduled "at midnight"
+        are executed across the minute instead of all at once.
+        """
+        if run_at.second or run_at.microsecond:
+            return run_at
+        return run_at + timedelta(seconds=self.pk.int % 60)
+
+    def run_reference(self):
+        """Ledger reference of the next run; unique per run, so retries are idempotent."""
+        return f"{self.reference}:{self.runs + 1}"
+
+    def advance(self, now, error=None):
+        """
+        Records a run. Recurring transfers move to their next future run time
+        (runs missed while the executor was down are skipped); one-off
+        transfers are completed, or failed with `error`.
+        """
+        self.runs += 1
+        self.last_error = str(error) if error else ""
+        if self.interval_seconds:
+            step = timedelta(seconds=self.interval_seconds)
+            self.next_run_at += step
+            if self.next_run_at <= now:
+                self.next_run_at += step * ((now - self.next_run_at) // step + 1)
+        else:
+            self.status = self.Status.failed if error else self.Status.completed
@@ -0,0 +1,34 @@
+from django.db import models
+
+from apps.wallets.currencies import default_currency
+
+from .wallet import Wallet
+
+
+class SpendingBucket(models.Model):
+    """
+    What a wallet spent in one currency during the hour or the day starting
+    at `start` (UTC). Kept up to date by the ledger writes of wallets with
+    spending limits; see `apps.wallets.limits`.
+    """
+
+    class Span(models.TextChoices):
+        hour = "HOUR", "Hour"
+        day = "DAY", "Day"
+
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='spending_buckets', db_index=False)
+    currency = models.CharField(max_length=3, default=default_currency)
+    span = models.CharField(choices=Span.choices, max_length=4)
+    start = models.DateTimeField()
+    amount = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["wallet", "currency", "span", "start"],
+                name="unique_spending_bucket",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["start"], name="spending_bucket_start"),
+        ]
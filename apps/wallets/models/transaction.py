@@ -1,13 +1,185 @@
 import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import timedelta
+from typing import NamedTuple, Optional
 
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models.expressions import Case, Func, When, F
+from django.db.models.fields import CharField, IntegerField
 from django.db.models.query_utils import Q
+from django.utils import timezone
 
+from apps.wallets import changes, currencies, limits
+from apps.wallets.instrumentation import WriteTimer
+from apps.wallets.retry import RetryPolicy, WriteConflict, is_reference_conflict
+
+from .hold import Hold
+from .journal_entry import JournalEntry
 from .wallet import Wallet
 
+WRITE_STRATEGY_PESSIMISTIC = "pessimistic"
+WRITE_STRATEGY_OPTIMISTIC = "optimistic"
+
+
+
+class _WriteAttempt(NamedTuple):
+    """
+    The wallets read by the current write attempt, the transactions it
+    inserted per wallet and per (wallet, type), which are added to the wallet
+    counters when the attempt advances the versions, and their spending.
+    """
+    wallets: dict
+    numbered: Counter
+    inserted: Counter
+    spending: limits.Spending
+
+
+_attempt = ContextVar("attempt", default=None)
+
+
+def _number_inserted(transactions):
+    """
+    Gives the transactions the next sequence numbers of their wallets and
+    counts them in the current write attempt. A concurrent write that took
+    the same numbers makes the insert fail on `transaction_wallet_sequence`,
+    which is retried like a version conflict.
+    """
+    attempt = _attempt.get()
+    if attempt is None:
+        return
+    for t in transactions:
+        attempt.numbered[t.wallet_id] += 1
+        attempt.inserted[t.wallet_id, t.type] += 1
+        t.sequence = attempt.wallets[t.wallet_id].transaction_count + attempt.numbered[t.wallet_id]
+
+
+def _replayed(t):
+    """Marks a transaction found by an idempotency probe."""
+    if t is not None:
+        t.replayed = True
+    return t
+
+
+def _spend(wallet_pk, currency, amount):
+    """Counts a debit against the spending limits of its wallet."""
+    _attempt.get().spending.spend(wallet_pk, currency, amount)
+
+
+def _check_spending(wallet_pk, currency, amount):
+    """Refuses a future debit that the spending limits of its wallet would refuse now."""
+    _attempt.get().spending.check(wallet_pk, currency, amount)
+
+
+def write_strategy():
+    """
+    Resolves `LEDGER_WRITE_STRATEGY`. "auto" picks row locks on databases
+    that support SELECT ... FOR UPDATE and optimistic versioning elsewhere
+    (SQLite).
+    """
+    from django.conf import settings
+    from django.db import connection
+
+    strategy = settings.LEDGER_WRITE_STRATEGY
+    if strategy == "auto":
+        if connection.features.has_select_for_update:
+            return WRITE_STRATEGY_PESSIMISTIC
+        return WRITE_STRATEGY_OPTIMISTIC
+    if strategy not in (WRITE_STRATEGY_PESSIMISTIC, WRITE_STRATEGY_OPTIMISTIC):
+        raise ValueError(f"Unknown LEDGER_WRITE_STRATEGY: {strategy}")
+    return strategy
+
+
+class LedgerOperation(NamedTuple):
+    """
+    One deposit, withdrawal or transfer for `TransactionManager.apply_batch`.
+    `type` is a `Transaction.Type` for single-wallet writes and
+    `LedgerOperation.TRANSFER` for transfers, which also set `to_wallet_pk`
+    and, to convert on the way, `to_currency`. An empty `currency` means the
+    default currency.
+    """
+    TRANSFER = "TRANSFER"
+
+    type: str
+    wallet_pk: uuid.UUID
+    amount: int
+    reference: str
+    metadata: Optional[dict] = None
+    to_wallet_pk: Optional[uuid.UUID] = None
+    currency: Optional[str] = None
+    to_currency: Optional[str] = None
+
+    @property
+    def is_debit(self):
+        return self.type in (
+            Transaction.Type.withdrawal,
+            Transaction.Type.transfer_out,
+            LedgerOperation.TRANSFER,
+        )
+
+
+class Posting(NamedTuple):
+    """
+    One leg of a journal entry for `TransactionManager.post`: `amount` is
+    negative to debit the wallet and positive to credit it. An empty
+    `currency` means the default currency.
+    """
+    wallet_pk: uuid.UUID
+    amount: int
+    currency: Optional[str] = None
+
+
+# Upper bound for prefix ranges: sorts after every other character.
+MAX_CHARACTER = "\U0010ffff"
+
+
+class MetadataValue(Func):
+    """
+    `JSON_EXTRACT(metadata, '$.<key>')` with the key written inline, which is
+    exactly the expression of the SQLite metadata indexes, so the planner can
+    match them.
+    """
+    function = "JSON_EXTRACT"
+    output_field = CharField()
+
+    def __init__(self, key):
+        if not key.isidentifier():
+            raise ValueError(f"Invalid metadata key: {key!r}")
+        super().__init__(F("metadata"), template=f"%(function)s(%(expressions)s, '$.{key}')")
+
 
 class TransactionQuerySet(models.QuerySet):
+    def with_reference_prefix(self, prefix):
+        """
+        Transactions whose reference starts with `prefix`. The range lets the
+        (wallet, reference, type) index serve the lookup; `startswith` keeps
+        the match exact where the range alone is not (e.g. case-insensitive
+        collations).
+        """
+        return self.filter(
+            reference__gte=prefix,
+            reference__lt=prefix + MAX_CHARACTER,
+            reference__startswith=prefix,
+        )
+
+    def with_metadata(self, values):
+        """
+        Transactions whose metadata holds every key of `values` with that
+        string value. PostgreSQL matches with `@>`, served by the GIN index on
+        `metadata`; other databases compare the extracted keys, served by the
+        per-key expression indexes.
+        """
+        if not values:
+            return self
+        if connections[self.db].vendor == "postgresql":
+            return self.filter(metadata__contains=values)
+        return self.alias(**{
+            f"metadata_{key}": MetadataValue(key) for key in values
+        }).filter(**{
+            f"metadata_{key}": str(value) for key, value in values.items()
+        })
+
     def update(self, **kwargs):
         raise RuntimeError("Transactions are immutable and cannot be updated")
 
@@ -33,117 +205,620 @@ class TransactionManager(models.Manager):
             "Transactions are immutable and cannot be updated"
         )
 
-    def __create_transaction(self, *, wallet, type, amount, reference, metadata=None):
-        from django.db import transaction
-
+    def __create_transaction(self, *, wallet, type, amount, reference, metadata=None, currency):
         if amount <= 0:
             raise ValidationError("Amount must be positive")
 
-        existing_transaction = Transaction.objects.filter(reference=reference, wallet=wallet, type=type).first()
+        timer = WriteTimer(type)
+
+        def existing():
+            return _replayed(Transaction.objects.filter(reference=reference, wallet=wallet, type=type).first())
+
+        with timer.phase("idempotency"):
+            existing_transaction = existing()
         if existing_transaction is not None:
             return existing_transaction
 
-        with transaction.atomic():
-            wallet = Wallet.objects.select_for_update().get(pk=wallet.pk)
+        debit = type in (
+            Transaction.Type.withdrawal,
+            Transaction.Type.transfer_out,
+        )
 
-            if type in (
-                    Transaction.Type.withdrawal,
-                    Transaction.Type.transfer_out,
-            ):
-                if wallet.balance < amount:
+        def apply(wallets):
+            locked_wallet = wallets[wallet.pk]
+            if debit:
+                with timer.phase("balance"):
+                    balance = locked_wallet.available_balance_of(currency)
+                if balance < amount:
                     raise ValidationError("Insufficient funds")
+                _spend(wallet.pk, currency, amount)
+
+            with timer.phase("insert"):
+                t = Transaction(
+                    wallet=locked_wallet,
+                    type=type,
+                    amount=amount,
+                    currency=currency,
+                    reference=reference,
+                    metadata=metadata or {},
+                )
+                t._safely_created = True
+                t.save()
+                t._safely_created = False
+            return t
+
+        return self._idempotent_write(timer, [wallet.pk], apply, existing)
+
+    def _idempotent_write(self, timer, wallet_pks, apply, existing):
+        """
+        `_write` for a write keyed by a reference. A concurrent request with
+        the same reference can commit after the idempotency probe: the unique
+        constraint then rejects this write, and `existing()` returns what the
+        other request wrote instead.
+        """
+        try:
+            return self._write(timer, wallet_pks, apply)
+        except IntegrityError as e:
+            if not is_reference_conflict(e):
+                raise
+            return existing()
+
+    def _write(self, timer, wallet_pks, apply):
+        """
+        Runs `apply(wallets)` atomically on the given wallets, where `wallets`
+        maps primary keys to fresh instances, and advances the version of every
+        wallet it wrote to.
+
+        With the pessimistic strategy the wallets are locked with
+        SELECT ... FOR UPDATE in primary key order before `apply` runs. With the
+        optimistic strategy they are read without locks and their versions are
+        compared-and-swapped at the end; every wallet is guarded, credited ones
+        too, so a write cannot slip under a balance checkpoint taken meanwhile.
+        The transaction counters of the wallets are incremented in the same
+        UPDATE. Either way, an
+        attempt that loses to a concurrent write (a version conflict, a
+        deadlock, a lock timeout...) is rolled back and retried under the
+        `RetryPolicy`.
+        """
+        optimistic = write_strategy() == WRITE_STRATEGY_OPTIMISTIC
+        return RetryPolicy.from_settings().run(
+            timer.type, self.__write_once, timer, wallet_pks, apply, optimistic,
+        )
 
+    def __write_once(self, timer, wallet_pks, apply, optimistic):
+        """One attempt."""
+        with timer.atomic():
+            with timer.lock(wallet_pks):
+                wallets = Wallet.objects.filter(pk__in=wallet_pks).order_by('pk')
+                if not optimistic:
+                    wallets = wallets.select_for_update()
+                wallets = {w.pk: w for w in wallets}
+            attempt = _WriteAttempt(wallets, Counter(), Counter(), limits.Spending(wallets))
+            token = _attempt.set(attempt)
+            try:
+                result = apply(wallets)
+            finally:
+                _attempt.reset(token)
+            attempt.spending.save()
+            self.__advance_versions(wallets, guarded=optimistic, inserted=attempt.inserted)
+            if attempt.numbered:
+                # Wakes the change feeds of the wallets once the data is visible.
+                transaction.on_commit(lambda: changes.publish(list(attempt.numbered)))
+        return result
+
+    def __advance_versions(self, wallets, guarded, inserted):
+        now = timezone.now()
+        increments = {}
+        for (wallet_pk, type), count in inserted.items():
+            counts = increments.setdefault(wallet_pk, {"transaction_count": 0})
+            counts[Wallet.count_field(type)] = count
+            counts["transaction_count"] += count
+        for wallet in wallets.values():
+            counts = increments.get(wallet.pk, {})
+            rows = Wallet.objects.filter(pk=wallet.pk)
+            if guarded:
+                rows = rows.filter(version=wallet.version)
+            if not rows.update(
+                version=F("version") + 1,
+                updated_at=now,
+                **{field: F(field) + count for field, count in counts.items()},
+            ):
+                raise WriteConflict(f"Wallet {wallet.pk} was modified concurrently")
+            wallet.version += 1
+            wallet.updated_at = now
+            for field, count in counts.items():
+                setattr(wallet, field, getattr(wallet, field) + count)
+
+    def __reserve(self, wallet, currency, amount):
+        """Adds `amount` (negative to release) to the wallet's reserved funds."""
+        reserved = dict(wallet.reserved)
+        reserved[currency] = reserved.get(currency, 0) + amount
+        if not reserved[currency]:
+            del reserved[currency]
+        Wallet.objects.filter(pk=wallet.pk).update(reserved=reserved)
+        wallet.reserved = reserved
+
+    def _bulk_insert(self, transactions):
+        """
+        Inserts already validated transactions with one multi-row INSERT. Only
+        for write paths of this manager that hold the wallet locks; everything
+        else must use the factory methods.
+        """
+        _number_inserted(transactions)
+        return super(TransactionQuerySet, self.get_queryset()).bulk_create(transactions)
+
+    def apply_batch(self, operations):
+        """
+        Applies many `LedgerOperation`s in one database transaction: the
+        wallets involved are locked once, balances are computed once per
+        debited wallet and carried forward in memory, and all new rows are
+        written with one INSERT. Operations are applied in order with the same
+        semantics as the individual factory methods. Returns one result per
+        operation, in order: the transaction (or the pair of legs of a
+        transfer), or the `ValidationError` that operation would have raised.
+        """
+        timer = WriteTimer("BATCH")
+
+        with timer.phase("idempotency"):
+            references = {op.reference for op in operations}
+            wallet_pks = sorted(
+                {op.wallet_pk for op in operations}
+                | {op.to_wallet_pk for op in operations if op.to_wallet_pk is not None}
+            )
+            existing = {
+                (t.wallet_id, t.reference, t.type): _replayed(t)
+                for t in Transaction.objects.filter(reference__in=references, wallet_id__in=wallet_pks)
+            }
+
+        debited = {op.wallet_pk for op in operations if op.is_debit}
+
+        def apply(wallets):
+            with timer.phase("balance"):
+                balances = {pk: wallets[pk].available_balances for pk in debited}
+
+            # Rows planned by a failed attempt were never inserted, so each
+            # attempt starts from what the probe found.
+            planned = dict(existing)
+            results = []
+            rows = []
+            for op in operations:
+                try:
+                    result, new_rows = self.__plan_operation(op, wallets, balances, planned)
+                except ValidationError as e:
+                    result, new_rows = e, []
+                results.append(result)
+                rows.extend(new_rows)
+
+            with timer.phase("insert"):
+                entries = {t.journal_id: t.journal for t in rows if t.journal_id is not None}
+                if entries:
+                    JournalEntry.objects.bulk_create(entries.values())
+                self._bulk_insert(rows)
+            return results
+
+        # Probes again, and finds the rows of the request that won the race.
+        return self._idempotent_write(timer, wallet_pks, apply, lambda: self.apply_batch(operations))
+
+    def __plan_operation(self, op, wallets, balances, planned):
+        if op.amount <= 0:
+            raise ValidationError("Amount must be positive")
+
+        currency = currencies.check_currency(op.currency)
+        if op.type == LedgerOperation.TRANSFER:
+            if op.wallet_pk == op.to_wallet_pk:
+                raise ValidationError("Cannot transfer to the same wallet")
+            to_currency = currencies.check_currency(op.to_currency or currency)
+            legs = [
+                (op.wallet_pk, Transaction.Type.transfer_out, currency, op.amount, op.to_wallet_pk),
+                (op.to_wallet_pk, Transaction.Type.transfer_in, to_currency,
+                 currencies.convert(op.amount, currency, to_currency), op.wallet_pk),
+            ]
+            insufficient = "Insufficient funds in source wallet"
+        else:
+            legs = [(op.wallet_pk, op.type, currency, op.amount, None)]
+            insufficient = "Insufficient funds"
+
+        first_key = (legs[0][0], op.reference, legs[0][1])
+        if first_key in planned:
+            found = [planned.get((pk, op.reference, type)) for pk, type, _, _, _ in legs]
+            return (tuple(found) if len(found) > 1 else found[0]), []
+
+        if op.is_debit:
+            if balances[op.wallet_pk].get(currency, 0) < op.amount:
+                raise ValidationError(insufficient)
+            _spend(op.wallet_pk, currency, op.amount)
+
+        journal = None
+        if op.type == LedgerOperation.TRANSFER:
+            journal = JournalEntry(reference=op.reference, metadata=op.metadata or {})
+
+        rows = []
+        for pk, type, leg_currency, amount, counterparty in legs:
             t = Transaction(
-                wallet=wallet,
+                wallet=wallets[pk],
+                journal=journal,
+                counterparty_id=counterparty,
                 type=type,
                 amount=amount,
-                reference=reference,
-                metadata=metadata or {},
+                currency=leg_currency,
+                reference=op.reference,
+                metadata=op.metadata or {},
             )
-            t._safely_created = True
-            t.save()
-            t._safely_created = False
-            return t
+            planned[(pk, op.reference, type)] = t
+            rows.append(t)
+            if pk in balances:
+                if type in (Transaction.Type.deposit, Transaction.Type.transfer_in):
+                    balances[pk][leg_currency] = balances[pk].get(leg_currency, 0) + amount
+                else:
+                    balances[pk][leg_currency] -= amount
+
+        return (tuple(rows) if len(rows) > 1 else rows[0]), rows
+
+    def __dispatch(self, operation):
+        from apps.wallets import actors, group_commit
+
+        batcher = actors.actor_for(operation.wallet_pk)
+        if batcher is None and operation.type == Transaction.Type.deposit:
+            batcher = group_commit.batcher_for_deposits()
+        if batcher is None:
+            return None
+        if operation.amount <= 0:
+            raise ValidationError("Amount must be positive")
+        return batcher.submit(operation)
+
+    def by_reference(self, wallet, references):
+        """
+        The transactions of `wallet` with any of the given references, plus
+        the other leg of its transfers. Served from the (wallet, reference,
+        type) unique index and the (counterparty, reference) index.
+        """
+        return self.filter(
+            Q(wallet=wallet) | Q(counterparty=wallet),
+            reference__in=references,
+        )
 
-    def deposit(self, wallet, amount, reference, metadata=None):
+    def deposit(self, wallet, amount, reference, metadata=None, currency=None):
+        currency = currencies.check_currency(currency)
+        queued = self.__dispatch(LedgerOperation(
+            Transaction.Type.deposit, wallet.pk, amount, reference, metadata,
+            currency=currency,
+        ))
+        if queued is not None:
+            return queued.result()
         return self.__create_transaction(
             wallet=wallet,
             type=Transaction.Type.deposit,
             amount=amount,
             reference=reference,
             metadata=metadata,
+            currency=currency,
         )
 
-    def withdraw(self, wallet, amount, reference, metadata=None):
+    def withdraw(self, wallet, amount, reference, metadata=None, currency=None):
+        currency = currencies.check_currency(currency)
+        queued = self.__dispatch(LedgerOperation(
+            Transaction.Type.withdrawal, wallet.pk, amount, reference, metadata,
+            currency=currency,
+        ))
+        if queued is not None:
+            return queued.result()
         return self.__create_transaction(
             wallet=wallet,
             type=Transaction.Type.withdrawal,
             amount=amount,
             reference=reference,
             metadata=metadata,
+            currency=currency,
         )
 
-    def transfer(self, from_wallet, to_wallet, amount, reference, metadata=None):
-        from django.db import transaction
-
+    def transfer(self, from_wallet, to_wallet, amount, reference, metadata=None,
+                 currency=None, to_currency=None):
+        """
+        Moves `amount` of `currency` out of `from_wallet`. When `to_currency`
+        differs, `to_wallet` is credited the amount converted at the cached
+        exchange rate.
+        """
         if from_wallet.pk == to_wallet.pk:
             raise ValidationError("Cannot transfer to the same wallet")
 
         if amount <= 0:
             raise ValidationError("Amount must be positive")
 
-        existing_transaction = Transaction.objects.filter(
-            reference=reference,
-            wallet=from_wallet,
-            type=Transaction.Type.transfer_out
-        ).first()
+        currency = currencies.check_currency(currency)
+        to_currency = currencies.check_currency(to_currency or currency)
 
-        if existing_transaction is not None:
+        queued = self.__dispatch(LedgerOperation(
+            LedgerOperation.TRANSFER, from_wallet.pk, amount, reference, metadata,
+            to_wallet_pk=to_wallet.pk, currency=currency, to_currency=to_currency,
+        ))
+        if queued is not None:
+            return queued.result()
+
+        timer = WriteTimer("TRANSFER")
+
+        def existing():
+            existing_transaction = Transaction.objects.filter(
+                reference=reference,
+                wallet=from_wallet,
+                type=Transaction.Type.transfer_out
+            ).first()
+            if existing_transaction is None:
+                return None
             existing_deposit = Transaction.objects.filter(
                 reference=reference,
                 wallet=to_wallet,
                 type=Transaction.Type.transfer_in
             ).first()
-            return existing_transaction, existing_deposit
-
-        with transaction.atomic():
-            wallets = (
-                Wallet.objects
-                .select_for_update()
-                .filter(pk__in=[from_wallet.pk, to_wallet.pk])
-                .order_by('pk')
-            )
+            return _replayed(existing_transaction), _replayed(existing_deposit)
+
+        with timer.phase("idempotency"):
+            existing_transfer = existing()
+        if existing_transfer is not None:
+            return existing_transfer
 
-            wallets_map = {w.pk: w for w in wallets}
-            from_wallet = wallets_map[from_wallet.pk]
-            to_wallet = wallets_map[to_wallet.pk]
+        to_amount = currencies.convert(amount, currency, to_currency)
 
-            if from_wallet.balance < amount:
+        def apply(wallets):
+            locked_from = wallets[from_wallet.pk]
+            locked_to = wallets[to_wallet.pk]
+
+            with timer.phase("balance"):
+                balance = locked_from.available_balance_of(currency)
+            if balance < amount:
                 raise ValidationError("Insufficient funds in source wallet")
+            _spend(from_wallet.pk, currency, amount)
+
+            with timer.phase("insert"):
+                journal = JournalEntry.objects.create(reference=reference, metadata=metadata or {})
+                withdrawal = Transaction(
+                    wallet=locked_from,
+                    journal=journal,
+                    counterparty=locked_to,
+                    type=Transaction.Type.transfer_out,
+                    amount=amount,
+                    currency=currency,
+                    reference=reference,
+                    metadata=metadata or {},
+                )
+                deposit = Transaction(
+                    wallet=locked_to,
+                    journal=journal,
+                    counterparty=locked_from,
+                    type=Transaction.Type.transfer_in,
+                    amount=to_amount,
+                    currency=to_currency,
+                    reference=reference,
+                    metadata=metadata or {},
+                )
+                self._bulk_insert([withdrawal, deposit])
 
-            withdrawal = Transaction(
-                wallet=from_wallet,
-                type=Transaction.Type.transfer_out,
-                amount=amount,
-                reference=reference,
-                metadata=metadata or {},
-            )
-            withdrawal._safely_created = True
-            withdrawal.save()
-            withdrawal._safely_created = False
+            return withdrawal, deposit
 
-            deposit = Transaction(
-                wallet=to_wallet,
-                type=Transaction.Type.transfer_in,
-                amount=amount,
+        return self._idempotent_write(
+            timer,
+            [from_wallet.pk, to_wallet.pk],
+            apply,
+            existing,
+        )
+
+    def post(self, postings, reference, metadata=None):
+        """
+        Writes a `JournalEntry` moving money between several wallets, e.g. a
+        payment split between a merchant and a fee wallet. The amounts of the
+        `Posting`s must sum to zero per currency and each wallet may appear
+        once. Debits are written as TRANSFER_OUT and credits as TRANSFER_IN
+        transactions, with one INSERT, under the locks of all the wallets.
+        Posting a reference again returns the existing entry.
+        """
+        postings = [
+            p._replace(wallet_pk=Wallet._meta.pk.to_python(p.wallet_pk), currency=currencies.check_currency(p.currency))
+            for p in postings
+        ]
+        if any(p.amount == 0 for p in postings):
+            raise ValidationError("Posting amounts must not be zero")
+        wallet_pks = [p.wallet_pk for p in postings]
+        if len(set(wallet_pks)) != len(wallet_pks):
+            raise ValidationError("A wallet can appear only once in a journal entry")
+        totals = {}
+        for p in postings:
+            totals[p.currency] = totals.get(p.currency, 0) + p.amount
+        if len(postings) < 2 or any(totals.values()):
+            raise ValidationError("Postings must sum to zero in every currency")
+
+        debits = [p for p in postings if p.amount < 0]
+        credits = [p for p in postings if p.amount > 0]
+
+        def posting_type(p):
+            return Transaction.Type.transfer_out if p.amount < 0 else Transaction.Type.transfer_in
+
+        timer = WriteTimer("JOURNAL")
+
+        def existing():
+            posting = Transaction.objects.filter(
+                wallet_id=postings[0].wallet_pk,
                 reference=reference,
-                metadata=metadata or {},
+                type=posting_type(postings[0]),
+                journal__isnull=False,
+            ).select_related("journal").first()
+            return posting.journal if posting is not None else None
+
+        with timer.phase("idempotency"):
+            existing_journal = existing()
+        if existing_journal is not None:
+            return existing_journal
+
+        def counterparty(p):
+            # Only a posting with a single wallet on the other side has one.
+            others = credits if p.amount < 0 else debits
+            return others[0].wallet_pk if len(others) == 1 else None
+
+        def apply(wallets):
+            with timer.phase("balance"):
+                for p in debits:
+                    if wallets[p.wallet_pk].available_balance_of(p.currency) < -p.amount:
+                        raise ValidationError(f"Insufficient funds in wallet {p.wallet_pk}")
+                    _spend(p.wallet_pk, p.currency, -p.amount)
+
+            with timer.phase("insert"):
+                journal = JournalEntry.objects.create(reference=reference, metadata=metadata or {})
+                self._bulk_insert([
+                    Transaction(
+                        wallet=wallets[p.wallet_pk],
+                        journal=journal,
+                        counterparty_id=counterparty(p),
+                        type=posting_type(p),
+                        amount=abs(p.amount),
+                        currency=p.currency,
+                        reference=reference,
+                        metadata=metadata or {},
+                    )
+                    for p in postings
+                ])
+            return journal
+
+        return self._idempotent_write(timer, wallet_pks, apply, existing)
+
+    def authorize(self, wallet, amount, reference, metadata=None, currency=None, expires_at=None):
+        """
+        Reserves `amount` of the wallet's available balance and returns the
+        `Hold`. Nothing is written to the ledger until the hold is captured.
+        Authorizing an existing reference returns that hold.
+        """
+        if amount <= 0:
+            raise ValidationError("Amount must be positive")
+        currency = currencies.check_currency(currency)
+        if expires_at is None:
+            from django.conf import settings
+            expires_at = timezone.now() + timedelta(seconds=settings.LEDGER_HOLD_EXPIRY_SECONDS)
+
+        timer = WriteTimer("AUTHORIZE")
+
+        def existing():
+            return Hold.objects.filter(wallet=wallet, reference=reference).first()
+
+        with timer.phase("idempotency"):
+            existing_hold = existing()
+        if existing_hold is not None:
+            return existing_hold
+
+        def apply(wallets):
+            locked_wallet = wallets[wallet.pk]
+            with timer.phase("balance"):
+                balance = locked_wallet.available_balance_of(currency)
+            if balance < amount:
+                raise ValidationError("Insufficient funds")
+            _check_spending(wallet.pk, currency, amount)
+
+            with timer.phase("insert"):
+                hold = Hold.objects.create(
+                    wallet=locked_wallet,
+                    amount=amount,
+                    currency=currency,
+                    reference=reference,
+                    expires_at=expires_at,
+                    metadata=metadata or {},
+                )
+                self.__reserve(locked_wallet, currency, amount)
+            return hold
+
+        return self._idempotent_write(timer, [wallet.pk], apply, existing)
+
+    def capture(self, hold, amount=None, metadata=None):
+        """
+        Debits `amount` (the whole hold by default) of an active hold with a
+        capture transaction and releases the reservation, including any
+        uncaptured remainder. Capturing a captured hold returns its transaction.
+        """
+        amount = hold.amount if amount is None else amount
+        if amount <= 0:
+            raise ValidationError("Amount must be positive")
+
+        timer = WriteTimer(Transaction.Type.capture)
+
+        def apply(wallets):
+            locked_wallet = wallets[hold.wallet_id]
+            locked_hold = Hold.objects.select_related("transaction").get(pk=hold.pk)
+            if locked_hold.status == Hold.Status.captured:
+                return locked_hold.transaction
+            self.__check_active(locked_hold)
+            if amount > locked_hold.amount:
+                raise ValidationError("Cannot capture more than the held amount")
+            _spend(hold.wallet_id, locked_hold.currency, amount)
+
+            with timer.phase("insert"):
+                t = Transaction(
+                    wallet=locked_wallet,
+                    type=Transaction.Type.capture,
+                    amount=amount,
+                    currency=locked_hold.currency,
+                    reference=locked_hold.reference,
+                    metadata=metadata or locked_hold.metadata,
+                )
+                t._safely_created = True
+                t.save()
+                t._safely_created = False
+                self.__settle(locked_wallet, locked_hold, Hold.Status.captured, transaction=t)
+            hold.status, hold.transaction = locked_hold.status, t
+            return t
+
+        return self._write(timer, [hold.wallet_id], apply)
+
+    def void(self, hold):
+        """Releases an active hold without touching the ledger."""
+        timer = WriteTimer("VOID")
+
+        def apply(wallets):
+            locked_hold = Hold.objects.get(pk=hold.pk)
+            if locked_hold.status == Hold.Status.voided:
+                return locked_hold
+            self.__check_active(locked_hold, allow_expired=True)
+            self.__settle(wallets[hold.wallet_id], locked_hold, Hold.Status.voided)
+            hold.status = locked_hold.status
+            return locked_hold
+
+        return self._write(timer, [hold.wallet_id], apply)
+
+    def expire_holds(self, wallet_pk, now=None):
+        """
+        Releases every active hold of the wallet that expired by `now` and
+        returns how many there were.
+        """
+        now = now or timezone.now()
+        wallet_pk = Wallet._meta.pk.to_python(wallet_pk)
+        timer = WriteTimer("EXPIRE")
+
+        def apply(wallets):
+            wallet = wallets[wallet_pk]
+            expired = list(
+                Hold.objects
+                .filter(wallet_id=wallet_pk, status=Hold.Status.active, expires_at__lte=now)
+                .values_list("pk", "currency", "amount")
             )
-            deposit._safely_created = True
-            deposit.save()
-            deposit._safely_created = False
+            if not expired:
+                return 0
+            released = {}
+            for _, currency, amount in expired:
+                released[currency] = released.get(currency, 0) + amount
+            for currency, amount in released.items():
+                self.__reserve(wallet, currency, -amount)
+            Hold.objects.filter(pk__in=[pk for pk, _, _ in expired]).update(
+                status=Hold.Status.expired, updated_at=now,
+            )
+            return len(expired)
 
-            return withdrawal, deposit
+        return self._write(timer, [wallet_pk], apply)
+
+    def __check_active(self, hold, allow_expired=False):
+        if hold.status != Hold.Status.active:
+            raise ValidationError(f"Hold is {hold.get_status_display().lower()}")
+        if not allow_expired and hold.expires_at <= timezone.now():
+            raise ValidationError("Hold has expired")
+
+    def __settle(self, wallet, hold, status, transaction=None):
+        self.__reserve(wallet, hold.currency, -hold.amount)
+        hold.status = status
+        hold.transaction = transaction
+        hold.save(update_fields=["status", "transaction", "updated_at"])
 
 
 class Transaction(models.Model):
@@ -156,17 +831,36 @@ class Transaction(models.Model):
         withdrawal = "WITHDRAWAL", "Withdrawal"
         transfer_in = "TRANSFER_IN", "Transfer in"
         transfer_out = "TRANSFER_OUT", "Transfer out"
+        capture = "CAPTURE", "Capture"
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     wallet = models.ForeignKey(Wallet, on_delete=models.PROTECT, related_name='transactions', null=False, blank=False)
     type = models.CharField(choices=Type.choices, max_length=15, null=False, blank=False)
     amount = models.PositiveBigIntegerField(null=False, blank=False)
+    currency = models.CharField(max_length=3, default=currencies.default_currency)
     reference = models.CharField(null=False, blank=False, max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
     metadata = models.JSONField(default=dict)
+    # The other wallet of a transfer leg, so both legs can be found by
+    # reference from either side.
+    counterparty = models.ForeignKey(
+        Wallet, on_delete=models.PROTECT, related_name='+', null=True, blank=True, db_index=False,
+    )
+    # The journal entry this transaction is a posting of; set on every leg
+    # of a transfer, so one lookup finds all of them.
+    journal = models.ForeignKey(
+        JournalEntry, on_delete=models.PROTECT, related_name='postings', null=True, blank=True, db_index=False,
+    )
+    # Position in the wallet's ledger, from 1, in commit order: the cursor of
+    # the change feed. Numbered by the write paths from the wallet counters.
+    sequence = models.PositiveBigIntegerField(null=True, blank=True)
 
     objects = TransactionManager()
 
+    # Set on the rows a write returns because its reference was already
+    # written, so the API can answer 200 instead of 201.
+    replayed = False
+
     class Meta:
         constraints = [
             models.CheckConstraint(
@@ -176,7 +870,33 @@ class Transaction(models.Model):
             models.UniqueConstraint(
                 fields=["wallet", "reference", "type"],
                 name="unique_wallet_reference_type"
-            )
+            ),
+            # Partial, so SQLite creates it as an index instead of rebuilding
+            # the table (and dropping the metadata indexes).
+            models.UniqueConstraint(
+                fields=["wallet", "sequence"],
+                condition=Q(sequence__isnull=False),
+                name="transaction_wallet_sequence",
+            ),
+        ]
+        # The indexes on `metadata` depend on the database and are created
+        # by migration 0007 outside of the model state. SQLite rebuilds a
+        # table for some schema changes and would drop them, so a migration
+        # that does that must create them again.
+        indexes = [
+            models.Index(
+                fields=["counterparty", "reference"],
+                condition=Q(counterparty__isnull=False),
+                name="counterparty_reference",
+            ),
+            models.Index(
+                fields=["journal"],
+                condition=Q(journal__isnull=False),
+                name="transaction_journal",
+            ),
+            models.Index(fields=["wallet", "created_at"], name="transaction_wallet_created"),
+            models.Index(fields=["wallet", "type", "created_at"], name="transaction_wallet_type"),
+            models.Index(fields=["wallet", "amount"], name="transaction_wallet_amount"),
         ]
 
     def save(self, *args, **kwargs):
@@ -184,4 +904,36 @@ class Transaction(models.Model):
             raise RuntimeError("Transactions are immutable and cannot be updated")
         if not self._safely_created:
             raise RuntimeError("Use factory methods to create transactions")
+        _number_inserted([self])
         super(Transaction, self).save(*args, **kwargs)
+
+
+CREDIT_TYPES = (
+    Transaction.Type.deposit,
+    Transaction.Type.transfer_in,
+)
+
+DEBIT_TYPES = (
+    Transaction.Type.withdrawal,
+    Transaction.Type.transfer_out,
+    Transaction.Type.capture,
+)
+
+
+def signed_amount(prefix=""):
+    """
+    Transaction amount signed by direction: credits count positive and debits
+    negative. `prefix` points the expression at a related transaction, e.g.
+    `signed_amount("transactions__")` when aggregating from wallets.
+    """
+    return Case(
+        When(
+            **{f"{prefix}type__in": CREDIT_TYPES},
+            then=F(f"{prefix}amount"),
+        ),
+        When(
+            **{f"{prefix}type__in": DEBIT_TYPES},
+            then=-F(f"{prefix}amount"),
+        ),
+        output_field=IntegerField(),
+    )
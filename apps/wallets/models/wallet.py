@@ -2,49 +2,103 @@ import uuid
 
 from django.db import models
 from django.db.models.aggregates import Sum
-from django.db.models.expressions import Case, When, F
-from django.db.models.fields import IntegerField
 from django.utils import timezone
 
+from apps.wallets.currencies import default_currency
+
 
 class Wallet(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     last_balance = models.PositiveBigIntegerField(default=0)
     last_balance_update = models.DateTimeField(auto_now_add=True)
+    version = models.PositiveBigIntegerField(default=0)
+    # Checkpointed balances in currencies other than the default one, which
+    # stays in `last_balance`.
+    currency_balances = models.JSONField(default=dict)
+    # Funds reserved by active holds, per currency. Kept up to date by the
+    # hold operations under the wallet lock, so checking the available balance
+    # never has to sum the open holds.
+    reserved = models.JSONField(default=dict)
+    # Spending limits per currency and period, e.g.
+    # {"USD": {"daily": 50000, "monthly": 500000}}. Set with
+    # `apps.wallets.limits.set_limits`, which also prepares the counters the
+    # ledger writes check them against.
+    spending_limits = models.JSONField(default=dict)
+    # When `version` was last advanced, i.e. when the wallet's balances,
+    # reserved funds or transactions last changed. With `version`, the
+    # validators of conditional GETs on the wallet.
+    updated_at = models.DateTimeField(null=True, blank=True)
+    # Number of transactions, in total and per type, incremented by the
+    # ledger writes in the same UPDATE that advances `version`. Rebuilt by
+    # `manage.py rebuild_transaction_counts`.
+    transaction_count = models.PositiveBigIntegerField(default=0)
+    deposit_count = models.PositiveBigIntegerField(default=0)
+    withdrawal_count = models.PositiveBigIntegerField(default=0)
+    transfer_in_count = models.PositiveBigIntegerField(default=0)
+    transfer_out_count = models.PositiveBigIntegerField(default=0)
+    capture_count = models.PositiveBigIntegerField(default=0)
+
+    @staticmethod
+    def count_field(type):
+        """The counter field of a `Transaction.Type`."""
+        return f"{type.lower()}_count"
+
+    @property
+    def transaction_counts(self):
+        """Number of transactions per type."""
+        from .transaction import Transaction
+        return {type: getattr(self, self.count_field(type)) for type in Transaction.Type.values}
 
     def update_balance(self):
-        result = self.__get_transactions_after_balance_update()
-        self.last_balance_update = timezone.now()
-        self.last_balance += (result["balance"] or 0)
-        self.save()
+        now = timezone.now()
+        balances = self.__get_balances(until=now)
+        self.last_balance_update = now
+        self.last_balance = balances.pop(default_currency(), 0)
+        self.currency_balances = {currency: amount for currency, amount in balances.items() if amount}
+        self.save(update_fields=["last_balance", "currency_balances", "last_balance_update"])
 
     @property
     def balance(self):
-        result = self.__get_transactions_after_balance_update()
-        return self.last_balance + (result["balance"] or 0)
+        return self.balance_of(default_currency())
 
-    def __get_transactions_after_balance_update(self):
-        from .transaction import Transaction
-        return self.transactions.filter(
+    @property
+    def balances(self):
+        """Balance per currency, always including the default currency."""
+        return self.__get_balances()
+
+    def balance_of(self, currency):
+        return self.balances.get(currency, 0)
+
+    @property
+    def available_balances(self):
+        """Balance per currency minus the funds reserved by active holds."""
+        balances = self.balances
+        for currency, amount in self.reserved.items():
+            balances[currency] = balances.get(currency, 0) - amount
+        return balances
+
+    def available_balance_of(self, currency):
+        return self.balance_of(currency) - self.reserved.get(currency, 0)
+
+    def __get_balances(self, until=None):
+        """
+        Adds the transactions after the checkpoint to the checkpointed
+        balances, with one aggregate grouped by currency.
+        """
+        from .transaction import signed_amount
+        balances = {default_currency(): self.last_balance, **self.currency_balances}
+        transactions = self.transactions.filter(
             created_at__gt=self.last_balance_update
-        ).aggregate(
-            balance=Sum(
-                Case(
-                    When(
-                        type__in=[
-                            Transaction.Type.deposit,
-                            Transaction.Type.transfer_in,
-                        ],
-                        then=F("amount"),
-                    ),
-                    When(
-                        type__in=[
-                            Transaction.Type.withdrawal,
-                            Transaction.Type.transfer_out,
-                        ],
-                        then=-F("amount"),
-                    ),
-                    output_field=IntegerField(),
-                )
-            )
         )
+        if until is not None:
+            transactions = transactions.filter(created_at__lte=until)
+        totals = (
+            transactions
+            .order_by()
+            .values("currency")
+            .annotate(balance=Sum(signed_amount()))
+            .values_list("currency", "balance")
+        )
+        for currency, total in totals:
+            balances[currency] = balances.get(currency, 0) + total
+        return balances
@@ -0,0 +1,208 @@
+"""
+Vectorised balance recomputation.
+
+Instead of one aggregate query per wallet (`Wallet.update_balance`), the
+transactions of a whole range of wallets are streamed in large chunks as
+plain tuples, signed with a lookup table indexed by type and summed per
+(wallet, currency) with `np.add.at` over integer-encoded wallets. The new
+checkpoints are written back with `bulk_update`. This is the engine behind the
+nightly `wallets.checkpoint_balances` job and `manage.py rebuild_balances`.
+
+The per-wallet transaction counters are rebuilt the same way, by range, with
+one GROUP BY per range (`recount_transactions`, behind
+`manage.py rebuild_transaction_counts`).
+"""
+from time import perf_counter
+from typing import NamedTuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from apps.wallets.currencies import default_currency
+from apps.wallets.models import Transaction, Wallet
+from apps.wallets.models.transaction import CREDIT_TYPES
+
+TYPES = list(Transaction.Type.values)
+
+
+class RecomputeReport(NamedTuple):
+    wallets: int
+    transactions: int
+    changed: int
+    seconds: float
+
+    @property
+    def transactions_per_second(self):
+        return self.transactions / self.seconds if self.seconds else 0.0
+
+
+def type_signs(types):
+    """+1 for credit types and -1 for debit types, in the order of `types`."""
+    return np.array([1 if t in CREDIT_TYPES else -1 for t in types], dtype="<i8")
+
+
+def sum_balances(wallet, currency, signed, wallets, currencies, mask=None):
+    """
+    Sums signed amounts per (wallet, currency) into a (wallets, currencies)
+    int64 matrix with an unbuffered scatter-add, which stays exact for any
+    int64 amount.
+    """
+    if mask is not None:
+        wallet, currency, signed = wallet[mask], currency[mask], signed[mask]
+    totals = np.zeros(wallets * currencies, dtype="<i8")
+    np.add.at(totals, wallet.astype("<i8") * currencies + currency, signed)
+    return totals.reshape(wallets, currencies)
+
+
+def recompute_balances(first=None, last=None, until=None, rebuild=False,
+                       chunk_size=None, dry_run=False):
+    """
+    Checkpoints the balances of the wallets whose primary keys lie between
+    `first` and `last` at `until` (now by default).
+
+    Normally only the transactions after each wallet's current checkpoint are
+    added to it. With `rebuild`, checkpoints are ignored and every balance is
+    recomputed from the whole ledger, for disaster recovery. With `dry_run`
+    nothing is written; the report still counts the checkpoints that would
+    change.
+
+    The versions of the wallets are advanced first, like a ledger write.
+    Optimistic writes take no row locks, so without this one that inserted a
+    transaction before `until` but committed after the checkpoint would be
+    left under it and never counted; now its compare-and-swap fails and it
+    is retried after the checkpoint.
+    """
+    started = perf_counter()
+    until = until or timezone.now()
+    chunk_size = chunk_size or settings.JOBS_CHUNK_SIZE * 100
+    signs = type_signs(TYPES)
+    type_codes = {t: i for i, t in enumerate(TYPES)}
+
+    with transaction.atomic():
+        wallets = Wallet.objects.select_for_update().order_by("pk")
+        transactions = Transaction.objects.filter(created_at__lte=until)
+        if first is not None:
+            wallets = wallets.filter(pk__gte=first)
+            transactions = transactions.filter(wallet_id__gte=first)
+        if last is not None:
+            wallets = wallets.filter(pk__lte=last)
+            transactions = transactions.filter(wallet_id__lte=last)
+        if not rebuild:
+            transactions = transactions.filter(created_at__gt=F("wallet__last_balance_update"))
+        if not dry_run:
+            wallets.update(version=F("version") + 1)
+        wallets = list(wallets.only("pk", "last_balance", "currency_balances", "last_balance_update"))
+
+        index = {wallet.pk: i for i, wallet in enumerate(wallets)}
+        currencies = list(settings.LEDGER_CURRENCIES)
+        currency_codes = {c: i for i, c in enumerate(currencies)}
+        totals = np.zeros((len(wallets), len(currencies)), dtype="<i8")
+
+        count = 0
+        rows = (
+            transactions
+            .order_by()
+            .values_list("wallet_id", "type", "currency", "amount")
+            .iterator(chunk_size=chunk_size)
+        )
+        for chunk in chunked(rows, chunk_size):
+            for _, _, currency, _ in chunk:
+                if currency not in currency_codes:
+                    currency_codes[currency] = len(currencies)
+                    currencies.append(currency)
+            if len(currencies) > totals.shape[1]:
+                totals = np.pad(totals, ((0, 0), (0, len(currencies) - totals.shape[1])))
+            wallet_idx, type_idx, currency_idx, amounts = (np.asarray(column) for column in zip(*(
+                (index[w], type_codes[t], currency_codes[c], a) for w, t, c, a in chunk
+            )))
+            totals += sum_balances(
+                wallet_idx, currency_idx, signs[type_idx] * amounts.astype("<i8"),
+                len(wallets), len(currencies),
+            )
+            count += len(chunk)
+
+        changed = []
+        for i, wallet in enumerate(wallets):
+            balances = {} if rebuild else {default_currency(): wallet.last_balance, **wallet.currency_balances}
+            for column in totals[i].nonzero()[0]:
+                currency = currencies[column]
+                balances[currency] = balances.get(currency, 0) + int(totals[i, column])
+            last_balance = balances.pop(default_currency(), 0)
+            balances = {currency: amount for currency, amount in balances.items() if amount}
+            if last_balance != wallet.last_balance or balances != wallet.currency_balances:
+                changed.append(wallet)
+            wallet.last_balance = last_balance
+            wallet.currency_balances = balances
+            wallet.last_balance_update = until
+
+        if not dry_run:
+            Wallet.objects.bulk_update(
+                wallets,
+                ["last_balance", "currency_balances", "last_balance_update"],
+                batch_size=1000,
+            )
+
+    return RecomputeReport(len(wallets), count, len(changed), perf_counter() - started)
+
+
+def recount_transactions(first=None, last=None, dry_run=False):
+    """
+    Recounts the transactions of the wallets whose primary keys lie between
+    `first` and `last` and repairs their counters. The versions of the wallets
+    are advanced first, which locks them (and the whole database on SQLite)
+    and makes concurrent optimistic writes retry, so no increment is lost.
+    With `dry_run` nothing is written; the report still counts the wallets
+    whose counters would change.
+    """
+    started = perf_counter()
+    fields = ["transaction_count", *(Wallet.count_field(t) for t in TYPES)]
+
+    with transaction.atomic():
+        wallets = Wallet.objects.order_by("pk")
+        transactions = Transaction.objects.all()
+        if first is not None:
+            wallets = wallets.filter(pk__gte=first)
+            transactions = transactions.filter(wallet_id__gte=first)
+        if last is not None:
+            wallets = wallets.filter(pk__lte=last)
+            transactions = transactions.filter(wallet_id__lte=last)
+        if not dry_run:
+            wallets.update(version=F("version") + 1)
+        wallets = list(wallets.only("pk", *fields))
+
+        counts = {}
+        rows = transactions.order_by().values_list("wallet_id", "type").annotate(count=Count("pk"))
+        for wallet_id, type, count in rows:
+            counts.setdefault(wallet_id, {})[Wallet.count_field(type)] = count
+
+        changed = []
+        total = 0
+        for wallet in wallets:
+            expected = dict.fromkeys(fields, 0)
+            expected.update(counts.get(wallet.pk, {}))
+            expected["transaction_count"] = sum(counts.get(wallet.pk, {}).values())
+            total += expected["transaction_count"]
+            if any(getattr(wallet, field) != value for field, value in expected.items()):
+                changed.append(wallet)
+                for field, value in expected.items():
+                    setattr(wallet, field, value)
+
+        if not dry_run:
+            Wallet.objects.bulk_update(changed, fields, batch_size=1000)
+
+    return RecomputeReport(len(wallets), total, len(changed), perf_counter() - started)
+
+
+def chunked(rows, size):
+    """Groups an iterator of rows into lists of `size` rows."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
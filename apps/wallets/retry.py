@@ -0,0 +1,145 @@
+"""
+Retry policy for ledger writes.
+
+A ledger write that fails because of concurrency rather than because of its
+own data is rolled back and tried again after a bounded, exponentially
+growing and fully jittered delay:
+
+    conflict       an optimistic compare-and-swap on `Wallet.version` lost,
+                   or a concurrent write took the same transaction sequence
+    locked         SQLite: "database is locked"
+    serialization  PostgreSQL 40001, could not serialize access
+    deadlock       PostgreSQL 40P01, deadlock detected
+    lock_timeout   PostgreSQL 55P03, lock not available
+
+Every attempt runs in its own transaction and nothing of a failed attempt
+survives its rollback, so a retry can neither apply a write twice nor skip
+the idempotency rules. Conflicts only roll back the attempt's savepoint and
+are retried anywhere. A PostgreSQL deadlock or serialization failure dooms
+the whole transaction, and an SQLite lock error inside an open transaction
+does not go away until that transaction ends (it may hold the read lock the
+other writer waits for), so those are only retried when the write owns the
+outermost transaction; otherwise they propagate to the code that does.
+"""
+import functools
+import random
+import time
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection
+
+from apps.wallets.instrumentation import OPTIMISTIC_CONFLICTS, WRITE_GIVE_UPS, WRITE_RETRIES
+
+REASONS = ("conflict", "locked", "serialization", "deadlock", "lock_timeout")
+
+POSTGRESQL_SQLSTATES = {
+    "40001": "serialization",
+    "40P01": "deadlock",
+    "55P03": "lock_timeout",
+}
+
+# Reasons that only roll back the savepoint of the failed attempt.
+SAVEPOINT_SAFE = ("conflict",)
+
+
+class WriteConflict(Exception):
+    """A ledger write lost to a concurrent one, or gave up retrying."""
+
+
+def is_sqlite_lock_error(error):
+    message = str(error)
+    return "database is locked" in message or "database table is locked" in message
+
+
+def is_sequence_conflict(error):
+    message = str(error)
+    # PostgreSQL names the constraint, SQLite its columns.
+    return (
+        "transaction_wallet_sequence" in message
+        or "wallets_transaction.wallet_id, wallets_transaction.sequence" in message
+    )
+
+
+def is_reference_conflict(error):
+    """
+    Whether `error` is a concurrent write with the same reference winning the
+    race: the idempotency probe missed it, the unique constraint did not.
+    """
+    message = str(error)
+    return any(name in message for name in (
+        "unique_wallet_reference_type",
+        "wallets_transaction.wallet_id, wallets_transaction.reference, wallets_transaction.type",
+        "unique_hold_wallet_reference",
+        "wallets_hold.wallet_id, wallets_hold.reference",
+    ))
+
+
+def retry_reason(error, vendor=None):
+    """The reason `error` is worth retrying on the given backend, or None."""
+    if isinstance(error, WriteConflict):
+        return "conflict"
+    if isinstance(error, IntegrityError) and is_sequence_conflict(error):
+        return "conflict"
+    if not isinstance(error, DatabaseError):
+        return None
+    vendor = vendor or connection.vendor
+    if vendor == "sqlite":
+        return "locked" if is_sqlite_lock_error(error) else None
+    if vendor == "postgresql":
+        cause = error.__cause__
+        sqlstate = getattr(cause, "sqlstate", None) or getattr(cause, "pgcode", None)
+        return POSTGRESQL_SQLSTATES.get(sqlstate)
+    return None
+
+
+class RetryPolicy(NamedTuple):
+    max_retries: int
+    backoff: float
+    max_backoff: float
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            settings.LEDGER_WRITE_MAX_RETRIES,
+            settings.LEDGER_WRITE_BACKOFF_MS / 1000,
+            settings.LEDGER_WRITE_MAX_BACKOFF_MS / 1000,
+        )
+
+    def delay(self, attempt):
+        """Full jitter: uniform up to the capped exponential backoff."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def run(self, type, fn, *args, **kwargs):
+        """
+        Calls `fn` until it succeeds, raises an error that is not retryable
+        or runs out of retries, in which case `WriteConflict` is raised.
+        `type` labels the metrics.
+        """
+        nested = connection.in_atomic_block
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn(*args, **kwargs)
+            except (WriteConflict, DatabaseError) as e:
+                reason = retry_reason(e)
+                if reason is None or (nested and reason not in SAVEPOINT_SAFE):
+                    raise
+                if reason == "conflict":
+                    OPTIMISTIC_CONFLICTS.inc(type=type)
+                if attempt == self.max_retries:
+                    WRITE_GIVE_UPS.inc(type=type, reason=reason)
+                    raise WriteConflict(
+                        f"Gave up on {type} after {self.max_retries} retries"
+                    ) from e
+                WRITE_RETRIES.inc(type=type, reason=reason)
+                time.sleep(self.delay(attempt))
+
+
+def retrying(type):
+    """Decorator that runs the function under the configured `RetryPolicy`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return RetryPolicy.from_settings().run(type, fn, *args, **kwargs)
+        return wrapper
+    return decorator
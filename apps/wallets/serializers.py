@@ -1,30 +1,109 @@
-from rest_framework import serializers
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from django.conf import settings as django_settings
 from django.core.exceptions import ValidationError as DjangoValidationError
-from .models import Wallet, Transaction
+from . import currencies
+from .models import Wallet, Transaction, ScheduledTransfer
 
 
 class TransactionSerializer(serializers.ModelSerializer):
+    journal = serializers.UUIDField(source='journal_id', read_only=True)
+
     class Meta:
         model = Transaction
-        fields = ['id', 'type', 'amount', 'reference', 'created_at', 'metadata']
-        read_only_fields = ['id', 'type', 'amount', 'reference', 'created_at', 'metadata']
+        fields = ['id', 'type', 'amount', 'currency', 'reference', 'created_at', 'metadata', 'sequence', 'journal']
+        read_only_fields = [
+            'id', 'type', 'amount', 'currency', 'reference', 'created_at', 'metadata', 'sequence', 'journal',
+        ]
+
+    @classmethod
+    def serialize_many(cls, queryset):
+        """
+        Same output as `TransactionSerializer(queryset, many=True).data`, built
+        directly from `values_list()` rows instead of model instances and
+        per-field serializer calls.
+        """
+        format_datetime = _datetime_formatter()
+        return [
+            {
+                'id': str(id),
+                'type': type,
+                'amount': amount,
+                'currency': currency,
+                'reference': reference,
+                'created_at': format_datetime(created_at),
+                'metadata': metadata,
+                'sequence': sequence,
+                'journal': str(journal) if journal is not None else None,
+            }
+            for id, type, amount, currency, reference, created_at, metadata, sequence, journal
+            in queryset.values_list(*cls.Meta.fields)
+        ]
+
+
+def _datetime_formatter():
+    """
+    Returns a function formatting datetimes exactly like DRF's
+    `DateTimeField`. The ISO 8601 case is inlined, with the current timezone
+    resolved once per call instead of once per value.
+    """
+    field = serializers.DateTimeField()
+    if api_settings.DATETIME_FORMAT != ISO_8601 or not django_settings.USE_TZ:
+        return field.to_representation
+
+    tz = field.default_timezone()
+
+    def format_datetime(value):
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return format_datetime
+
+
+class CurrencyField(serializers.CharField):
+    def __init__(self, **kwargs):
+        kwargs.setdefault('max_length', 3)
+        kwargs.setdefault('required', False)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            return currencies.check_currency(super().to_internal_value(data))
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
 
 
 class WalletSerializer(serializers.ModelSerializer):
+    balance = serializers.SerializerMethodField()
+    balances = serializers.SerializerMethodField()
     recent_transactions = serializers.SerializerMethodField()
 
     class Meta:
         model = Wallet
-        fields = ['id', 'balance', 'recent_transactions']
-        read_only_fields = ['id', 'balance']
+        fields = ['id', 'balance', 'balances', 'reserved', 'recent_transactions']
+        read_only_fields = ['id', 'reserved']
+
+    def to_representation(self, instance):
+        # `balance` and `balances` share one aggregate.
+        self._balances = instance.balances
+        return super().to_representation(instance)
+
+    def get_balance(self, obj):
+        return self._balances[currencies.default_currency()]
+
+    def get_balances(self, obj):
+        return self._balances
 
     def get_recent_transactions(self, obj):
         transactions = obj.transactions.order_by('-created_at')[:10]
-        return TransactionSerializer(transactions, many=True).data
+        return TransactionSerializer.serialize_many(transactions)
 
 
 class DepositSerializer(serializers.Serializer):
     amount = serializers.IntegerField(min_value=1)
+    currency = CurrencyField()
     reference = serializers.CharField(max_length=255)
     metadata = serializers.JSONField(required=False, default=dict)
 
@@ -59,8 +138,10 @@ class DepositSerializer(serializers.Serializer):
                 wallet=wallet,
                 amount=validated_data['amount'],
                 reference=validated_data['reference'],
-                metadata=validated_data.get('metadata', {})
+                metadata=validated_data.get('metadata', {}),
+                currency=validated_data.get('currency'),
             )
+            self.context['is_idempotent'] = transaction.replayed
             return transaction
         except DjangoValidationError as e:
             raise serializers.ValidationError(str(e))
@@ -68,6 +149,7 @@ class DepositSerializer(serializers.Serializer):
 
 class WithdrawSerializer(serializers.Serializer):
     amount = serializers.IntegerField(min_value=1)
+    currency = CurrencyField()
     reference = serializers.CharField(max_length=255)
     metadata = serializers.JSONField(required=False, default=dict)
 
@@ -91,7 +173,7 @@ class WithdrawSerializer(serializers.Serializer):
             self.context['is_idempotent'] = True
             return attrs
 
-        if wallet.balance < attrs['amount']:
+        if wallet.available_balance_of(attrs.get('currency') or currencies.default_currency()) < attrs['amount']:
             raise serializers.ValidationError({
                 'amount': 'Insufficient funds'
             })
@@ -108,8 +190,10 @@ class WithdrawSerializer(serializers.Serializer):
                 wallet=wallet,
                 amount=validated_data['amount'],
                 reference=validated_data['reference'],
-                metadata=validated_data.get('metadata', {})
+                metadata=validated_data.get('metadata', {}),
+                currency=validated_data.get('currency'),
             )
+            self.context['is_idempotent'] = transaction.replayed
             return transaction
         except DjangoValidationError as e:
             raise serializers.ValidationError(str(e))
@@ -118,6 +202,8 @@ class WithdrawSerializer(serializers.Serializer):
 class TransferSerializer(serializers.Serializer):
     to_user_id = serializers.IntegerField()
     amount = serializers.IntegerField(min_value=1)
+    currency = CurrencyField()
+    to_currency = CurrencyField()
     reference = serializers.CharField(max_length=255)
     metadata = serializers.JSONField(required=False, default=dict)
 
@@ -159,7 +245,7 @@ class TransferSerializer(serializers.Serializer):
             self.context['is_idempotent'] = True
             return attrs
 
-        if wallet.balance < attrs['amount']:
+        if wallet.available_balance_of(attrs.get('currency') or currencies.default_currency()) < attrs['amount']:
             raise serializers.ValidationError({
                 'amount': 'Insufficient funds'
             })
@@ -182,13 +268,143 @@ class TransferSerializer(serializers.Serializer):
                 to_wallet=to_wallet,
                 amount=validated_data['amount'],
                 reference=validated_data['reference'],
-                metadata=validated_data.get('metadata', {})
+                metadata=validated_data.get('metadata', {}),
+                currency=validated_data.get('currency'),
+                to_currency=validated_data.get('to_currency'),
             )
+            self.context['is_idempotent'] = withdrawal.replayed
             return withdrawal, deposit
         except DjangoValidationError as e:
             raise serializers.ValidationError(str(e))
 
 
+class ScheduledTransferSerializer(serializers.ModelSerializer):
+    to_user_id = serializers.IntegerField(source='to_wallet.user.id')
+    currency = CurrencyField()
+    to_currency = CurrencyField(allow_blank=True)
+    run_at = serializers.DateTimeField(write_only=True)
+    interval_seconds = serializers.IntegerField(required=False, allow_null=True, min_value=60)
+
+    class Meta:
+        model = ScheduledTransfer
+        fields = [
+            'id', 'to_user_id', 'amount', 'currency', 'to_currency', 'reference', 'metadata',
+            'run_at', 'interval_seconds', 'next_run_at', 'status', 'runs', 'last_error',
+        ]
+        read_only_fields = ['id', 'next_run_at', 'status', 'runs', 'last_error']
+        extra_kwargs = {'amount': {'min_value': 1}}
+
+    def validate_to_user_id(self, value):
+        from_wallet = self.context['wallet']
+        if from_wallet.user.id == value:
+            raise serializers.ValidationError("Cannot transfer to yourself")
+        try:
+            self.context['to_wallet'] = Wallet.objects.get(user__id=value)
+        except Wallet.DoesNotExist:
+            raise serializers.ValidationError("Recipient wallet not found")
+        return value
+
+    def validate_reference(self, value):
+        if ScheduledTransfer.objects.filter(from_wallet=self.context['wallet'], reference=value).exists():
+            raise serializers.ValidationError("A scheduled transfer with this reference already exists.")
+        return value
+
+    def create(self, validated_data):
+        validated_data.pop('to_wallet')
+        run_at = validated_data.pop('run_at')
+        scheduled = ScheduledTransfer(
+            from_wallet=self.context['wallet'],
+            to_wallet=self.context['to_wallet'],
+            **validated_data,
+        )
+        scheduled.next_run_at = scheduled.spread(run_at)
+        scheduled.save()
+        return scheduled
+
+
+class ReferenceLookupSerializer(serializers.Serializer):
+    references = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        min_length=1,
+        max_length=500,
+    )
+
+
+class SpendingLimitsSerializer(serializers.Serializer):
+    """Limits of one currency; an omitted or null period is unlimited."""
+    currency = CurrencyField()
+    daily = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    monthly = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+
+
+class ChangesSerializer(serializers.Serializer):
+    """
+    Query of the change feed: the transactions after sequence `since` (by
+    default, only the ones still to come), waiting up to `timeout` seconds
+    for the first one.
+    """
+    since = serializers.IntegerField(required=False, min_value=0)
+    timeout = serializers.FloatField(required=False, min_value=0)
+    limit = serializers.IntegerField(default=100, min_value=1, max_value=500)
+
+
 class TransactionListSerializer(serializers.Serializer):
+    """
+    Pagination and filters of the transaction list. Metadata filters are
+    passed as `metadata.<key>=<value>` for the keys in
+    `LEDGER_FILTERABLE_METADATA_KEYS` and collected into `metadata`.
+    """
+    METADATA_PREFIX = 'metadata.'
+
     limit = serializers.IntegerField(default=20, min_value=1, max_value=100)
     offset = serializers.IntegerField(default=0, min_value=0)
+    type = serializers.MultipleChoiceField(choices=Transaction.Type.choices, required=False)
+    currency = CurrencyField(required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    min_amount = serializers.IntegerField(required=False, min_value=1)
+    max_amount = serializers.IntegerField(required=False, min_value=1)
+    reference_prefix = serializers.CharField(required=False, max_length=255)
+
+    def validate(self, attrs):
+        metadata = {}
+        for name in self.initial_data:
+            if not name.startswith(self.METADATA_PREFIX):
+                continue
+            key = name[len(self.METADATA_PREFIX):]
+            if key not in django_settings.LEDGER_FILTERABLE_METADATA_KEYS:
+                raise serializers.ValidationError({name: "Filtering on this metadata key is not supported."})
+            metadata[key] = self.initial_data[name]
+        attrs['metadata'] = metadata
+        return attrs
+
+    def filter(self, queryset):
+        """Applies the validated filters to `queryset`."""
+        data = self.validated_data
+        lookups = {
+            'type__in': data.get('type'),
+            'currency': data.get('currency'),
+            'created_at__gte': data.get('created_after'),
+            'created_at__lt': data.get('created_before'),
+            'amount__gte': data.get('min_amount'),
+            'amount__lte': data.get('max_amount'),
+        }
+        queryset = queryset.filter(**{k: v for k, v in lookups.items() if v})
+        if data.get('reference_prefix'):
+            queryset = queryset.with_reference_prefix(data['reference_prefix'])
+        return queryset.with_metadata(data['metadata'])
+
+    def count(self, wallet, queryset):
+        """
+        Number of transactions matching the filters. Without filters, or with
+        only a type filter, this is read from the wallet's counters instead of
+        counting `queryset`.
+        """
+        data = self.validated_data
+        filters = ('currency', 'created_after', 'created_before', 'min_amount', 'max_amount',
+                   'reference_prefix', 'metadata')
+        if any(data.get(name) for name in filters):
+            return queryset.count()
+        if data.get('type'):
+            return sum(getattr(wallet, Wallet.count_field(type)) for type in data['type'])
+        return wallet.transaction_count
@@ -0,0 +1,234 @@
+"""
+Columnar ledger snapshots.
+
+A snapshot is a directory holding one raw little-endian array per column and
+a `manifest.json` that describes them. Columns are read with `numpy.memmap`,
+so a snapshot larger than memory can still be replayed:
+
+    manifest.json                   format, version, `as_of`, row counts, the
+                                    `types` and `currencies` code tables and
+                                    the dtype and shape of every column
+    wallets/id.bin                  uint8 (wallets, 16)   UUID bytes, sorted
+    wallets/last_balance.bin        int64 (wallets, currencies)  checkpoint
+    wallets/last_balance_update.bin int64 (wallets,)      checkpoint time
+    transactions/id.bin             uint8 (rows, 16)      UUID bytes
+    transactions/wallet.bin         int32 (rows,)         row in wallets/id.bin
+    transactions/type.bin           int8  (rows,)         index into `types`
+    transactions/currency.bin       int8  (rows,)         index into `currencies`
+    transactions/amount.bin         int64 (rows,)         minor units, unsigned
+    transactions/created_at.bin     int64 (rows,)         time
+
+Times are microseconds since the Unix epoch, UTC. References and metadata
+are not exported.
+"""
+import json
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from apps.wallets.currencies import default_currency
+from apps.wallets.models import Transaction, Wallet
+from apps.wallets.recompute import chunked, sum_balances, type_signs
+
+FORMAT = "wallet-ledger-snapshot"
+VERSION = 1
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+WALLET_COLUMNS = {
+    "id": ("u1", (16,)),
+    "last_balance": ("<i8", ("currencies",)),
+    "last_balance_update": ("<i8", ()),
+}
+
+TRANSACTION_COLUMNS = {
+    "id": ("u1", (16,)),
+    "wallet": ("<i4", ()),
+    "type": ("i1", ()),
+    "currency": ("i1", ()),
+    "amount": ("<i8", ()),
+    "created_at": ("<i8", ()),
+}
+
+
+def to_micros(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(value):
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+def write_snapshot(path, as_of=None, chunk_size=50000, progress=None):
+    """
+    Streams wallets and the transactions created up to `as_of` into a new
+    snapshot directory at `path`, `chunk_size` rows at a time. Returns the
+    manifest.
+    """
+    as_of = as_of or timezone.now()
+    path = Path(path)
+    (path / "wallets").mkdir(parents=True, exist_ok=False)
+    (path / "transactions").mkdir()
+
+    types = list(Transaction.Type.values)
+    currencies = list(settings.LEDGER_CURRENCIES)
+    for currency in Transaction.objects.order_by().values_list("currency", flat=True).distinct():
+        if currency not in currencies:
+            currencies.append(currency)
+    type_codes = {t: i for i, t in enumerate(types)}
+    currency_codes = {c: i for i, c in enumerate(currencies)}
+
+    wallet_index = {}
+    with _ColumnWriter(path / "wallets", WALLET_COLUMNS) as writer:
+        rows = (
+            Wallet.objects
+            .order_by("pk")
+            .values_list("pk", "last_balance", "currency_balances", "last_balance_update")
+            .iterator(chunk_size=chunk_size)
+        )
+        for chunk in chunked(rows, chunk_size):
+            checkpoints = np.zeros((len(chunk), len(currencies)), dtype="<i8")
+            for row, (pk, last_balance, currency_balances, _) in enumerate(chunk):
+                wallet_index[pk] = len(wallet_index)
+                checkpoints[row, currency_codes[default_currency()]] = last_balance
+                for currency, amount in currency_balances.items():
+                    checkpoints[row, currency_codes[currency]] = amount
+            writer.write(
+                id=_uuid_bytes(pk for pk, _, _, _ in chunk),
+                last_balance=checkpoints,
+                last_balance_update=[to_micros(at) for _, _, _, at in chunk],
+            )
+        wallet_count = writer.rows
+
+    with _ColumnWriter(path / "transactions", TRANSACTION_COLUMNS) as writer:
+        rows = (
+            Transaction.objects
+            .filter(created_at__lte=as_of)
+            .order_by()
+            .values_list("id", "wallet_id", "type", "currency", "amount", "created_at")
+            .iterator(chunk_size=chunk_size)
+        )
+        for chunk in chunked(rows, chunk_size):
+            writer.write(
+                id=_uuid_bytes(row[0] for row in chunk),
+                wallet=[wallet_index[row[1]] for row in chunk],
+                type=[type_codes[row[2]] for row in chunk],
+                currency=[currency_codes[row[3]] for row in chunk],
+                amount=[row[4] for row in chunk],
+                created_at=[to_micros(row[5]) for row in chunk],
+            )
+            if progress:
+                progress(writer.rows)
+        transaction_count = writer.rows
+
+    manifest = {
+        "format": FORMAT,
+        "version": VERSION,
+        "as_of": as_of.isoformat(),
+        "types": types,
+        "currencies": currencies,
+        "default_currency": default_currency(),
+        "wallets": wallet_count,
+        "transactions": transaction_count,
+        "columns": {
+            "wallets": _describe(WALLET_COLUMNS, wallet_count, len(currencies)),
+            "transactions": _describe(TRANSACTION_COLUMNS, transaction_count, len(currencies)),
+        },
+    }
+    (path / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+class Snapshot:
+    """Read-only, memory-mapped access to a snapshot directory."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / "manifest.json").read_text())
+        if self.manifest.get("format") != FORMAT or self.manifest.get("version") != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} ledger snapshot")
+        self.types = self.manifest["types"]
+        self.currencies = self.manifest["currencies"]
+
+    def column(self, table, name):
+        spec = self.manifest["columns"][table][name]
+        if not spec["shape"][0]:
+            return np.zeros(spec["shape"], dtype=spec["dtype"])
+        return np.memmap(
+            self.path / table / f"{name}.bin",
+            dtype=spec["dtype"],
+            mode="r",
+            shape=tuple(spec["shape"]),
+        )
+
+    def wallet_ids(self):
+        return [uuid.UUID(bytes=row.tobytes()) for row in self.column("wallets", "id")]
+
+    def signs(self):
+        """+1 or -1 per type code."""
+        return type_signs(self.types)
+
+    def balances(self, as_of=None, settled=False):
+        """
+        Balance matrix of shape (wallets, currencies) replayed from the
+        transactions, optionally only up to `as_of`. With `settled`, each
+        wallet only counts the transactions covered by its checkpoint, which
+        must add up to `wallets/last_balance`.
+        """
+        wallet = self.column("transactions", "wallet")
+        created_at = self.column("transactions", "created_at")
+        mask = None
+        if as_of is not None:
+            mask = created_at <= to_micros(as_of)
+        if settled:
+            checkpoint = self.column("wallets", "last_balance_update")[wallet] >= created_at
+            mask = checkpoint if mask is None else mask & checkpoint
+        return sum_balances(
+            wallet,
+            self.column("transactions", "currency"),
+            self.signs()[self.column("transactions", "type")] * self.column("transactions", "amount"),
+            self.manifest["wallets"],
+            len(self.currencies),
+            mask=mask,
+        )
+
+
+class _ColumnWriter:
+    def __init__(self, directory, columns):
+        self.directory = directory
+        self.columns = columns
+        self.rows = 0
+
+    def __enter__(self):
+        self.files = {name: open(self.directory / f"{name}.bin", "wb") for name in self.columns}
+        return self
+
+    def __exit__(self, *exc_info):
+        for f in self.files.values():
+            f.close()
+
+    def write(self, **values):
+        rows = None
+        for name, (dtype, _) in self.columns.items():
+            array = np.asarray(values[name], dtype=dtype)
+            array.tofile(self.files[name])
+            rows = len(array)
+        self.rows += rows
+
+
+def _describe(columns, rows, currencies):
+    return {
+        name: {
+            "dtype": np.dtype(dtype).str,
+            "shape": [rows] + [currencies if dim == "currencies" else dim for dim in shape],
+        }
+        for name, (dtype, shape) in columns.items()
+    }
+
+
+def _uuid_bytes(pks):
+    return np.frombuffer(b"".join(pk.bytes for pk in pks), dtype="u1").reshape(-1, 16)
@@ -0,0 +1,211 @@
+"""
+Concurrency stress harness for the ledger.
+
+A run funds `wallets` fresh wallets and lets `workers` processes (or threads)
+issue random transfers between them as fast as they can. Amounts are drawn
+so that many transfers overdraw their source and must be refused. Once every
+worker is done, the ledger is checked against the invariants that lost
+updates, double spends and broken locking would violate:
+
+    - money is conserved: the wallets still hold exactly what they were
+      funded with;
+    - no wallet has a negative balance;
+    - every transfer has both legs, and there are exactly as many as the
+      workers saw succeed.
+
+`manage.py stress_ledger` is the command line entry point.
+"""
+import multiprocessing
+import random
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import NamedTuple
+
+import django
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.db import connection, connections
+from django.db.models import Count, Q, Sum
+
+from apps.wallets.instrumentation import WRITE_RETRIES
+from apps.wallets.models import Transaction, Wallet
+from apps.wallets.models.transaction import LedgerOperation, signed_amount
+from apps.wallets.retry import REASONS, WriteConflict
+
+OUTCOMES = ("ok", "insufficient", "gave_up", "error")
+
+
+class StressReport(NamedTuple):
+    workers: int
+    seconds: float
+    outcomes: dict
+    retries: dict
+    latencies: list
+    violations: list
+
+    @property
+    def attempts(self):
+        return sum(self.outcomes.values())
+
+    @property
+    def deadlocks(self):
+        return self.retries.get("deadlock", 0) + self.retries.get("serialization", 0)
+
+    @property
+    def transfers_per_second(self):
+        return self.outcomes.get("ok", 0) / self.seconds if self.seconds else 0.0
+
+    def latency(self, quantile):
+        """Latency of the given quantile in seconds, over every attempt."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+def create_funded_wallets(count, balance):
+    """Creates `count` wallets holding `balance` each and returns their primary keys."""
+    wallets = [Wallet() for _ in range(count)]
+    Wallet.objects.bulk_create(wallets)
+    run_id = uuid.uuid4().hex[:8]
+    Transaction.objects.apply_batch([
+        LedgerOperation(Transaction.Type.deposit, wallet.pk, balance, f"STRESS-{run_id}-FUND")
+        for wallet in wallets
+    ])
+    return [wallet.pk for wallet in wallets]
+
+
+def classify(error):
+    """Names the outcome of a failed transfer."""
+    if isinstance(error, ValidationError):
+        return "insufficient"
+    if isinstance(error, WriteConflict):
+        return "gave_up"
+    return "error"
+
+
+def retry_counts():
+    return {reason: WRITE_RETRIES.get(type="TRANSFER", reason=reason) for reason in REASONS}
+
+
+def _delta(after, before):
+    return {reason: after[reason] - before[reason] for reason in REASONS}
+
+
+def run_worker(wallet_pks, transfers, max_amount, seed):
+    """
+    Issues `transfers` random transfers between `wallet_pks`. Returns the
+    outcome counts, the latency of every attempt and the retries by reason.
+    """
+    rng = random.Random(seed)
+    run_id = uuid.uuid4().hex[:8]
+    wallets = {pk: Wallet(pk=pk) for pk in wallet_pks}
+    outcomes = Counter()
+    latencies = []
+    retries_before = retry_counts()
+    try:
+        for i in range(transfers):
+            source, destination = rng.sample(wallet_pks, 2)
+            started = perf_counter()
+            try:
+                Transaction.objects.transfer(
+                    wallets[source], wallets[destination], rng.randint(1, max_amount),
+                    f"STRESS-{run_id}-{i}",
+                )
+                outcomes["ok"] += 1
+            except Exception as e:
+                outcomes[classify(e)] += 1
+            latencies.append(perf_counter() - started)
+    finally:
+        connection.close()
+    return dict(outcomes), latencies, _delta(retry_counts(), retries_before)
+
+
+def check_invariants(wallet_pks, funded, transfers_ok):
+    """Returns a description of every invariant the ledger violates."""
+    violations = []
+    balances = dict(
+        Wallet.objects.filter(pk__in=wallet_pks)
+        .values("pk")
+        .annotate(balance=Sum(signed_amount("transactions__")))
+        .values_list("pk", "balance")
+    )
+    total = sum(balance or 0 for balance in balances.values())
+    if total != funded * len(wallet_pks):
+        violations.append(f"Money is not conserved: {total} instead of {funded * len(wallet_pks)}")
+    negative = [pk for pk, balance in balances.items() if (balance or 0) < 0]
+    if negative:
+        violations.append(f"{len(negative)} wallets are overdrawn")
+
+    legs = Transaction.objects.filter(wallet_id__in=wallet_pks).aggregate(
+        outgoing=Count("pk", filter=Q(type=Transaction.Type.transfer_out)),
+        incoming=Count("pk", filter=Q(type=Transaction.Type.transfer_in)),
+        unlinked=Count("pk", filter=Q(
+            type__in=[Transaction.Type.transfer_out, Transaction.Type.transfer_in], journal__isnull=True,
+        )),
+    )
+    if legs["outgoing"] != legs["incoming"]:
+        violations.append(f"{legs['outgoing']} outgoing legs but {legs['incoming']} incoming legs")
+    if legs["outgoing"] != transfers_ok:
+        violations.append(f"{legs['outgoing']} transfers written but {transfers_ok} succeeded")
+    if legs["unlinked"]:
+        violations.append(f"{legs['unlinked']} transfer legs have no journal entry")
+    unbalanced = (
+        Transaction.objects.filter(wallet_id__in=wallet_pks, journal__isnull=False)
+        .values("journal")
+        .annotate(legs=Count("pk"), total=Sum(signed_amount()))
+        .exclude(legs=2, total=0)
+        .count()
+    )
+    if unbalanced:
+        violations.append(f"{unbalanced} journal entries do not balance")
+    return violations
+
+
+def _init_worker():
+    if not apps.ready:
+        django.setup()
+
+
+def _run_worker(args):
+    return run_worker(*args)
+
+
+def run_stress(wallets=100, workers=8, transfers=1000, balance=1000, max_amount=None,
+               seed=0, threads=False):
+    """
+    Runs one stress round and returns a `StressReport`. Workers are processes
+    unless `threads` is set; `transfers` is per worker. `max_amount` defaults
+    to half the funded balance.
+    """
+    wallet_pks = create_funded_wallets(wallets, balance)
+    max_amount = max_amount or max(1, balance // 2)
+    jobs = [(wallet_pks, transfers, max_amount, seed + worker) for worker in range(workers)]
+
+    started = perf_counter()
+    if threads:
+        retries_before = retry_counts()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_worker, jobs))
+        # Threads share the counters, so their own deltas overlap.
+        retries = _delta(retry_counts(), retries_before)
+    else:
+        # Forked workers must not share the parent's database connections.
+        connections.close_all()
+        with multiprocessing.get_context("fork").Pool(workers, initializer=_init_worker) as pool:
+            results = pool.map(_run_worker, jobs)
+        retries = Counter()
+        for _, _, worker_retries in results:
+            retries.update(worker_retries)
+        retries = dict(retries)
+    seconds = perf_counter() - started
+
+    outcomes = Counter()
+    latencies = []
+    for worker_outcomes, worker_latencies, _ in results:
+        outcomes.update(worker_outcomes)
+        latencies.extend(worker_latencies)
+    violations = check_invariants(wallet_pks, balance, outcomes["ok"])
+    return StressReport(workers, seconds, dict(outcomes), retries, latencies, violations)
@@ -1,2 +1,18 @@
 from .test_wallet_transactions import *
 from .test_concurrency import *
+from .test_batching import *
+from .test_serialization import *
+from .test_currencies import *
+from .test_holds import *
+from .test_scheduled_transfers import *
+from .test_snapshot import *
+from .test_recompute import *
+from .test_reference_lookup import *
+from .test_transaction_search import *
+from .test_stress import *
+from .test_retry import *
+from .test_transaction_counts import *
+from .test_conditional_get import *
+from .test_changes import *
+from .test_journal import *
+from .test_limits import *
@@ -0,0 +1,184 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from apps.wallets.batching import BATCH_SIZE, BATCH_FALLBACKS, apply_ledger_batch
+from apps.wallets.models import Transaction, Wallet
+from apps.wallets.models import transaction as transaction_module
+from apps.wallets.models.transaction import LedgerOperation
+
+User = get_user_model()
+
+
+class ApplyBatchTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.wallet1 = User.objects.create_user(username='batch_user1', password='testpass123').wallet
+        cls.wallet2 = User.objects.create_user(username='batch_user2', password='testpass123').wallet
+
+    def test_operations_are_applied_in_order(self):
+        results = Transaction.objects.apply_batch([
+            LedgerOperation(Transaction.Type.deposit, self.wallet1.pk, 100, 'B1'),
+            LedgerOperation(Transaction.Type.withdrawal, self.wallet1.pk, 80, 'B2'),
+            LedgerOperation(Transaction.Type.withdrawal, self.wallet1.pk, 30, 'B3'),
+            LedgerOperation(LedgerOperation.TRANSFER, self.wallet1.pk, 20, 'B4', to_wallet_pk=self.wallet2.pk),
+            LedgerOperation(Transaction.Type.deposit, self.wallet1.pk, 100, 'B1'),
+        ])
+
+        self.assertEqual(results[0].type, Transaction.Type.deposit)
+        self.assertEqual(results[1].type, Transaction.Type.withdrawal)
+        self.assertIsInstance(results[2], ValidationError)
+        self.assertIn('Insufficient funds', str(results[2]))
+        self.assertEqual(
+            [t.type for t in results[3]],
+            [Transaction.Type.transfer_out, Transaction.Type.transfer_in],
+        )
+        self.assertEqual(results[4].pk, results[0].pk)
+
+        self.wallet1.refresh_from_db()
+        self.wallet2.refresh_from_db()
+        self.assertEqual(self.wallet1.balance, 0)
+        self.assertEqual(self.wallet2.balance, 20)
+        self.assertEqual(Transaction.objects.count(), 4)
+        self.assertEqual(self.wallet1.version, 1)
+
+    def test_existing_transactions_are_returned(self):
+        deposit = Transaction.objects.deposit(wallet=self.wallet1, amount=50, reference='B5')
+
+        results = Transaction.objects.apply_batch([
+            LedgerOperation(Transaction.Type.deposit, self.wallet1.pk, 50, 'B5'),
+        ])
+
+        self.assertEqual(results[0].pk, deposit.pk)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    @override_settings(LEDGER_WRITE_STRATEGY='optimistic', LEDGER_WRITE_BACKOFF_MS=0)
+    def test_retried_batch_inserts_its_rows(self):
+        original = transaction_module._number_inserted
+        calls = []
+
+        def conflict_once(transactions):
+            calls.append(len(transactions))
+            if len(calls) == 1:
+                # A concurrent write advances the wallet under the attempt.
+                Wallet.objects.filter(pk=self.wallet1.pk).update(version=F('version') + 1)
+            return original(transactions)
+
+        with mock.patch.object(transaction_module, '_number_inserted', conflict_once):
+            results = Transaction.objects.apply_batch([
+                LedgerOperation(Transaction.Type.deposit, self.wallet1.pk, 100, 'B8'),
+                LedgerOperation(LedgerOperation.TRANSFER, self.wallet1.pk, 30, 'B9', to_wallet_pk=self.wallet2.pk),
+            ])
+
+        self.assertEqual(calls, [3, 3])
+        self.assertEqual(
+            sorted(Transaction.objects.values_list('reference', 'type')),
+            [('B8', Transaction.Type.deposit), ('B9', Transaction.Type.transfer_in), ('B9', Transaction.Type.transfer_out)],
+        )
+        self.assertIsNotNone(results[0].pk)
+        self.assertEqual(self.wallet1.balance, 70)
+        self.assertEqual(self.wallet2.balance, 30)
+
+    def test_failed_batch_falls_back_to_single_operations(self):
+        operations = [
+            LedgerOperation(Transaction.Type.deposit, self.wallet1.pk, 10, 'B6'),
+            LedgerOperation(Transaction.Type.deposit, self.wallet2.pk, 20, 'B7'),
+        ]
+        original = Transaction.objects.apply_batch
+        calls = []
+
+        def apply_batch(ops):
+            calls.append(len(ops))
+            if len(ops) > 1 or ops[0].reference == 'B7':
+                raise IntegrityError('duplicate reference')
+            return original(ops)
+
+        fallbacks = BATCH_FALLBACKS.get(batcher='test')
+        with mock.patch.object(Transaction.objects, 'apply_batch', side_effect=apply_batch), \
+                self.assertLogs('apps.wallets.batching', level='WARNING'):
+            results = apply_ledger_batch('test')(operations)
+
+        self.assertEqual(calls, [2, 1, 1])
+        self.assertEqual(results[0].reference, 'B6')
+        self.assertIsInstance(results[1], IntegrityError)
+        self.assertEqual(BATCH_FALLBACKS.get(batcher='test'), fallbacks + 1)
+
+
+@override_settings(LEDGER_ACTOR_WALLETS='__all__', LEDGER_ACTOR_BATCH_WINDOW_MS=20)
+class WalletActorTestCase(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='actor_user', password='testpass123')
+        self.wallet = self.user.wallet
+
+    def test_concurrent_writes_are_batched_and_never_overdraw(self):
+        Transaction.objects.deposit(wallet=self.wallet, amount=100, reference='ACTOR_INITIAL')
+        batches = BATCH_SIZE.count(batcher=f'actor-{self.wallet.pk.int % 4}')
+
+        successes = []
+        errors = []
+
+        def withdraw(i):
+            try:
+                successes.append(Transaction.objects.withdraw(
+                    wallet=self.wallet,
+                    amount=30,
+                    reference=f'ACTOR_{i}',
+                ))
+            except ValidationError as e:
+                errors.append(str(e))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=withdraw, args=(i,)) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(successes), 3)
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(all('Insufficient funds' in e for e in errors))
+        self.assertLess(BATCH_SIZE.count(batcher=f'actor-{self.wallet.pk.int % 4}') - batches, 5)
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, 10)
+
+
+@override_settings(LEDGER_GROUP_COMMIT_WINDOW_MS=20)
+class GroupCommitTestCase(TransactionTestCase):
+    def setUp(self):
+        self.wallets = [
+            User.objects.create_user(username=f'group_user{i}', password='testpass123').wallet
+            for i in range(3)
+        ]
+
+    def test_concurrent_deposits_share_commits(self):
+        batches = BATCH_SIZE.count(batcher='group-commit')
+        results = []
+
+        def deposit(i):
+            try:
+                results.append(Transaction.objects.deposit(
+                    wallet=self.wallets[i % 3],
+                    amount=10,
+                    reference=f'GROUP_{i}',
+                ))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=deposit, args=(i,)) for i in range(9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 9)
+        self.assertLess(BATCH_SIZE.count(batcher='group-commit') - batches, 9)
+        for wallet in self.wallets:
+            wallet.refresh_from_db()
+            self.assertEqual(wallet.balance, 30)
@@ -0,0 +1,148 @@
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.wallets.models import Transaction
+from apps.wallets.models.transaction import LedgerOperation
+from apps.wallets.retry import retry_reason
+from apps.wallets.serializers import TransactionSerializer
+
+User = get_user_model()
+
+
+class TransactionSequenceTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.wallet1 = User.objects.create_user(username='seq_user1', password='testpass123').wallet
+        cls.wallet2 = User.objects.create_user(username='seq_user2', password='testpass123').wallet
+
+    def sequences(self, wallet):
+        return list(Transaction.objects.filter(wallet=wallet).order_by('sequence').values_list('sequence', flat=True))
+
+    def test_sequences_are_dense_per_wallet(self):
+        Transaction.objects.deposit(self.wallet1, 100, 'SEQ1')
+        Transaction.objects.transfer(self.wallet1, self.wallet2, 20, 'SEQ2')
+        Transaction.objects.deposit(self.wallet1, 100, 'SEQ1')
+        Transaction.objects.apply_batch([
+            LedgerOperation(Transaction.Type.deposit, self.wallet2.pk, 50, 'SEQ3'),
+            LedgerOperation(LedgerOperation.TRANSFER, self.wallet2.pk, 5, 'SEQ4', to_wallet_pk=self.wallet1.pk),
+            LedgerOperation(Transaction.Type.withdrawal, self.wallet1.pk, 10, 'SEQ5'),
+        ])
+
+        self.assertEqual(self.sequences(self.wallet1), [1, 2, 3, 4])
+        self.assertEqual(self.sequences(self.wallet2), [1, 2, 3])
+        transfer_in = Transaction.objects.get(wallet=self.wallet2, reference='SEQ2')
+        self.assertEqual(TransactionSerializer(transfer_in).data['sequence'], 1)
+        self.assertEqual(TransactionSerializer.serialize_many(Transaction.objects.filter(pk=transfer_in.pk))[0]['sequence'], 1)
+
+    def test_sequence_conflicts_are_retried(self):
+        error = IntegrityError(
+            "UNIQUE constraint failed: wallets_transaction.wallet_id, wallets_transaction.sequence"
+        )
+        self.assertEqual(retry_reason(error, 'sqlite'), 'conflict')
+        error = IntegrityError('duplicate key value violates unique constraint "transaction_wallet_sequence"')
+        self.assertEqual(retry_reason(error, 'postgresql'), 'conflict')
+
+
+class ChangeFeedTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='feed_user', password='testpass123')
+        cls.wallet = cls.user.wallet
+        Transaction.objects.deposit(cls.wallet, 100, 'FEED1')
+        Transaction.objects.withdraw(cls.wallet, 10, 'FEED2')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_returns_transactions_after_the_cursor(self):
+        response = self.client.get('/api/wallets/me/changes', {'since': 0})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['cursor'], 2)
+        self.assertEqual([t['reference'] for t in response.json()['results']], ['FEED1', 'FEED2'])
+
+        response = self.client.get('/api/wallets/me/changes', {'since': 1, 'limit': 1})
+        self.assertEqual([t['sequence'] for t in response.json()['results']], [2])
+
+    def test_times_out_without_changes(self):
+        response = self.client.get('/api/wallets/me/changes', {'timeout': 0})
+
+        self.assertEqual(response.json(), {'cursor': 2, 'results': []})
+
+    def test_requires_a_valid_token_and_query(self):
+        response = APIClient().get('/api/wallets/me/changes')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        self.assertEqual(client.get('/api/wallets/me/changes/stream').status_code, 401)
+
+        response = self.client.get('/api/wallets/me/changes', {'limit': 1000})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('limit', response.json())
+        self.assertEqual(self.client.post('/api/wallets/me/changes').status_code, 405)
+
+    @override_settings(LEDGER_CHANGES_STREAM_SECONDS=0.2, LEDGER_CHANGES_POLL_SECONDS=0.1)
+    def test_stream_sends_events_after_the_last_event_id(self):
+        async def read_stream():
+            response = await AsyncClient().get('/api/wallets/me/changes/stream', headers={
+                'Authorization': 'Token ' + self.token.key, 'Last-Event-ID': '1',
+            })
+            return response, b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+        response, body = async_to_sync(read_stream)()
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('id: 2\nevent: transaction\ndata: {', body)
+        self.assertIn('"reference": "FEED2"', body)
+        self.assertNotIn('id: 1\n', body)
+        self.assertIn(': keepalive', body)
+
+    @override_settings(LEDGER_CHANGES_STREAM_SECONDS=0.2, LEDGER_CHANGES_POLL_SECONDS=0.1)
+    def test_first_stream_connection_starts_at_the_latest_transaction(self):
+        async def read_stream():
+            response = await AsyncClient().get('/api/wallets/me/changes/stream', headers={
+                'Authorization': 'Token ' + self.token.key,
+            })
+            return response, b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+        response, body = async_to_sync(read_stream)()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('event: transaction', body)
+        self.assertIn(': keepalive', body)
+
+
+@override_settings(LEDGER_CHANGES_POLL_SECONDS=20)
+class ChangeFeedWakeUpTestCase(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='wake_user', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+
+    def test_committed_write_wakes_the_waiting_request(self):
+        def deposit_later():
+            time.sleep(0.3)
+            Transaction.objects.deposit(self.user.wallet, 25, 'WAKE1')
+
+        writer = threading.Thread(target=deposit_later)
+        started = time.monotonic()
+        writer.start()
+        response = async_to_sync(AsyncClient().get)(
+            '/api/wallets/me/changes', {'timeout': 10}, headers={'Authorization': 'Token ' + self.token.key},
+        )
+        writer.join()
+
+        # Woken by the publish, not by the 20s database poll.
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(response.json()['cursor'], 1)
+        self.assertEqual(response.json()['results'][0]['reference'], 'WAKE1')
@@ -0,0 +1,104 @@
+import gzip
+import json
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils.http import http_date
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.wallets.models import Transaction, Wallet
+from apps.wallets.models.transaction import LedgerOperation
+from wallet_ledger.middleware import brotli
+
+User = get_user_model()
+
+
+class ConditionalGetTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='etag_user', password='testpass123')
+        cls.wallet = cls.user.wallet
+        Transaction.objects.deposit(cls.wallet, 100, 'ETAG1')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_unchanged_wallet_is_not_modified(self):
+        for url in ('/api/wallets/me/', '/api/wallets/me/transactions', '/api/wallets/me/summary'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['ETag'].startswith('W/"'))
+            self.assertIn('private', response['Cache-Control'])
+
+            with self.assertNumQueries(2):
+                # The token and the wallet.
+                cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(cached.status_code, 304)
+            self.assertEqual(cached['ETag'], response['ETag'])
+
+            cached = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(cached.status_code, 304)
+
+    def test_every_write_changes_the_etag(self):
+        etag = self.client.get('/api/wallets/me/')['ETag']
+
+        Transaction.objects.authorize(self.wallet, 30, 'ETAG2')
+        response = self.client.get('/api/wallets/me/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['reserved'], {'USD': 30})
+
+        etag = response['ETag']
+        Transaction.objects.deposit(self.wallet, 5, 'ETAG3')
+        response = self.client.get('/api/wallets/me/transactions', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_wallet_without_writes_has_no_last_modified(self):
+        user = User.objects.create_user(username='etag_user2', password='testpass123')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=user).key)
+
+        response = self.client.get('/api/wallets/me/')
+        self.assertNotIn('Last-Modified', response)
+        old = http_date(0)
+        self.assertEqual(self.client.get('/api/wallets/me/', HTTP_IF_MODIFIED_SINCE=old).status_code, 200)
+
+
+class CompressionTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='gzip_user', password='testpass123')
+        Transaction.objects.apply_batch([
+            LedgerOperation(Transaction.Type.deposit, cls.user.wallet_id, i + 1, f'GZIP{i}')
+            for i in range(50)
+        ])
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_large_responses_are_gzipped(self):
+        plain = self.client.get('/api/wallets/me/transactions', {'limit': 50})
+        response = self.client.get('/api/wallets/me/transactions', {'limit': 50}, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertLess(len(response.content), len(plain.content) / 3)
+        self.assertEqual(json.loads(gzip.decompress(response.content)), plain.json())
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.client.get('/api/wallets/me/summary', HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertNotIn('Content-Encoding', response)
+
+    @skipUnless(brotli, "brotli is not installed")
+    def test_brotli_is_preferred(self):
+        response = self.client.get('/api/wallets/me/transactions', {'limit': 50}, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(len(json.loads(brotli.decompress(response.content))['results']), 50)
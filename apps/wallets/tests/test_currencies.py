@@ -0,0 +1,112 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.wallets import currencies
+from apps.wallets.jobs import verify_integrity
+from apps.wallets.models import ExchangeRate, Transaction
+from apps.wallets.models.transaction import LedgerOperation
+
+User = get_user_model()
+
+
+class CurrencyTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.wallet1 = User.objects.create_user(username='fx_user1', password='testpass123').wallet
+        cls.wallet2 = User.objects.create_user(username='fx_user2', password='testpass123').wallet
+        ExchangeRate.objects.create(base='EUR', quote='USD', rate=Decimal('1.0850'))
+
+    def setUp(self):
+        currencies.clear_cache()
+
+    def test_sub_balances_are_separate(self):
+        Transaction.objects.deposit(self.wallet1, 100, 'D1')
+        Transaction.objects.deposit(self.wallet1, 50, 'D2', currency='EUR')
+
+        self.assertEqual(self.wallet1.balance, 100)
+        self.assertEqual(self.wallet1.balances, {'USD': 100, 'EUR': 50})
+        with self.assertRaisesMessage(ValidationError, 'Insufficient funds'):
+            Transaction.objects.withdraw(self.wallet1, 60, 'W1', currency='EUR')
+
+    def test_balances_use_one_query(self):
+        Transaction.objects.deposit(self.wallet1, 100, 'D1')
+        Transaction.objects.deposit(self.wallet1, 50, 'D2', currency='EUR')
+        Transaction.objects.deposit(self.wallet1, 20, 'D3', currency='GBP')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.wallet1.balances, {'USD': 100, 'EUR': 50, 'GBP': 20})
+
+    def test_checkpoint_keeps_every_currency(self):
+        Transaction.objects.deposit(self.wallet1, 100, 'D1')
+        Transaction.objects.deposit(self.wallet1, 50, 'D2', currency='EUR')
+
+        self.wallet1.update_balance()
+        Transaction.objects.withdraw(self.wallet1, 20, 'W1', currency='EUR')
+
+        self.wallet1.refresh_from_db()
+        self.assertEqual(self.wallet1.last_balance, 100)
+        self.assertEqual(self.wallet1.currency_balances, {'EUR': 50})
+        self.assertEqual(self.wallet1.balances, {'USD': 100, 'EUR': 30})
+        result = verify_integrity(str(self.wallet1.pk), str(self.wallet1.pk))
+        self.assertEqual(result['mismatches'], [])
+
+    def test_cross_currency_transfer_converts(self):
+        Transaction.objects.deposit(self.wallet1, 1000, 'D1', currency='EUR')
+
+        out, in_ = Transaction.objects.transfer(
+            self.wallet1, self.wallet2, 999, 'T1', currency='EUR', to_currency='USD',
+        )
+
+        self.assertEqual((out.amount, out.currency), (999, 'EUR'))
+        # 999 * 1.085 = 1083.915, rounded down.
+        self.assertEqual((in_.amount, in_.currency), (1083, 'USD'))
+        self.assertEqual(self.wallet1.balances, {'USD': 0, 'EUR': 1})
+        self.assertEqual(self.wallet2.balance, 1083)
+
+    def test_missing_rate_and_unknown_currency(self):
+        Transaction.objects.deposit(self.wallet1, 100, 'D1')
+
+        with self.assertRaisesMessage(ValidationError, 'No exchange rate from USD to EUR'):
+            Transaction.objects.transfer(self.wallet1, self.wallet2, 10, 'T1', to_currency='EUR')
+        with self.assertRaisesMessage(ValidationError, 'Unsupported currency: JPY'):
+            Transaction.objects.deposit(self.wallet1, 100, 'D2', currency='JPY')
+
+    def test_apply_batch_tracks_balances_per_currency(self):
+        results = Transaction.objects.apply_batch([
+            LedgerOperation(Transaction.Type.deposit, self.wallet1.pk, 100, 'B1', currency='EUR'),
+            LedgerOperation(Transaction.Type.withdrawal, self.wallet1.pk, 10, 'B2'),
+            LedgerOperation(LedgerOperation.TRANSFER, self.wallet1.pk, 40, 'B3',
+                            to_wallet_pk=self.wallet2.pk, currency='EUR', to_currency='USD'),
+            LedgerOperation(Transaction.Type.withdrawal, self.wallet1.pk, 70, 'B4', currency='EUR'),
+        ])
+
+        self.assertIsInstance(results[1], ValidationError)
+        self.assertEqual([t.amount for t in results[2]], [40, 43])
+        self.assertIsInstance(results[3], ValidationError)
+        self.assertEqual(self.wallet1.balances, {'USD': 0, 'EUR': 60})
+        self.assertEqual(self.wallet2.balance, 43)
+
+    def test_api_accepts_currency(self):
+        client = APIClient()
+        token = Token.objects.create(user=self.wallet1.user)
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+        response = client.post('/api/wallets/me/deposit', {
+            'amount': 500, 'currency': 'EUR', 'reference': 'API1',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['currency'], 'EUR')
+
+        response = client.post('/api/wallets/me/deposit', {
+            'amount': 500, 'currency': 'XXX', 'reference': 'API2',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = client.get('/api/wallets/me/')
+        self.assertEqual(response.data['balance'], 0)
+        self.assertEqual(response.data['balances'], {'USD': 0, 'EUR': 500})
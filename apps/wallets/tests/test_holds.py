@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.jobs import registry
+from apps.jobs.worker import Worker
+from apps.wallets.models import Hold, Transaction
+
+User = get_user_model()
+
+
+class HoldTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.wallet = User.objects.create_user(username='hold_user', password='testpass123').wallet
+        Transaction.objects.deposit(cls.wallet, 100, 'H_INITIAL')
+
+    def test_authorize_reserves_available_balance(self):
+        hold = Transaction.objects.authorize(self.wallet, 70, 'AUTH1')
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(hold.status, Hold.Status.active)
+        self.assertEqual(self.wallet.reserved, {'USD': 70})
+        self.assertEqual(self.wallet.balance, 100)
+        self.assertEqual(self.wallet.available_balance_of('USD'), 30)
+        self.assertEqual(Transaction.objects.authorize(self.wallet, 70, 'AUTH1').pk, hold.pk)
+
+        with self.assertRaisesMessage(ValidationError, 'Insufficient funds'):
+            Transaction.objects.withdraw(self.wallet, 40, 'W1')
+        with self.assertRaisesMessage(ValidationError, 'Insufficient funds'):
+            Transaction.objects.authorize(self.wallet, 40, 'AUTH2')
+
+    def test_partial_capture_releases_the_rest(self):
+        hold = Transaction.objects.authorize(self.wallet, 70, 'AUTH1')
+
+        t = Transaction.objects.capture(hold, 50)
+
+        self.wallet.refresh_from_db()
+        self.assertEqual((t.type, t.amount, t.reference), (Transaction.Type.capture, 50, 'AUTH1'))
+        self.assertEqual(self.wallet.reserved, {})
+        self.assertEqual(self.wallet.balance, 50)
+        self.assertEqual(Transaction.objects.capture(hold).pk, t.pk)
+        with self.assertRaisesMessage(ValidationError, 'Hold is captured'):
+            Transaction.objects.void(hold)
+
+    def test_void_releases_without_ledger_entries(self):
+        hold = Transaction.objects.authorize(self.wallet, 70, 'AUTH1')
+
+        Transaction.objects.void(hold)
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.reserved, {})
+        self.assertEqual(self.wallet.transactions.count(), 1)
+        with self.assertRaisesMessage(ValidationError, 'Hold is voided'):
+            Transaction.objects.capture(hold)
+
+    def test_available_check_does_not_sum_holds(self):
+        for i in range(5):
+            Transaction.objects.authorize(self.wallet, 10, f'AUTH{i}')
+        self.wallet.refresh_from_db()
+
+        # One aggregate for the balance; reserved funds are a column.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.wallet.available_balance_of('USD'), 50)
+
+    def test_expired_holds_are_released_by_job(self):
+        expired = Transaction.objects.authorize(
+            self.wallet, 30, 'AUTH1', expires_at=timezone.now() - timedelta(minutes=1),
+        )
+        active = Transaction.objects.authorize(self.wallet, 20, 'AUTH2')
+
+        with self.assertRaisesMessage(ValidationError, 'Hold has expired'):
+            Transaction.objects.capture(expired)
+
+        registry.enqueue('wallets.expire_holds')
+        Worker(name='test').run(burst=True)
+
+        expired.refresh_from_db()
+        active.refresh_from_db()
+        self.wallet.refresh_from_db()
+        self.assertEqual(expired.status, Hold.Status.expired)
+        self.assertEqual(active.status, Hold.Status.active)
+        self.assertEqual(self.wallet.reserved, {'USD': 20})
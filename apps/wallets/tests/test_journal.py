@@ -0,0 +1,117 @@
+from importlib import import_module
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase
+
+from apps.wallets.models import JournalEntry, Transaction
+from apps.wallets.models.transaction import LedgerOperation, Posting
+from apps.wallets.serializers import TransactionSerializer
+
+User = get_user_model()
+
+
+class JournalEntryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.payer = User.objects.create_user(username='journal_payer', password='testpass123').wallet
+        cls.merchant = User.objects.create_user(username='journal_merchant', password='testpass123').wallet
+        cls.fees = User.objects.create_user(username='journal_fees', password='testpass123').wallet
+        Transaction.objects.deposit(cls.payer, 1000, 'JE_FUND')
+
+    def test_transfer_legs_share_an_entry(self):
+        withdrawal, deposit = Transaction.objects.transfer(self.payer, self.merchant, 100, 'JE1', {'note': 'rent'})
+        (batched,) = Transaction.objects.apply_batch([
+            LedgerOperation(LedgerOperation.TRANSFER, self.payer.pk, 50, 'JE2', to_wallet_pk=self.fees.pk),
+        ])
+
+        self.assertEqual(withdrawal.journal_id, deposit.journal_id)
+        with self.assertNumQueries(1):
+            legs = list(withdrawal.journal.postings.order_by('type'))
+        self.assertEqual([t.pk for t in legs], [deposit.pk, withdrawal.pk])
+        self.assertEqual(withdrawal.journal.metadata, {'note': 'rent'})
+        self.assertEqual(JournalEntry.objects.get(pk=batched[0].journal_id).postings.count(), 2)
+        self.assertIsNone(Transaction.objects.get(reference='JE_FUND').journal_id)
+
+        data = TransactionSerializer(deposit).data
+        self.assertEqual(data['journal'], str(withdrawal.journal_id))
+        self.assertEqual(
+            TransactionSerializer.serialize_many(Transaction.objects.filter(pk=deposit.pk)),
+            [dict(data)],
+        )
+
+    def test_post_splits_a_payment(self):
+        entry = Transaction.objects.post([
+            Posting(self.payer.pk, -100),
+            Posting(self.merchant.pk, 97),
+            Posting(str(self.fees.pk), 3),
+        ], 'JE3', {'order': '42'})
+
+        postings = {t.wallet_id: t for t in entry.postings.all()}
+        self.assertEqual(postings[self.payer.pk].type, Transaction.Type.transfer_out)
+        self.assertEqual(postings[self.merchant.pk].amount, 97)
+        self.assertEqual(postings[self.fees.pk].counterparty_id, self.payer.pk)
+        self.assertIsNone(postings[self.payer.pk].counterparty_id)
+        self.assertEqual(self.payer.balance, 900)
+        self.assertEqual(self.fees.balance, 3)
+        self.fees.refresh_from_db()
+        self.assertEqual(self.fees.transfer_in_count, 1)
+
+        again = Transaction.objects.post([Posting(self.payer.pk, -100), Posting(self.merchant.pk, 100)], 'JE3')
+        self.assertEqual(again.pk, entry.pk)
+        self.assertEqual(Transaction.objects.filter(reference='JE3').count(), 3)
+
+    def test_invalid_entries_are_refused(self):
+        invalid = [
+            ([Posting(self.payer.pk, -100), Posting(self.merchant.pk, 90)], 'sum to zero'),
+            ([Posting(self.payer.pk, -10, 'USD'), Posting(self.merchant.pk, 10, 'EUR')], 'sum to zero'),
+            ([Posting(self.payer.pk, -10), Posting(self.payer.pk, 10)], 'only once'),
+            ([Posting(self.payer.pk, 0), Posting(self.merchant.pk, 0)], 'must not be zero'),
+            ([Posting(self.merchant.pk, -10), Posting(self.fees.pk, 10)], 'Insufficient funds'),
+        ]
+        for postings, message in invalid:
+            with self.subTest(message), self.assertRaisesMessage(ValidationError, message):
+                Transaction.objects.post(postings, 'JE_BAD')
+
+        self.assertFalse(Transaction.objects.filter(reference='JE_BAD').exists())
+        self.assertFalse(JournalEntry.objects.filter(reference='JE_BAD').exists())
+
+    def test_backfill_links_existing_transfers(self):
+        Transaction.objects.transfer(self.payer, self.merchant, 10, 'JE4')
+        Transaction.objects.transfer(self.merchant, self.fees, 5, 'JE5')
+        withdrawal = Transaction.objects.get(reference='JE4', type=Transaction.Type.transfer_out)
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE wallets_transaction SET journal_id = NULL")
+            cursor.execute("DELETE FROM wallets_journalentry")
+
+        migration = import_module('apps.wallets.migrations.0012_link_transfer_journals')
+        state = MigrationLoader(connection).project_state(('wallets', '0011_journal_entries'))
+        migration.link_transfers(state.apps, connection.schema_editor())
+
+        entry = JournalEntry.objects.get(pk=withdrawal.pk)
+        self.assertEqual(entry.created_at, withdrawal.created_at)
+        self.assertEqual(entry.postings.count(), 2)
+        self.assertEqual(JournalEntry.objects.count(), 2)
+        self.assertFalse(Transaction.objects.filter(type=Transaction.Type.transfer_in, journal__isnull=True).exists())
+
+    def test_backfill_links_transfers_without_counterparty(self):
+        withdrawal, deposit = Transaction.objects.transfer(self.payer, self.merchant, 10, 'JE6')
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE wallets_transaction SET journal_id = NULL, counterparty_id = NULL")
+            cursor.execute("DELETE FROM wallets_journalentry")
+
+        loader = MigrationLoader(connection)
+        schema_editor = connection.schema_editor()
+        schema_editor.deferred_sql = []
+        for name, function in (
+            ('0014_link_transfer_counterparties', 'link_counterparties'),
+            ('0015_link_legacy_transfer_journals', 'link_transfers'),
+        ):
+            migration = import_module(f'apps.wallets.migrations.{name}')
+            getattr(migration, function)(loader.project_state(('wallets', name)).apps, schema_editor)
+
+        deposit.refresh_from_db()
+        self.assertEqual(deposit.journal_id, withdrawal.pk)
+        self.assertEqual(JournalEntry.objects.get(pk=withdrawal.pk).postings.count(), 2)
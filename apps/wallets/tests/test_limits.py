@@ -0,0 +1,131 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.wallets import limits
+from apps.wallets.models import SpendingBucket, Transaction, Wallet
+from apps.wallets.models.transaction import LedgerOperation, Posting
+
+User = get_user_model()
+
+
+class SpendingLimitsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='limit_user', password='testpass123')
+        cls.wallet = cls.user.wallet
+        cls.other = User.objects.create_user(username='limit_other', password='testpass123').wallet
+        Transaction.objects.deposit(cls.wallet, 10000, 'LIM_FUND')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.wallet.refresh_from_db()
+
+    def test_every_debit_path_counts(self):
+        limits.set_limits(self.wallet, daily=100)
+
+        Transaction.objects.withdraw(self.wallet, 30, 'LIM1')
+        Transaction.objects.transfer(self.wallet, self.other, 30, 'LIM2')
+        results = Transaction.objects.apply_batch([
+            LedgerOperation(Transaction.Type.withdrawal, self.wallet.pk, 20, 'LIM3'),
+            LedgerOperation(LedgerOperation.TRANSFER, self.wallet.pk, 30, 'LIM4', to_wallet_pk=self.other.pk),
+            LedgerOperation(Transaction.Type.deposit, self.wallet.pk, 500, 'LIM5'),
+        ])
+        self.assertIsInstance(results[1], ValidationError)
+        self.assertIn('Daily spending limit exceeded', str(results[1]))
+        with self.assertRaisesMessage(ValidationError, 'Daily spending limit exceeded'):
+            Transaction.objects.post([Posting(self.wallet.pk, -30), Posting(self.other.pk, 30)], 'LIM6')
+        Transaction.objects.post([Posting(self.wallet.pk, -20), Posting(self.other.pk, 20)], 'LIM7')
+        with self.assertRaisesMessage(ValidationError, 'Daily spending limit exceeded'):
+            Transaction.objects.withdraw(self.wallet, 1, 'LIM8')
+
+        # Idempotent replays and other wallets are not limited.
+        Transaction.objects.withdraw(self.wallet, 30, 'LIM1')
+        Transaction.objects.withdraw(self.other, 50, 'LIM9')
+        self.assertEqual(
+            limits.Spending({self.wallet.pk: self.wallet}).report(self.wallet.pk),
+            {'USD': {'daily': 100, 'monthly': 100}},
+        )
+
+    def test_holds_count_when_captured(self):
+        limits.set_limits(self.wallet, daily=100)
+        Transaction.objects.withdraw(self.wallet, 50, 'LIM_H1')
+
+        with self.assertRaisesMessage(ValidationError, 'Daily spending limit exceeded'):
+            Transaction.objects.authorize(self.wallet, 60, 'LIM_H2')
+        first = Transaction.objects.authorize(self.wallet, 30, 'LIM_H3')
+        second = Transaction.objects.authorize(self.wallet, 40, 'LIM_H4')
+
+        Transaction.objects.capture(first)
+        with self.assertRaisesMessage(ValidationError, 'Daily spending limit exceeded'):
+            Transaction.objects.capture(second)
+        Transaction.objects.capture(second, amount=20)
+
+        self.assertEqual(
+            limits.Spending({self.wallet.pk: self.wallet}).report(self.wallet.pk),
+            {'USD': {'daily': 100, 'monthly': 100}},
+        )
+
+    def test_windows_roll_by_bucket(self):
+        limits.set_limits(self.wallet, daily=100, monthly=150)
+        now = timezone.now()
+        Transaction.objects.withdraw(self.wallet, 100, 'LIM10')
+
+        later = now + timedelta(hours=25)
+        with mock.patch('apps.wallets.limits.timezone.now', return_value=later):
+            Transaction.objects.withdraw(self.wallet, 50, 'LIM11')
+            with self.assertRaisesMessage(ValidationError, 'Monthly spending limit exceeded'):
+                Transaction.objects.withdraw(self.wallet, 1, 'LIM12')
+
+        self.assertEqual(
+            SpendingBucket.objects.filter(wallet=self.wallet, span=SpendingBucket.Span.hour).count(), 2,
+        )
+        self.assertEqual(limits.prune_buckets(now + timedelta(days=40)), 4)
+
+    def test_checks_read_buckets_not_the_ledger(self):
+        limits.set_limits(self.wallet, daily=1000)
+        Transaction.objects.withdraw(self.wallet, 10, 'LIM13')
+
+        with self.assertNumQueries(0):
+            limits.Spending({}).spend(self.wallet.pk, 'USD', 10**9)
+        spending = limits.Spending({self.wallet.pk: Wallet.objects.get(pk=self.wallet.pk)})
+        with self.assertNumQueries(1):
+            spending.spend(self.wallet.pk, 'USD', 10)
+            spending.spend(self.wallet.pk, 'USD', 10)
+        self.assertEqual(spending.spent(self.wallet.pk, 'USD', limits.DAILY), 30)
+
+    def test_new_limit_counts_earlier_spending(self):
+        Transaction.objects.withdraw(self.wallet, 80, 'LIM14')
+        Transaction.objects.transfer(self.wallet, self.other, 15, 'LIM15')
+
+        limits.set_limits(self.wallet, daily=100)
+        with self.assertRaisesMessage(ValidationError, 'Daily spending limit exceeded'):
+            Transaction.objects.withdraw(self.wallet, 10, 'LIM16')
+
+        limits.set_limits(self.wallet)
+        self.assertEqual(self.wallet.spending_limits, {})
+        self.assertFalse(SpendingBucket.objects.filter(wallet=self.wallet).exists())
+        Transaction.objects.withdraw(self.wallet, 10, 'LIM16')
+
+    def test_limits_endpoint(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        response = client.put('/api/wallets/me/limits', {'daily': 50}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['limits'], {'USD': {'daily': 50}})
+
+        client.post('/api/wallets/me/withdraw', {'amount': 40, 'reference': 'LIM17'})
+        response = client.post('/api/wallets/me/withdraw', {'amount': 20, 'reference': 'LIM18'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Daily spending limit exceeded', str(response.data))
+
+        response = client.get('/api/wallets/me/limits')
+        self.assertEqual(response.data['spent'], {'USD': {'daily': 40, 'monthly': 40}})
+        self.assertEqual(client.put('/api/wallets/me/limits', {'daily': -1}, format='json').status_code, 400)
@@ -0,0 +1,107 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.jobs import registry
+from apps.jobs.worker import Worker
+from apps.wallets.models import Transaction, Wallet
+from apps.wallets.models import transaction as transaction_module
+from apps.wallets.recompute import recompute_balances
+from apps.wallets.tests.factories import create_wallets, seed_ledger
+
+User = get_user_model()
+
+
+class RecomputeBalancesTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.wallet1 = User.objects.create_user(username='rc_user1', password='testpass123').wallet
+        cls.wallet2 = User.objects.create_user(username='rc_user2', password='testpass123').wallet
+        Transaction.objects.deposit(cls.wallet1, 100, 'RC1')
+        Transaction.objects.deposit(cls.wallet1, 40, 'RC2', currency='EUR')
+        Transaction.objects.transfer(cls.wallet1, cls.wallet2, 30, 'RC3')
+
+    def test_matches_update_balance(self):
+        report = recompute_balances()
+
+        self.assertEqual((report.wallets, report.transactions), (2, 4))
+        for wallet in Wallet.objects.all():
+            expected = Wallet.objects.get(pk=wallet.pk)
+            expected.update_balance()
+            self.assertEqual(wallet.last_balance, expected.last_balance)
+            self.assertEqual(wallet.currency_balances, expected.currency_balances)
+        self.wallet1.refresh_from_db()
+        self.assertEqual((self.wallet1.last_balance, self.wallet1.currency_balances), (70, {'EUR': 40}))
+
+    def test_incremental_run_only_reads_new_transactions(self):
+        recompute_balances()
+        Transaction.objects.withdraw(self.wallet1, 20, 'RC4')
+
+        report = recompute_balances()
+
+        self.assertEqual(report.transactions, 1)
+        self.wallet1.refresh_from_db()
+        self.assertEqual(self.wallet1.last_balance, 50)
+        self.assertEqual(self.wallet1.balance, 50)
+
+    def test_rebuild_repairs_corrupted_checkpoints(self):
+        recompute_balances()
+        Wallet.objects.filter(pk=self.wallet2.pk).update(last_balance=999)
+
+        out = io.StringIO()
+        call_command('rebuild_balances', '--dry-run', stdout=out)
+        self.assertIn('1 checkpoints would change', out.getvalue())
+        self.assertEqual(Wallet.objects.get(pk=self.wallet2.pk).last_balance, 999)
+
+        call_command('rebuild_balances', stdout=io.StringIO())
+        self.assertEqual(Wallet.objects.get(pk=self.wallet2.pk).last_balance, 30)
+
+    @override_settings(LEDGER_WRITE_STRATEGY='optimistic', LEDGER_WRITE_BACKOFF_MS=0)
+    def test_checkpoint_during_optimistic_write_loses_nothing(self):
+        number_inserted = transaction_module._number_inserted
+        calls = []
+
+        def checkpoint_first(transactions):
+            # A checkpoint commits while the deposit is in flight, covering the
+            # time its row is about to be created at.
+            calls.append(transactions)
+            if len(calls) == 1:
+                recompute_balances(until=timezone.now() + timedelta(seconds=5))
+            number_inserted(transactions)
+
+        with mock.patch.object(transaction_module, '_number_inserted', checkpoint_first):
+            Transaction.objects.deposit(self.wallet2, 25, 'RC5')
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.wallet2.balance, 55)
+
+    def test_checkpoint_job_uses_engine(self):
+        registry.enqueue('wallets.checkpoint_balances')
+        Worker(name='test').run(burst=True)
+
+        self.wallet1.refresh_from_db()
+        self.assertEqual(self.wallet1.last_balance, 70)
+        self.assertEqual(self.wallet1.balances, {'USD': 70, 'EUR': 40})
+
+
+class SeededLedgerRecomputeTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.wallets = create_wallets(50)
+        cls.written = seed_ledger(cls.wallets, 5000)
+
+    def test_matches_update_balance_on_seeded_ledger(self):
+        report = recompute_balances()
+
+        self.assertEqual(report.transactions, self.written)
+        self.assertGreater(report.transactions, 5000)
+        for wallet in Wallet.objects.all():
+            expected = Wallet.objects.get(pk=wallet.pk)
+            expected.update_balance()
+            self.assertEqual(wallet.last_balance, expected.last_balance)
+            self.assertGreaterEqual(wallet.last_balance, 0)
@@ -0,0 +1,93 @@
+from importlib import import_module
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.wallets.models import Transaction
+
+User = get_user_model()
+
+
+class ReferenceLookupTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User.objects.create_user(username='ref_user1', password='testpass123')
+        cls.user2 = User.objects.create_user(username='ref_user2', password='testpass123')
+        cls.user3 = User.objects.create_user(username='ref_user3', password='testpass123')
+        Transaction.objects.deposit(cls.user1.wallet, 100, 'R-DEPOSIT')
+        Transaction.objects.transfer(cls.user1.wallet, cls.user2.wallet, 30, 'R-TRANSFER')
+        # Same reference on unrelated wallets must not show up.
+        Transaction.objects.deposit(cls.user3.wallet, 5, 'R-TRANSFER')
+        cls.token = Token.objects.create(user=cls.user2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_lookup_returns_both_transfer_legs(self):
+        with self.assertNumQueries(3):  # token, wallet, transactions
+            response = self.client.get('/api/wallets/me/transactions/by-reference/R-TRANSFER')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [t['type'] for t in response.data['transactions']],
+            [Transaction.Type.transfer_out, Transaction.Type.transfer_in],
+        )
+
+    def test_unknown_or_foreign_reference_is_404(self):
+        response = self.client.get('/api/wallets/me/transactions/by-reference/R-DEPOSIT')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_batch_lookup(self):
+        response = self.client.post('/api/wallets/me/transactions/by-reference', {
+            'references': ['R-TRANSFER', 'R-DEPOSIT', 'R-MISSING'],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data['results']), ['R-TRANSFER'])
+        self.assertEqual(len(response.data['results']['R-TRANSFER']), 2)
+        self.assertEqual(response.data['missing'], ['R-DEPOSIT', 'R-MISSING'])
+
+        response = self.client.post('/api/wallets/me/transactions/by-reference', {
+            'references': [f'R{i}' for i in range(501)],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_lookup_uses_indexes(self):
+        plan = Transaction.objects.by_reference(self.user2.wallet, ['R-TRANSFER']).explain()
+
+        if connection.vendor == 'sqlite':
+            self.assertNotIn('SCAN', plan)
+            self.assertIn('(wallet_id=? AND reference=?)', plan)
+            self.assertIn('counterparty_reference', plan)
+
+    def test_migration_links_transfers_without_counterparty(self):
+        user4 = User.objects.create_user(username='ref_user4', password='testpass123')
+        Transaction.objects.deposit(self.user3.wallet, 100, 'R-FUND')
+        Transaction.objects.transfer(self.user3.wallet, user4.wallet, 7, 'R-TRANSFER')
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE wallets_transaction SET counterparty_id = NULL")
+
+        migration = import_module('apps.wallets.migrations.0014_link_transfer_counterparties')
+        state = MigrationLoader(connection).project_state(('wallets', '0014_link_transfer_counterparties'))
+        # Entering a SQLite schema editor is not allowed inside the test's
+        # transaction; the migration only needs it to run statements.
+        schema_editor = connection.schema_editor()
+        schema_editor.deferred_sql = []
+        migration.link_counterparties(state.apps, schema_editor)
+
+        pairs = set(
+            Transaction.objects.filter(reference='R-TRANSFER', counterparty__isnull=False)
+            .values_list('wallet_id', 'counterparty_id')
+        )
+        self.assertEqual(pairs, {
+            (self.user1.wallet.pk, self.user2.wallet.pk), (self.user2.wallet.pk, self.user1.wallet.pk),
+            (self.user3.wallet.pk, user4.wallet.pk), (user4.wallet.pk, self.user3.wallet.pk),
+        })
+        response = self.client.get('/api/wallets/me/transactions/by-reference/R-TRANSFER')
+        self.assertEqual(len(response.data['transactions']), 2)
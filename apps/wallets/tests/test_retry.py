@@ -0,0 +1,150 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.wallets.instrumentation import WRITE_GIVE_UPS, WRITE_RETRIES
+from apps.wallets.models import Transaction, Wallet
+from apps.wallets.models.transaction import TransactionManager
+from apps.wallets.retry import RetryPolicy, WriteConflict, retry_reason
+
+User = get_user_model()
+
+
+def postgresql_error(sqlstate):
+    cause = Exception()
+    cause.sqlstate = sqlstate
+    error = OperationalError()
+    error.__cause__ = cause
+    return error
+
+
+def outermost_transaction():
+    """Makes the retry policy see the write as owning the outermost transaction."""
+    return mock.patch('apps.wallets.retry.connection', SimpleNamespace(in_atomic_block=False, vendor='sqlite'))
+
+
+class RetryReasonTestCase(SimpleTestCase):
+    def test_retryable_errors_per_backend(self):
+        self.assertEqual(retry_reason(WriteConflict()), 'conflict')
+        self.assertEqual(retry_reason(OperationalError('database is locked'), 'sqlite'), 'locked')
+        self.assertEqual(retry_reason(postgresql_error('40P01'), 'postgresql'), 'deadlock')
+        self.assertEqual(retry_reason(postgresql_error('40001'), 'postgresql'), 'serialization')
+        self.assertEqual(retry_reason(postgresql_error('55P03'), 'postgresql'), 'lock_timeout')
+
+        self.assertIsNone(retry_reason(postgresql_error('23505'), 'postgresql'))
+        self.assertIsNone(retry_reason(OperationalError('database is locked'), 'postgresql'))
+        self.assertIsNone(retry_reason(IntegrityError('UNIQUE constraint failed'), 'sqlite'))
+        self.assertIsNone(retry_reason(ValueError()))
+
+    def test_backoff_is_capped(self):
+        policy = RetryPolicy(max_retries=10, backoff=0.01, max_backoff=0.05)
+
+        self.assertTrue(all(0 <= policy.delay(attempt) <= 0.05 for attempt in range(20)))
+
+    @mock.patch('apps.wallets.retry.retry_reason', return_value='deadlock')
+    def test_deadlocks_are_only_retried_in_the_outermost_transaction(self, _):
+        policy = RetryPolicy(max_retries=3, backoff=0, max_backoff=0)
+        fn = mock.Mock(side_effect=[OperationalError(), 'done'])
+
+        self.assertEqual(policy.run('TEST', fn), 'done')
+        self.assertEqual(fn.call_count, 2)
+
+        fn = mock.Mock(side_effect=[OperationalError(), 'done'])
+        with mock.patch('apps.wallets.retry.connection', SimpleNamespace(in_atomic_block=True)):
+            with self.assertRaises(OperationalError):
+                policy.run('TEST', fn)
+        self.assertEqual(fn.call_count, 1)
+
+
+@override_settings(LEDGER_WRITE_BACKOFF_MS=0)
+class WriteRetryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='retry_user', password='testpass123')
+        cls.wallet = cls.user.wallet
+        Transaction.objects.deposit(cls.wallet, 100, 'RETRY_INITIAL')
+        cls.token = Token.objects.create(user=cls.user)
+
+    @override_settings(LEDGER_WRITE_STRATEGY='pessimistic')
+    def test_locked_write_is_retried_once(self):
+        original_balances = Wallet.balances
+        calls = []
+
+        def balances_locked_once(wallet):
+            calls.append(wallet.version)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return original_balances.fget(wallet)
+
+        retries = WRITE_RETRIES.get(type=Transaction.Type.withdrawal, reason='locked')
+        with mock.patch.object(Wallet, 'balances', property(balances_locked_once)), outermost_transaction():
+            Transaction.objects.withdraw(self.wallet, 30, 'RETRY_WITHDRAW')
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(WRITE_RETRIES.get(type=Transaction.Type.withdrawal, reason='locked'), retries + 1)
+        self.assertEqual(Transaction.objects.filter(reference='RETRY_WITHDRAW').count(), 1)
+        self.assertEqual(self.wallet.balance, 70)
+
+    def test_locked_nested_write_is_not_retried(self):
+        calls = []
+
+        def locked(wallet):
+            calls.append(wallet.version)
+            raise OperationalError('database is locked')
+
+        # The test case's transaction is the outermost one.
+        with mock.patch.object(Wallet, 'balances', property(locked)):
+            with self.assertRaises(OperationalError):
+                Transaction.objects.withdraw(self.wallet, 10, 'NESTED')
+
+        self.assertEqual(len(calls), 1)
+
+    @override_settings(LEDGER_WRITE_MAX_RETRIES=2)
+    def test_gives_up_after_max_retries(self):
+        def always_locked(wallet):
+            raise OperationalError('database is locked')
+
+        give_ups = WRITE_GIVE_UPS.get(type=Transaction.Type.withdrawal, reason='locked')
+        with mock.patch.object(Wallet, 'balances', property(always_locked)), outermost_transaction():
+            with self.assertRaises(WriteConflict):
+                Transaction.objects.withdraw(self.wallet, 10, 'BUSY')
+
+        self.assertEqual(WRITE_GIVE_UPS.get(type=Transaction.Type.withdrawal, reason='locked'), give_ups + 1)
+        self.assertFalse(Transaction.objects.filter(reference='BUSY').exists())
+
+    def test_losing_the_race_to_the_same_reference_is_idempotent(self):
+        original_write = TransactionManager._write
+        calls = []
+
+        def write_after_concurrent_request(manager, *args):
+            calls.append(args)
+            if len(calls) == 1:
+                # The same request commits after this one's idempotency probe.
+                Transaction.objects.withdraw(self.wallet, 30, 'RACE')
+            return original_write(manager, *args)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        with mock.patch.object(TransactionManager, '_write', write_after_concurrent_request):
+            response = client.post('/api/wallets/me/withdraw', {'amount': 30, 'reference': 'RACE'})
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Transaction.objects.filter(reference='RACE').count(), 1)
+        self.assertEqual(response.data['id'], str(Transaction.objects.get(reference='RACE').pk))
+        self.assertEqual(self.wallet.balance, 70)
+
+    def test_give_up_is_a_503(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        with mock.patch.object(Transaction.objects, 'withdraw', side_effect=WriteConflict('Gave up')):
+            response = client.post('/api/wallets/me/withdraw', {'amount': 10, 'reference': 'BUSY'})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
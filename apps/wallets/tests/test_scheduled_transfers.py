@@ -0,0 +1,167 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.wallets.models import ScheduledTransfer, Transaction
+from apps.wallets.retry import WriteConflict
+from apps.wallets.scheduled_transfers import SCHEDULED_TRANSFERS_EXECUTED, execute_batch, run_due
+
+User = get_user_model()
+
+
+class ScheduledTransferTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User.objects.create_user(username='sched_user1', password='testpass123')
+        cls.user2 = User.objects.create_user(username='sched_user2', password='testpass123')
+        cls.wallet1 = cls.user1.wallet
+        cls.wallet2 = cls.user2.wallet
+        Transaction.objects.deposit(cls.wallet1, 100, 'S_INITIAL')
+
+    def schedule(self, reference, amount=10, next_run_at=None, **kwargs):
+        return ScheduledTransfer.objects.create(
+            from_wallet=self.wallet1,
+            to_wallet=self.wallet2,
+            amount=amount,
+            reference=reference,
+            next_run_at=next_run_at or timezone.now() - timedelta(seconds=1),
+            **kwargs,
+        )
+
+    def test_due_transfers_run_once(self):
+        once = self.schedule('ONCE')
+        later = self.schedule('LATER', next_run_at=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(execute_batch(), 1)
+        self.assertEqual(execute_batch(), 0)
+
+        once.refresh_from_db()
+        later.refresh_from_db()
+        self.assertEqual((once.status, once.runs), (ScheduledTransfer.Status.completed, 1))
+        self.assertEqual(later.runs, 0)
+        self.assertEqual(self.wallet2.balance, 10)
+        self.assertTrue(self.wallet1.transactions.filter(reference='ONCE:1').exists())
+
+    def test_recurring_transfer_skips_missed_runs(self):
+        now = timezone.now()
+        recurring = self.schedule('DAILY', next_run_at=now - timedelta(days=3, minutes=1), interval_seconds=86400)
+
+        execute_batch(now=now)
+
+        recurring.refresh_from_db()
+        self.assertEqual(recurring.status, ScheduledTransfer.Status.active)
+        self.assertEqual(recurring.runs, 1)
+        self.assertGreater(recurring.next_run_at, now)
+        self.assertLessEqual(recurring.next_run_at, now + timedelta(days=1))
+
+    def test_failed_run_is_recorded(self):
+        failed_before = SCHEDULED_TRANSFERS_EXECUTED.get(outcome='failed')
+        once = self.schedule('TOO_MUCH', amount=500)
+        recurring = self.schedule('RECURRING_TOO_MUCH', amount=500, interval_seconds=3600)
+
+        execute_batch()
+
+        once.refresh_from_db()
+        recurring.refresh_from_db()
+        self.assertEqual(once.status, ScheduledTransfer.Status.failed)
+        self.assertEqual(once.last_error, 'Insufficient funds in source wallet')
+        self.assertEqual(recurring.status, ScheduledTransfer.Status.active)
+        self.assertEqual(SCHEDULED_TRANSFERS_EXECUTED.get(outcome='failed'), failed_before + 2)
+
+    def test_transfers_from_one_source_are_applied_together(self):
+        for i in range(5):
+            self.schedule(f'BATCHED{i}')
+
+        with mock.patch.object(
+            Transaction.objects, 'apply_batch', wraps=Transaction.objects.apply_batch,
+        ) as apply_batch:
+            self.assertEqual(execute_batch(), 5)
+
+        apply_batch.assert_called_once()
+        self.assertEqual(self.wallet2.balance, 50)
+
+    def test_each_source_is_committed_on_its_own(self):
+        first = self.schedule('FIRST', next_run_at=timezone.now() - timedelta(seconds=2))
+        Transaction.objects.deposit(self.wallet2, 100, 'S_INITIAL2')
+        second = ScheduledTransfer.objects.create(
+            from_wallet=self.wallet2, to_wallet=self.wallet1, amount=10, reference='SECOND',
+            next_run_at=timezone.now() - timedelta(seconds=1),
+        )
+        original = Transaction.objects.apply_batch
+        calls = []
+
+        def fails_for_second_source(operations):
+            calls.append(operations[0].wallet_pk)
+            if len(calls) == 2:
+                raise RuntimeError('Worker crashed')
+            return original(operations)
+
+        with mock.patch.object(Transaction.objects, 'apply_batch', fails_for_second_source):
+            with self.assertRaises(RuntimeError):
+                execute_batch()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(calls, [self.wallet1.pk, self.wallet2.pk])
+        self.assertEqual(first.runs, 1)
+        self.assertEqual(second.runs, 0)
+        self.assertTrue(self.wallet1.transactions.filter(reference='FIRST:1').exists())
+
+    def test_conflicting_source_is_retried_alone(self):
+        self.schedule('RETRIED')
+        original = Transaction.objects.apply_batch
+        calls = []
+
+        def conflicts_once(operations):
+            calls.append(operations)
+            if len(calls) == 1:
+                raise WriteConflict('Lost to a concurrent write')
+            return original(operations)
+
+        with mock.patch.object(Transaction.objects, 'apply_batch', conflicts_once):
+            self.assertEqual(execute_batch(), 1)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.wallet2.balance, 10)
+
+    @override_settings(LEDGER_SCHEDULED_POLL_SECONDS=0.05)
+    def test_transfers_claimed_elsewhere_are_polled(self):
+        self.schedule('CLAIMED')
+
+        # Another executor holds the due transfer, so every pass skips it.
+        with mock.patch('apps.wallets.scheduled_transfers.execute_batch', return_value=0) as execute:
+            self.assertEqual(run_due(until=timezone.now() + timedelta(seconds=0.2)), 0)
+
+        self.assertLessEqual(execute.call_count, 6)
+
+    def test_api_creates_lists_and_cancels(self):
+        client = APIClient()
+        token = Token.objects.create(user=self.user1)
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        midnight = (timezone.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        response = client.post('/api/wallets/me/scheduled-transfers', {
+            'to_user_id': self.user2.id,
+            'amount': 25,
+            'reference': 'RENT',
+            'run_at': midnight.isoformat(),
+            'interval_seconds': 86400,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        scheduled = ScheduledTransfer.objects.get(pk=response.data['id'])
+        # Minute-aligned run times are spread across the minute.
+        self.assertEqual(scheduled.next_run_at - midnight, timedelta(seconds=scheduled.pk.int % 60))
+
+        response = client.get('/api/wallets/me/scheduled-transfers')
+        self.assertEqual([s['reference'] for s in response.data], ['RENT'])
+        self.assertEqual(response.data[0]['to_user_id'], self.user2.id)
+
+        response = client.delete(f'/api/wallets/me/scheduled-transfers/{scheduled.pk}')
+        self.assertEqual(response.status_code, 204)
+        scheduled.refresh_from_db()
+        self.assertEqual(scheduled.status, ScheduledTransfer.Status.cancelled)
@@ -0,0 +1,38 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from apps.wallets.models import Transaction
+from apps.wallets.serializers import TransactionSerializer
+from wallet_ledger import renderers
+from wallet_ledger.renderers import ORJSONRenderer
+
+User = get_user_model()
+
+
+class FastSerializationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.wallet = User.objects.create_user(username='serializer_user', password='testpass123').wallet
+        Transaction.objects.deposit(
+            wallet=cls.wallet,
+            amount=100,
+            reference='SER1',
+            metadata={"description": "Dépôt \u2028 initial", "tags": ["a", 1, None]},
+        )
+        Transaction.objects.withdraw(wallet=cls.wallet, amount=40, reference='SER2')
+
+    def test_fast_path_matches_model_serializer(self):
+        transactions = self.wallet.transactions.order_by('-created_at')
+
+        expected = JSONRenderer().render(TransactionSerializer(transactions, many=True).data)
+        actual = ORJSONRenderer().render(TransactionSerializer.serialize_many(transactions))
+
+        self.assertEqual(actual, expected)
+
+    def test_renderer_falls_back_without_orjson(self):
+        data = TransactionSerializer.serialize_many(self.wallet.transactions.all())
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
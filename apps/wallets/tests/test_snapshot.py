@@ -0,0 +1,68 @@
+import io
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.wallets.models import Transaction, Wallet
+from apps.wallets.snapshot import Snapshot, write_snapshot
+
+User = get_user_model()
+
+
+class LedgerSnapshotTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.wallet1 = User.objects.create_user(username='snap_user1', password='testpass123').wallet
+        cls.wallet2 = User.objects.create_user(username='snap_user2', password='testpass123').wallet
+        Transaction.objects.deposit(cls.wallet1, 100, 'SN1')
+        Transaction.objects.deposit(cls.wallet1, 40, 'SN2', currency='EUR')
+        Transaction.objects.withdraw(cls.wallet1, 30, 'SN3')
+        Transaction.objects.transfer(cls.wallet1, cls.wallet2, 20, 'SN4')
+        cls.wallet1.update_balance()
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / 'snapshot'
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_replay_matches_database_balances(self):
+        write_snapshot(self.path, chunk_size=2)
+        snapshot = Snapshot(self.path)
+
+        balances = snapshot.balances()
+        wallet_ids = snapshot.wallet_ids()
+        for wallet in Wallet.objects.all():
+            row = wallet_ids.index(wallet.pk)
+            replayed = {
+                currency: int(balances[row, column])
+                for column, currency in enumerate(snapshot.currencies)
+                if balances[row, column]
+            }
+            expected = {currency: amount for currency, amount in wallet.balances.items() if amount}
+            self.assertEqual(replayed, expected)
+        self.assertEqual(snapshot.manifest['transactions'], 5)
+
+    def test_as_of_excludes_later_transactions(self):
+        as_of = timezone.now()
+        Transaction.objects.deposit(self.wallet2, 1000, 'SN_LATER')
+
+        write_snapshot(self.path, as_of=as_of)
+
+        self.assertEqual(Snapshot(self.path).manifest['transactions'], 5)
+
+    def test_verify_reports_checkpoint_mismatches(self):
+        call_command('ledger_snapshot', str(self.path), stdout=io.StringIO())
+        call_command('replay_snapshot', str(self.path), '--verify', stdout=io.StringIO())
+
+        Wallet.objects.filter(pk=self.wallet1.pk).update(last_balance=51)
+        other = Path(self.directory.name) / 'broken'
+        call_command('ledger_snapshot', str(other), stdout=io.StringIO())
+        with self.assertRaisesMessage(CommandError, '1 checkpoint mismatches'):
+            call_command('replay_snapshot', str(other), '--verify', stdout=io.StringIO())
@@ -0,0 +1,24 @@
+from django.test import TransactionTestCase
+
+from apps.wallets.models import Transaction, Wallet
+from apps.wallets.stress import check_invariants, create_funded_wallets, run_stress
+
+
+class StressHarnessTestCase(TransactionTestCase):
+    def test_concurrent_transfers_keep_invariants(self):
+        report = run_stress(wallets=5, workers=4, transfers=25, balance=100, threads=True)
+
+        self.assertEqual(report.violations, [])
+        self.assertEqual(report.attempts, 100)
+        self.assertEqual(len(report.latencies), 100)
+        self.assertGreater(report.outcomes.get('ok', 0), 0)
+        self.assertLessEqual(report.latency(0.5), report.latency(0.99))
+
+    def test_violations_are_reported(self):
+        wallet_pks = create_funded_wallets(2, 100)
+        Transaction.objects.deposit(Wallet(pk=wallet_pks[0]), 1, 'UNBALANCED')
+
+        self.assertEqual(
+            check_invariants(wallet_pks, 100, transfers_ok=1),
+            ['Money is not conserved: 201 instead of 200', '0 transfers written but 1 succeeded'],
+        )
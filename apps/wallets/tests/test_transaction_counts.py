@@ -0,0 +1,115 @@
+import io
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.wallets.models import Transaction, Wallet
+from apps.wallets.models.transaction import LedgerOperation
+from apps.wallets.recompute import recount_transactions
+from apps.wallets.retry import WriteConflict
+
+User = get_user_model()
+
+
+class TransactionCountsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User.objects.create_user(username='count_user1', password='testpass123')
+        cls.user2 = User.objects.create_user(username='count_user2', password='testpass123')
+        cls.wallet1 = cls.user1.wallet
+        cls.wallet2 = cls.user2.wallet
+        Transaction.objects.deposit(cls.wallet1, 100, 'CNT1')
+        Transaction.objects.withdraw(cls.wallet1, 10, 'CNT2')
+        Transaction.objects.transfer(cls.wallet1, cls.wallet2, 20, 'CNT3')
+        hold = Transaction.objects.authorize(cls.wallet1, 30, 'CNT4')
+        Transaction.objects.capture(hold)
+        cls.token = Token.objects.create(user=cls.user1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def assertCountsMatchLedger(self, wallet):
+        wallet.refresh_from_db()
+        expected = {
+            t: Transaction.objects.filter(wallet=wallet, type=t).count() for t in Transaction.Type.values
+        }
+        self.assertEqual(wallet.transaction_counts, expected)
+        self.assertEqual(wallet.transaction_count, sum(expected.values()))
+
+    def test_every_write_path_counts(self):
+        self.wallet1.refresh_from_db()
+        self.assertEqual(self.wallet1.transaction_count, 4)
+        self.assertEqual(self.wallet1.transaction_counts, {
+            'DEPOSIT': 1, 'WITHDRAWAL': 1, 'TRANSFER_IN': 0, 'TRANSFER_OUT': 1, 'CAPTURE': 1,
+        })
+        self.assertCountsMatchLedger(self.wallet2)
+
+        Transaction.objects.apply_batch([
+            LedgerOperation(Transaction.Type.deposit, self.wallet2.pk, 50, 'CNT5'),
+            LedgerOperation(Transaction.Type.withdrawal, self.wallet2.pk, 500, 'CNT6'),
+            LedgerOperation(LedgerOperation.TRANSFER, self.wallet2.pk, 5, 'CNT7', to_wallet_pk=self.wallet1.pk),
+        ])
+        self.assertCountsMatchLedger(self.wallet1)
+        self.assertCountsMatchLedger(self.wallet2)
+
+    def test_idempotent_and_refused_writes_do_not_count(self):
+        Transaction.objects.deposit(self.wallet1, 100, 'CNT1')
+        with self.assertRaises(Exception):
+            Transaction.objects.withdraw(self.wallet1, 10000, 'CNT8')
+
+        self.wallet1.refresh_from_db()
+        self.assertEqual(self.wallet1.transaction_count, 4)
+
+    @override_settings(LEDGER_WRITE_BACKOFF_MS=0)
+    def test_retried_write_counts_once(self):
+        original_balances = Wallet.available_balance_of
+        calls = []
+
+        def conflict_once(wallet, currency):
+            calls.append(currency)
+            if len(calls) == 1:
+                raise WriteConflict('Lost to a concurrent write')
+            return original_balances(wallet, currency)
+
+        with mock.patch.object(Wallet, 'available_balance_of', conflict_once):
+            Transaction.objects.withdraw(self.wallet1, 5, 'CNT9')
+
+        self.assertEqual(len(calls), 2)
+        self.assertCountsMatchLedger(self.wallet1)
+
+    def test_list_count_reads_the_counters(self):
+        self.client.get('/api/wallets/me/transactions')
+        with self.assertNumQueries(3):
+            # Token, wallet and the page: no COUNT.
+            response = self.client.get('/api/wallets/me/transactions', {'type': ['DEPOSIT', 'CAPTURE']})
+        self.assertEqual(response.data['count'], 2)
+
+        Wallet.objects.filter(pk=self.wallet1.pk).update(transaction_count=42)
+        self.assertEqual(self.client.get('/api/wallets/me/transactions').data['count'], 42)
+        # Other filters still count the rows.
+        self.assertEqual(self.client.get('/api/wallets/me/transactions', {'min_amount': 20}).data['count'], 3)
+
+    def test_summary(self):
+        response = self.client.get('/api/wallets/me/summary')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['transaction_count'], 4)
+        self.assertEqual(response.data['counts_by_type']['CAPTURE'], 1)
+        self.assertEqual(APIClient().get('/api/wallets/me/summary').status_code, 401)
+
+    def test_rebuild_repairs_corrupted_counters(self):
+        Wallet.objects.filter(pk=self.wallet2.pk).update(transaction_count=7, deposit_count=3)
+
+        out = io.StringIO()
+        call_command('rebuild_transaction_counts', '--dry-run', stdout=out)
+        self.assertIn("1 wallets' counters would change", out.getvalue())
+        self.assertEqual(Wallet.objects.get(pk=self.wallet2.pk).transaction_count, 7)
+
+        call_command('rebuild_transaction_counts', stdout=io.StringIO())
+        self.assertCountsMatchLedger(self.wallet2)
+        self.assertEqual(recount_transactions().changed, 0)
@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.wallets.models import Transaction
+from apps.wallets.serializers import TransactionListSerializer
+
+User = get_user_model()
+
+
+class TransactionSearchTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User.objects.create_user(username='search_user1', password='testpass123')
+        cls.user2 = User.objects.create_user(username='search_user2', password='testpass123')
+        cls.wallet1 = cls.user1.wallet
+        Transaction.objects.deposit(cls.wallet1, 100, 'ORDER-1', {'order_id': 'A1', 'category': 'food'})
+        Transaction.objects.deposit(cls.wallet1, 250, 'ORDER-2', {'order_id': 'A2', 'category': 'food'})
+        Transaction.objects.withdraw(cls.wallet1, 40, 'REFUND-1', {'order_id': 'A1'})
+        Transaction.objects.deposit(cls.user2.wallet, 100, 'ORDER-1', {'order_id': 'A1'})
+        cls.token = Token.objects.create(user=cls.user1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def search(self, params):
+        response = self.client.get('/api/wallets/me/transactions', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return sorted(t['reference'] for t in response.data['results']), response.data['count']
+
+    def test_filters(self):
+        self.assertEqual(self.search({'type': 'DEPOSIT'}), (['ORDER-1', 'ORDER-2'], 2))
+        self.assertEqual(self.search({'type': ['DEPOSIT', 'WITHDRAWAL']})[1], 3)
+        self.assertEqual(self.search({'min_amount': 50, 'max_amount': 100}), (['ORDER-1'], 1))
+        self.assertEqual(self.search({'reference_prefix': 'ORDER'}), (['ORDER-1', 'ORDER-2'], 2))
+        self.assertEqual(self.search({'reference_prefix': 'order'}), ([], 0))
+        self.assertEqual(self.search({'metadata.order_id': 'A1'}), (['ORDER-1', 'REFUND-1'], 2))
+        self.assertEqual(
+            self.search({'metadata.order_id': 'A1', 'metadata.category': 'food', 'type': 'DEPOSIT'}),
+            (['ORDER-1'], 1),
+        )
+        tomorrow = (timezone.now() + timedelta(days=1)).isoformat()
+        self.assertEqual(self.search({'created_after': tomorrow}), ([], 0))
+        self.assertEqual(self.search({'created_before': tomorrow})[1], 3)
+
+    def test_invalid_filters_are_rejected(self):
+        for params in ({'metadata.secret': 'x'}, {'type': 'BOGUS'}, {'min_amount': 0}):
+            response = self.client.get('/api/wallets/me/transactions', params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_filtered_pages_use_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite query plans')
+
+        for params in (
+            {},
+            {'type': ['DEPOSIT']},
+            {'created_after': timezone.now().isoformat()},
+            {'min_amount': 50, 'max_amount': 100},
+            {'reference_prefix': 'ORDER'},
+            {'metadata.order_id': 'A1'},
+            {'metadata.merchant_id': 'M1'},
+        ):
+            serializer = TransactionListSerializer(data=params)
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            queryset = serializer.filter(self.wallet1.transactions.all())
+            for plan in (queryset.explain(), queryset.order_by('-created_at')[:20].explain()):
+                self.assertNotIn('SCAN', plan, params)
+                self.assertIn('USING INDEX', plan, params)
+
+        queryset = self.wallet1.transactions.all().with_metadata({'order_id': 'A1'})
+        self.assertIn('transaction_metadata_order_id', queryset.explain())
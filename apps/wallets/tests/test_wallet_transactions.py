@@ -7,17 +7,18 @@ User = get_user_model()
 
 
 class WalletTransactionTestCase(TestCase):
-    def setUp(self):
-        self.user1 = User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User.objects.create_user(
             username='user1',
             password='testpass123'
         )
-        self.user2 = User.objects.create_user(
+        cls.user2 = User.objects.create_user(
             username='user2',
             password='testpass123'
         )
-        self.wallet1 = self.user1.wallet
-        self.wallet2 = self.user2.wallet
+        cls.wallet1 = cls.user1.wallet
+        cls.wallet2 = cls.user2.wallet
 
     def test_deposit_increases_balance(self):
         initial_balance = self.wallet1.balance
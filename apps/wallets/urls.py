@@ -3,8 +3,16 @@ from . import views
 
 urlpatterns = [
     path('me/', views.wallet_detail, name='wallet-detail'),
+    path('me/summary', views.wallet_summary, name='wallet-summary'),
+    path('me/changes', views.wallet_changes, name='wallet-changes'),
+    path('me/changes/stream', views.wallet_change_stream, name='wallet-change-stream'),
     path('me/deposit', views.deposit, name='deposit'),
     path('me/withdraw', views.withdraw, name='withdraw'),
     path('me/transfer', views.transfer, name='transfer'),
+    path('me/limits', views.wallet_limits, name='wallet-limits'),
     path('me/transactions', views.transaction_list, name='transaction-list'),
+    path('me/transactions/by-reference', views.transactions_by_references, name='transactions-by-references'),
+    path('me/transactions/by-reference/<path:reference>', views.transaction_by_reference, name='transaction-by-reference'),
+    path('me/scheduled-transfers', views.scheduled_transfer_list, name='scheduled-transfer-list'),
+    path('me/scheduled-transfers/<uuid:pk>', views.scheduled_transfer_cancel, name='scheduled-transfer-cancel'),
 ]
@@ -1,11 +1,26 @@
+import json
+from time import monotonic
+
+from asgiref.sync import sync_to_async
 from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
 
-from .models import Wallet
+from . import changes, limits
+from .conditional import add_validators, not_modified
+from .models import Wallet, ScheduledTransfer, Transaction
 from .serializers import (
+    ChangesSerializer,
+    ReferenceLookupSerializer,
+    SpendingLimitsSerializer,
+    ScheduledTransferSerializer,
     WalletSerializer,
     DepositSerializer,
     WithdrawSerializer,
@@ -88,8 +103,24 @@ def transfer(request):
 @permission_classes([IsAuthenticated])
 def wallet_detail(request):
     wallet = get_object_or_404(Wallet, user=request.user)
+    response = not_modified(request, wallet)
+    if response is not None:
+        return response
     serializer = WalletSerializer(wallet)
-    return Response(serializer.data)
+    return add_validators(Response(serializer.data), wallet)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def wallet_summary(request):
+    wallet = get_object_or_404(Wallet, user=request.user)
+    response = not_modified(request, wallet)
+    if response is not None:
+        return response
+    return add_validators(Response({
+        'transaction_count': wallet.transaction_count,
+        'counts_by_type': wallet.transaction_counts,
+    }), wallet)
 
 
 @api_view(['GET'])
@@ -105,22 +136,208 @@ def transaction_list(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    response = not_modified(request, wallet)
+    if response is not None:
+        return response
+
     limit = query_serializer.validated_data['limit']
     offset = query_serializer.validated_data['offset']
 
-    transactions = (
-        wallet.transactions
-        .order_by('-created_at')
-        [offset:offset + limit]
-    )
+    filtered = query_serializer.filter(wallet.transactions.all())
+    transactions = filtered.order_by('-created_at')[offset:offset + limit]
 
-    total_count = wallet.transactions.count()
+    total_count = query_serializer.count(wallet, filtered)
 
-    serializer = TransactionSerializer(transactions, many=True)
-
-    return Response({
+    return add_validators(Response({
         'count': total_count,
         'limit': limit,
         'offset': offset,
-        'results': serializer.data
+        'results': TransactionSerializer.serialize_many(transactions)
+    }), wallet)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def transaction_by_reference(request, reference):
+    wallet = get_object_or_404(Wallet, user=request.user)
+
+    transactions = TransactionSerializer.serialize_many(
+        Transaction.objects.by_reference(wallet, [reference]).order_by('created_at')
+    )
+    if not transactions:
+        return Response({'detail': 'No transaction with this reference.'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({'reference': reference, 'transactions': transactions})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def transactions_by_references(request):
+    wallet = get_object_or_404(Wallet, user=request.user)
+
+    serializer = ReferenceLookupSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    references = serializer.validated_data['references']
+    results = {}
+    transactions = Transaction.objects.by_reference(wallet, references).order_by('created_at')
+    for transaction in TransactionSerializer.serialize_many(transactions):
+        results.setdefault(transaction['reference'], []).append(transaction)
+
+    return Response({
+        'results': results,
+        'missing': [reference for reference in dict.fromkeys(references) if reference not in results],
+    })
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def scheduled_transfer_list(request):
+    wallet = get_object_or_404(Wallet, user=request.user)
+
+    if request.method == 'GET':
+        scheduled = (
+            wallet.scheduled_transfers
+            .select_related('to_wallet__user')
+            .order_by('-created_at')
+        )
+        return Response(ScheduledTransferSerializer(scheduled, many=True).data)
+
+    serializer = ScheduledTransferSerializer(
+        data=request.data,
+        context={'wallet': wallet}
+    )
+
+    if serializer.is_valid():
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def scheduled_transfer_cancel(request, pk):
+    wallet = get_object_or_404(Wallet, user=request.user)
+    cancelled = (
+        ScheduledTransfer.objects
+        .filter(pk=pk, from_wallet=wallet, status=ScheduledTransfer.Status.active)
+        .update(status=ScheduledTransfer.Status.cancelled)
+    )
+    if not cancelled:
+        get_object_or_404(ScheduledTransfer, pk=pk, from_wallet=wallet)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['GET', 'PUT'])
+@permission_classes([IsAuthenticated])
+def wallet_limits(request):
+    wallet = get_object_or_404(Wallet, user=request.user)
+
+    if request.method == 'PUT':
+        serializer = SpendingLimitsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        limits.set_limits(wallet, **serializer.validated_data)
+
+    return Response({
+        'limits': wallet.spending_limits,
+        'spent': limits.Spending({wallet.pk: wallet}).report(wallet.pk),
+    })
+
+
+# The change feed waits for new transactions, so its views are asynchronous
+# Django views rather than REST framework ones: under ASGI a waiting client
+# holds no thread. They authenticate with the same API tokens.
+
+def _token_wallet(request):
+    """The wallet of the user authenticated by the request's API token, or None."""
+    try:
+        authenticated = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    if authenticated is None:
+        return None
+    return Wallet.objects.filter(user=authenticated[0]).first()
+
+
+def _unauthorized():
+    response = JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    response.headers['WWW-Authenticate'] = 'Token'
+    return response
+
+
+def _changes_after(wallet_pk, since, limit):
+    return TransactionSerializer.serialize_many(
+        Transaction.objects.filter(wallet_id=wallet_pk, sequence__gt=since).order_by('sequence')[:limit]
+    )
+
+
+@require_GET
+async def wallet_changes(request):
+    wallet = await sync_to_async(_token_wallet)(request)
+    if wallet is None:
+        return _unauthorized()
+
+    query = ChangesSerializer(data=request.GET)
+    if not query.is_valid():
+        return JsonResponse(query.errors, status=400)
+    since = query.validated_data.get('since', wallet.transaction_count)
+    limit = query.validated_data['limit']
+    timeout = min(
+        query.validated_data.get('timeout', settings.LEDGER_CHANGES_TIMEOUT_SECONDS),
+        settings.LEDGER_CHANGES_TIMEOUT_SECONDS,
+    )
+
+    deadline = monotonic() + timeout
+    with changes.subscribe(wallet.pk) as subscription:
+        while True:
+            subscription.clear()
+            entries = await sync_to_async(_changes_after)(wallet.pk, since, limit)
+            remaining = deadline - monotonic()
+            if entries or remaining <= 0:
+                break
+            await subscription.wait_async(min(remaining, settings.LEDGER_CHANGES_POLL_SECONDS))
+
+    return JsonResponse({
+        'cursor': entries[-1]['sequence'] if entries else since,
+        'results': entries,
     })
+
+
+async def _change_events(wallet_pk, since, limit):
+    deadline = monotonic() + settings.LEDGER_CHANGES_STREAM_SECONDS
+    with changes.subscribe(wallet_pk) as subscription:
+        while (remaining := deadline - monotonic()) > 0:
+            subscription.clear()
+            entries = await sync_to_async(_changes_after)(wallet_pk, since, limit)
+            for entry in entries:
+                yield f"id: {entry['sequence']}\nevent: transaction\ndata: {json.dumps(entry)}\n\n"
+            if entries:
+                since = entries[-1]['sequence']
+            elif not await subscription.wait_async(min(remaining, settings.LEDGER_CHANGES_POLL_SECONDS)):
+                # Keeps proxies from closing an idle connection.
+                yield ": keepalive\n\n"
+
+
+@require_GET
+async def wallet_change_stream(request):
+    wallet = await sync_to_async(_token_wallet)(request)
+    if wallet is None:
+        return _unauthorized()
+
+    # A reconnecting EventSource sends the id of the last event it received.
+    data = request.GET.dict()
+    if 'Last-Event-ID' in request.headers:
+        data.setdefault('since', request.headers['Last-Event-ID'])
+    query = ChangesSerializer(data=data)
+    if not query.is_valid():
+        return JsonResponse(query.errors, status=400)
+    since = query.validated_data.get('since', wallet.transaction_count)
+
+    return StreamingHttpResponse(
+        _change_events(wallet.pk, since, query.validated_data['limit']),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
@@ -0,0 +1,19 @@
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import exception_handler as drf_exception_handler
+
+from apps.wallets.retry import WriteConflict
+
+
+def exception_handler(exc, context):
+    """
+    DRF's handler, plus 503 with `Retry-After` for ledger writes that gave up
+    retrying under contention. Retrying with the same reference is safe.
+    """
+    if isinstance(exc, WriteConflict):
+        return Response(
+            {'detail': 'The wallet is busy, please retry with the same reference.'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={'Retry-After': '1'},
+        )
+    return drf_exception_handler(exc, context)
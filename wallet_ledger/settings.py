@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
 import sys
 
@@ -42,13 +43,15 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
-    'django_crontab',
     'apps.accounts',
-    'apps.wallets'
+    'apps.wallets',
+    'apps.jobs',
+    'apps.monitoring',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'wallet_ledger.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -76,12 +79,17 @@ TEMPLATES = [
 ]
 
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'wallet_ledger.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'EXCEPTION_HANDLER': 'wallet_ledger.exceptions.exception_handler',
     'DEFAULT_THROTTLE_CLASSES': [
         'rest_framework.throttling.AnonRateThrottle',
         'rest_framework.throttling.UserRateThrottle'
@@ -94,10 +102,149 @@ REST_FRAMEWORK = {
 
 WSGI_APPLICATION = 'wallet_ledger.wsgi.application'
 
-CRONJOBS = [
-    ('0 0 * * *', 'apps.wallets.cron.update_wallet_balances')
+# Response compression
+# Responses of at least COMPRESS_MIN_BYTES are compressed, with Brotli at
+# COMPRESS_BROTLI_QUALITY (0-11) when the client accepts it and brotli is
+# installed, and with gzip otherwise.
+
+COMPRESS_MIN_BYTES = 1024
+
+COMPRESS_BROTLI_QUALITY = 5
+
+# Background jobs
+# (time, job name[, params]) entries enqueued by `manage.py run_jobs`. The
+# time is a daily "HH:MM" or "*/N" for every N minutes.
+
+JOBS_SCHEDULE = [
+    ('00:00', 'wallets.checkpoint_balances'),
+    ('01:00', 'wallets.verify_integrity'),
+    ('02:00', 'wallets.prune_spending_buckets'),
+    ('*/5', 'wallets.expire_holds'),
+    ('*/1', 'wallets.run_scheduled_transfers'),
+    ('03:00', 'jobs.prune_history'),
 ]
 
+JOBS_CHUNK_SIZE = 1000
+
+JOBS_LEASE_SECONDS = 600
+
+JOBS_MAX_ATTEMPTS = 3
+
+JOBS_POLL_INTERVAL = 1
+
+# Finished jobs are kept this long for `job_history`, then deleted by the
+# `jobs.prune_history` job.
+
+JOBS_HISTORY_DAYS = 7
+
+LEDGER_ARCHIVE_DIR = BASE_DIR / 'archive'
+
+ONBOARDING_UPLOAD_DIR = BASE_DIR / 'uploads' / 'onboarding'
+
+
+# Ledger instrumentation
+# Log the wallet id whenever waiting for a wallet lock takes at least this
+# many milliseconds. `None` disables the log.
+
+LEDGER_LOCK_WAIT_LOG_MS = None
+
+
+# Ledger write strategy
+# "pessimistic" locks wallet rows with SELECT ... FOR UPDATE, "optimistic"
+# compares-and-swaps `Wallet.version` and retries on conflict, "auto" uses
+# row locks wherever the database supports them.
+
+LEDGER_WRITE_STRATEGY = 'auto'
+
+
+# Ledger write retries
+# Writes that fail on a version conflict, deadlock, serialization failure or
+# lock error are retried up to LEDGER_WRITE_MAX_RETRIES times, after a random
+# delay of up to LEDGER_WRITE_BACKOFF_MS doubled per attempt and capped at
+# LEDGER_WRITE_MAX_BACKOFF_MS (see `apps/wallets/retry.py`).
+
+LEDGER_WRITE_MAX_RETRIES = 10
+
+LEDGER_WRITE_BACKOFF_MS = 5
+
+LEDGER_WRITE_MAX_BACKOFF_MS = 500
+
+
+# Single-writer queues for hot wallets
+# Writes to these wallets (a list of wallet ids, or "__all__") are queued to
+# one writer thread per shard and applied in micro-batches.
+
+LEDGER_ACTOR_WALLETS = []
+
+LEDGER_ACTOR_SHARDS = 4
+
+LEDGER_ACTOR_BATCH_WINDOW_MS = 2
+
+LEDGER_ACTOR_MAX_BATCH = 100
+
+
+# Group commit for deposits
+# Concurrent deposits arriving within this many milliseconds share one
+# database transaction. `None` commits every deposit on its own.
+
+LEDGER_GROUP_COMMIT_WINDOW_MS = None
+
+LEDGER_GROUP_COMMIT_MAX_BATCH = 100
+
+
+# Currencies
+# Amounts are integers in the minor unit of their currency. Wallets hold one
+# sub-balance per currency; existing balances are in the default currency.
+# Exchange rates are read from the `ExchangeRate` table and cached in each
+# process for `LEDGER_FX_CACHE_SECONDS`.
+
+LEDGER_CURRENCIES = ['USD', 'EUR', 'GBP']
+
+LEDGER_DEFAULT_CURRENCY = 'USD'
+
+LEDGER_FX_CACHE_SECONDS = 60
+
+
+# Holds
+# Authorized holds that are neither captured nor voided within this many
+# seconds are released by the `wallets.expire_holds` job.
+
+LEDGER_HOLD_EXPIRY_SECONDS = 7 * 24 * 60 * 60
+
+
+# Scheduled transfers
+# Due transfers are claimed and executed this many at a time by the
+# `wallets.run_scheduled_transfers` job.
+
+LEDGER_SCHEDULED_BATCH_SIZE = 100
+
+# How often the job looks again at transfers that are due but claimed by
+# another executor.
+
+LEDGER_SCHEDULED_POLL_SECONDS = 1
+
+
+# Transaction search
+# Metadata keys the transaction list can be filtered on, as
+# `?metadata.<key>=<value>`. Each key needs an index, created by migration
+# (see `apps/wallets/migrations/0007_transaction_search.py`).
+
+LEDGER_FILTERABLE_METADATA_KEYS = ['order_id', 'merchant_id', 'category']
+
+
+# Change feed
+# `GET /api/wallets/me/changes` waits up to LEDGER_CHANGES_TIMEOUT_SECONDS
+# for new transactions, and the event stream stays open for
+# LEDGER_CHANGES_STREAM_SECONDS. Writes wake the waiting clients of the same
+# process on commit; writes of other processes are noticed by looking at the
+# database every LEDGER_CHANGES_POLL_SECONDS (see `apps/wallets/changes.py`).
+
+LEDGER_CHANGES_TIMEOUT_SECONDS = 25
+
+LEDGER_CHANGES_POLL_SECONDS = 2
+
+LEDGER_CHANGES_STREAM_SECONDS = 300
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -106,10 +253,58 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file-backed test database gives threads in the concurrency tests
+        # SQLite's regular file locking instead of the table-level locks of a
+        # shared in-memory cache.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.2/topics/auth/passwords/
+# The first hasher is used for new passwords; passwords stored with another
+# one are re-hashed when their user logs in. Argon2 is preferred whenever
+# argon2-cffi is installed.
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+if importlib.util.find_spec('argon2') is not None:
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(2))
+
+
+# Tests
+# `manage.py test` reports the time spent in every test module. Passwords are
+# hashed with MD5 under test, since the real hashers cost tens of
+# milliseconds per user by design; the others stay listed so stored hashes
+# can still be verified and upgraded.
+
+TEST_RUNNER = 'wallet_ledger.test_runner.LedgerTestRunner'
+
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
+if TESTING:
+    PASSWORD_HASHERS.insert(0, 'django.contrib.auth.hashers.MD5PasswordHasher')
+
+# "fast" checks credentials with one query for the user and its token and
+# hashes in a pool of LOGIN_HASHING_PROCESSES processes (0 hashes in the
+# request thread); "django" uses django.contrib.auth.authenticate().
+
+LOGIN_PIPELINE = 'fast'
+
+LOGIN_HASHING_PROCESSES = 0
+
+LOGIN_MAX_PENDING_HASHES = 64
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
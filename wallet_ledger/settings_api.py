@@ -0,0 +1,53 @@
+"""
+Settings for API-only processes.
+
+The API is token authenticated and only speaks JSON, so API workers (and
+`manage.py` invocations that only run jobs) need neither the admin nor
+sessions, messages, CSRF or clickjacking protection, nor the browsable API.
+Leaving them out makes every cold start import and set up less. Select it
+with `DJANGO_SETTINGS_MODULE=wallet_ledger.settings_api`.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK, TEMPLATES
+
+API_EXCLUDED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+]
+
+# Authentication is done by Django REST framework per view, and
+# AuthenticationMiddleware depends on sessions.
+API_EXCLUDED_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in API_EXCLUDED_APPS]
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in API_EXCLUDED_MIDDLEWARE]
+
+ROOT_URLCONF = 'wallet_ledger.urls_api'
+
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+            ],
+        },
+    },
+]
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': (
+        'wallet_ledger.renderers.ORJSONRenderer',
+    ),
+}
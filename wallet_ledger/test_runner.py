@@ -0,0 +1,49 @@
+"""
+Test runner that reports the wall-clock time spent in every test module.
+
+A test's time runs from the end of the previous test to its own end, so class
+fixtures (`setUpClass`, `setUpTestData`) and database flushes count toward
+the module that caused them. With `--parallel`, tests run in worker
+processes and only their own durations are reported back (Python 3.12+).
+"""
+from collections import defaultdict
+from time import perf_counter
+from unittest import TextTestResult
+
+from django.test.runner import DiscoverRunner
+
+
+class ModuleTimingResult(TextTestResult):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.module_seconds = defaultdict(float)
+        self.module_tests = defaultdict(int)
+        self._last_stop = perf_counter()
+        self._duration = None
+
+    def addDuration(self, test, elapsed):
+        super().addDuration(test, elapsed)
+        self._duration = elapsed
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        now = perf_counter()
+        module = type(test).__module__
+        self.module_seconds[module] += now - self._last_stop if self._duration is None else self._duration
+        self.module_tests[module] += 1
+        self._last_stop = now
+        self._duration = None
+
+    def printErrors(self):
+        super().printErrors()
+        if not self.module_seconds:
+            return
+        self.stream.writeln()
+        self.stream.writeln("Time per test module:")
+        for module, seconds in sorted(self.module_seconds.items(), key=lambda item: -item[1]):
+            self.stream.writeln(f"{seconds:8.2f}s {self.module_tests[module]:5d} tests  {module}")
+
+
+class LedgerTestRunner(DiscoverRunner):
+    def get_resultclass(self):
+        return super().get_resultclass() or ModuleTimingResult
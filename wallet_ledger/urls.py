@@ -19,8 +19,11 @@ from django.contrib import admin
 from django.urls import path
 from django.urls.conf import include
 
+from apps.monitoring.views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('apps.accounts.urls')),
-    path('api/wallets/', include('apps.wallets.urls'))
+    path('api/wallets/', include('apps.wallets.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -0,0 +1,15 @@
+"""
+URL configuration of the API-only settings (`wallet_ledger.settings_api`):
+the project's URLs without the admin.
+"""
+
+from django.urls import path
+from django.urls.conf import include
+
+from apps.monitoring.views import metrics_view
+
+urlpatterns = [
+    path('api/auth/', include('apps.accounts.urls')),
+    path('api/wallets/', include('apps.wallets.urls')),
+    path('metrics', metrics_view, name='metrics'),
+]